@@ -0,0 +1,3 @@
+"""
+Benchmarks for mle_Challenge project.
+"""
@@ -0,0 +1,149 @@
+"""
+Check of the spilled aggregation against the in-memory one
+
+Generates synthetic inputs in a temporary data directory, gives the cleaned
+transactions coordinates (some missing, so H3 levels are aggregated and
+transactions without a cell are dropped), then runs aggregate_all_levels
+twice: without a memory budget (in memory) and with a budget too small for
+the transactions (spilled to disk, aggregated with the streaming engine).
+Every mart, H3 levels included, must be the same in both runs.
+
+Usage:
+    python3 benchmarks/aggregate_spill_check.py --scale 1
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from polars.testing import assert_frame_equal
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Metropolitan France bounding box (longitude, latitude)
+FRANCE_BOUNDS = ((-4.5, 42.5), (7.5, 51.0))
+
+# Transactions are scattered around a few towns (standard deviation in
+# degrees, ~0.5 km) so that H3 cells reach their minimum number of sales
+TOWNS = 20
+TOWN_SPREAD_DEG = 0.005
+
+# Share of transactions left without coordinates
+MISSING_COORDINATES = 0.1
+
+# Budget small enough that the transactions are always spilled
+SPILL_BUDGET = "1MB"
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def add_coordinates(df: pl.DataFrame, seed: int = 0) -> pl.DataFrame:
+    """Coordinates around TOWNS random towns in France, null for MISSING_COORDINATES of the rows."""
+    rng = np.random.default_rng(seed)
+    (lon_min, lat_min), (lon_max, lat_max) = FRANCE_BOUNDS
+    towns = rng.uniform((lon_min, lat_min), (lon_max, lat_max), (TOWNS, 2))
+    coords = towns[rng.integers(0, TOWNS, len(df))] + rng.normal(0.0, TOWN_SPREAD_DEG, (len(df), 2))
+    coords[rng.random(len(df)) < MISSING_COORDINATES] = np.nan
+    return df.with_columns(
+        pl.Series("Longitude", coords[:, 0]).fill_nan(None),
+        pl.Series("Latitude", coords[:, 1]).fill_nan(None),
+    )
+
+
+def collect_marts(results: dict[str, pl.DataFrame | pl.LazyFrame]) -> dict[str, pl.DataFrame]:
+    """Marts as in-memory frames (spilled runs return lazy scans of the written files)."""
+    return {
+        level: df.collect() if isinstance(df, pl.LazyFrame) else df
+        for level, df in results.items()
+    }
+
+
+def run_check(scale: float) -> list[str]:
+    """
+    Aggregate in memory and spilled, and compare the marts.
+
+    Returns:
+        Levels whose marts differ (or are missing from one of the runs)
+    """
+    # Imported here: config reads $PIPELINE_DATA_DIR at import time
+    from config.paths import DATA_DIR, get_dvf_raw_path, get_dvf_clean_path
+    from benchmarks.synthetic import generate_inputs
+    from pipelines.clean_dvf import build_clean_transactions
+    from pipelines.aggregate import aggregate_all_levels, H3_LEVELS
+    from pipelines.memory_budget import stage_budget_env
+
+    generate_inputs(DATA_DIR / "raw", scale)
+    clean_path = get_dvf_clean_path()
+    clean_path.parent.mkdir(parents=True, exist_ok=True)
+    add_coordinates(build_clean_transactions(get_dvf_raw_path())).write_parquet(clean_path)
+
+    logger.info("\n▶ In-memory aggregation")
+    in_memory = collect_marts(aggregate_all_levels(force=True))
+
+    logger.info(f"\n▶ Spilled aggregation (budget {SPILL_BUDGET})")
+    os.environ[stage_budget_env("aggregate")] = SPILL_BUDGET
+    try:
+        spilled = collect_marts(aggregate_all_levels(force=True))
+    finally:
+        del os.environ[stage_budget_env("aggregate")]
+
+    missing_h3 = [level for level in H3_LEVELS if level not in in_memory]
+    if missing_h3:
+        logger.error(f"H3 levels not aggregated: {missing_h3}")
+
+    differing = missing_h3 + sorted(set(in_memory) ^ set(spilled))
+    for level in sorted(set(in_memory) & set(spilled)):
+        try:
+            assert_frame_equal(in_memory[level], spilled[level], check_row_order=False)
+        except AssertionError as e:
+            logger.error(f"{level}: {e}")
+            differing.append(level)
+        else:
+            logger.info(f"  {level:12s} {len(spilled[level]):>8,} rows  ✓")
+    return differing
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the spilled aggregation against the in-memory one")
+    parser.add_argument("--scale", type=float, default=1, help="Synthetic input scale")
+    args = parser.parse_args()
+
+    logger.info("=" * 70)
+    logger.info("AGGREGATION SPILL CHECK")
+    logger.info("=" * 70)
+
+    with tempfile.TemporaryDirectory(prefix="aggregate_spill_check_") as data_dir:
+        os.environ["PIPELINE_DATA_DIR"] = data_dir
+        differing = run_check(args.scale)
+
+    if differing:
+        logger.error(f"❌ Spilled marts differ from the in-memory ones: {differing}")
+        sys.exit(1)
+    logger.info("✅ Spilled marts match the in-memory ones")
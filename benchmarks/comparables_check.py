@@ -0,0 +1,93 @@
+"""
+Correctness and speed check of the comparables KD-tree against brute force
+
+For random query points (existing sales with jittered features), compares
+ComparablesIndex.nearest with an exhaustive scan of the same points: the K
+squared distances must match (the rows may differ only between ties). Also
+reports queries/second of both.
+
+Usage:
+    python3 benchmarks/comparables_check.py --type Appartement --queries 1000 --k 10
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from server.comparables import ComparablesIndex
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def sample_queries(index: ComparablesIndex, n: int, seed: int = 0) -> np.ndarray:
+    """Encoded query points: random indexed sales moved by ~1 scaled unit."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index.points), n)
+    jitter = rng.normal(0.0, 1.0, (n, index.points.shape[1]))
+    return (np.asarray(index.points[rows], dtype=np.float64) + jitter).astype(np.float32)
+
+
+def brute_force_nearest(points: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    """Sorted K smallest squared distances over every point."""
+    diff = points - q
+    d = np.einsum("ij,ij->i", diff, diff, dtype=np.float64)
+    return np.sort(np.partition(d, min(k, len(d)) - 1)[:k])
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the comparables KD-tree against brute force")
+    parser.add_argument("--type", default="Appartement", help="Property type of the index")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    logger.info("=" * 70)
+    logger.info("COMPARABLES KD-TREE CHECK")
+    logger.info("=" * 70)
+
+    index = ComparablesIndex(args.type)
+    points = np.asarray(index.points)
+    queries = sample_queries(index, args.queries)
+    logger.info(f"  {len(points):,} indexed sales, {len(queries):,} queries, k={args.k}")
+
+    start = time.perf_counter()
+    tree = [index.nearest(q, args.k)[0] for q in queries]
+    tree_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    brute = [brute_force_nearest(points, q, args.k) for q in queries]
+    brute_s = time.perf_counter() - start
+
+    mismatches = sum(
+        len(t) != len(b) or not np.allclose(t, b, rtol=1e-9, atol=1e-12)
+        for t, b in zip(tree, brute)
+    )
+    logger.info(f"  {'KD-tree':12s} {len(queries) / tree_s:,.0f} queries/s")
+    logger.info(f"  {'brute force':12s} {len(queries) / brute_s:,.0f} queries/s")
+
+    if mismatches:
+        logger.error(f"❌ {mismatches:,} of {len(queries):,} queries differ from brute force")
+        sys.exit(1)
+    logger.info("✅ KD-tree results match brute force")
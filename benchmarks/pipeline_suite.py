@@ -0,0 +1,378 @@
+"""
+Pipeline benchmark suite on synthetic inputs
+
+Runs the pipeline entry points at several scales of synthetic inputs
+(benchmarks/synthetic.py) and keeps a results history to catch performance
+regressions offline:
+- build_clean_transactions      DVF text -> clean transactions
+- aggregate_all_levels          clean transactions -> marts
+- create_geojson[<level>]       marts + ADMIN EXPRESS -> GeoJSON tiles
+- generate_iris                 IRIS contours + marts -> iris.geojson
+
+Each scale has its own data directory (data/benchmarks/<scale>x, used as
+$PIPELINE_DATA_DIR) and each case runs in a fresh process, so paths, caches
+and peak RSS are isolated. Timings follow pytest-benchmark (min / max /
+mean / stddev / median / IQR over rounds); every result is appended to
+data/reports/benchmark_history.jsonl and compared with the median of the
+previous runs of the same case, scale and machine.
+
+Usage:
+    python3 benchmarks/pipeline_suite.py --scales 1 10 100
+    python3 benchmarks/pipeline_suite.py --cases create_geojson[commune] --rounds 10 --fail-on-regression
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import PROJECT_ROOT, get_benchmark_workspace_dir, get_benchmark_history_path
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+SCALES = [1, 10, 100]
+ROUNDS_BY_SCALE = {1: 5, 10: 3, 100: 1}
+GEOJSON_LEVELS = ["region", "department", "commune"]
+CASES = (
+    ["build_clean_transactions", "aggregate_all_levels"]
+    + [f"create_geojson[{level}]" for level in GEOJSON_LEVELS]
+    + ["generate_iris"]
+)
+
+# A case regresses when its median is this much slower than the baseline,
+# the median of its last HISTORY_WINDOW results on the same machine
+REGRESSION_THRESHOLD = 0.15
+HISTORY_WINDOW = 5
+
+
+# ----------------------------
+# Cases (run inside the worker process)
+# ----------------------------
+
+def prepare_workspace() -> None:
+    """Build dvf_clean and the marts the downstream cases read, when stale."""
+    from config.paths import get_dvf_raw_path, get_dvf_clean_path, get_mart_path
+    from pipelines.clean_dvf import build_clean_transactions
+    from pipelines.aggregate import aggregate_all_levels
+
+    raw_path, clean_path = get_dvf_raw_path(), get_dvf_clean_path()
+    if not clean_path.exists() or clean_path.stat().st_mtime < raw_path.stat().st_mtime:
+        clean_path.parent.mkdir(parents=True, exist_ok=True)
+        build_clean_transactions(raw_path).write_parquet(clean_path)
+    mart_path = get_mart_path("commune")
+    if not mart_path.exists() or mart_path.stat().st_mtime < clean_path.stat().st_mtime:
+        aggregate_all_levels()
+
+
+def load_case(name: str):
+    """Zero-argument callable running one benchmark case."""
+    if name == "build_clean_transactions":
+        from config.paths import get_dvf_raw_path
+        from pipelines.clean_dvf import build_clean_transactions
+        return lambda: build_clean_transactions(get_dvf_raw_path())
+
+    # Rounds rebuild their outputs (no skip on unchanged inputs) and
+    # reprocess geometries (no geometry cache), so they time the actual work
+    if name == "aggregate_all_levels":
+        from pipelines.aggregate import aggregate_all_levels
+        return lambda: aggregate_all_levels(force=True)
+
+    if name.startswith("create_geojson[") and name.endswith("]"):
+        from pipelines.build_geojson import create_geojson, ensure_directories
+        level = name[len("create_geojson["):-1]
+        ensure_directories()
+
+        def run():
+            if create_geojson(level, geometry_cache=False) is None:
+                raise RuntimeError(f"create_geojson({level!r}) failed")
+        return run
+
+    if name == "generate_iris":
+        from pipelines.generate_iris import main
+
+        def run():
+            if not main(force=True, geometry_cache=False):
+                raise RuntimeError("generate_iris failed")
+        return run
+
+    raise ValueError(f"Unknown case: {name}. Must be one of {CASES}")
+
+
+def summarize_rounds(times: list[float]) -> dict:
+    """pytest-benchmark style statistics of round durations (seconds)."""
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [times[0]] * 3
+    mean = statistics.fmean(times)
+    return {
+        "rounds": len(times),
+        "min": min(times),
+        "max": max(times),
+        "mean": mean,
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "median": statistics.median(times),
+        "iqr": quartiles[2] - quartiles[0],
+        "ops": 1.0 / mean if mean > 0 else None,
+    }
+
+
+def run_worker(name: str, rounds: int, warmup: int, output: Path) -> None:
+    """Time a case in this process and write its result to output (JSON)."""
+    from pipelines.instrumentation import stage
+
+    # Library imports (done lazily inside the pipelines) are not part of the timings
+    import pyogrio  # noqa: F401
+    import pyproj  # noqa: F401
+    import geopandas  # noqa: F401
+
+    prepare_workspace()
+    func = load_case(name)
+
+    for _ in range(warmup):
+        func()
+
+    times, peak_rss, rows = [], 0, None
+    for _ in range(rounds):
+        with stage("benchmark", case=name) as current:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        peak_rss = max(peak_rss, current.record["peak_rss_bytes"] or 0)
+        rows = current.record["rows"]
+
+    output.write_text(json.dumps({
+        "stats": summarize_rounds(times),
+        "times": times,
+        "peak_rss_bytes": peak_rss,
+        "rows": rows,
+    }))
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def git_revision() -> dict:
+    """Current commit and whether the working tree has local changes."""
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def machine_info() -> dict:
+    """Machine fingerprint; results are only compared on the same one."""
+    import polars as pl
+    import geopandas as gpd
+
+    info = {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "geopandas": gpd.__version__,
+    }
+    info["key"] = f"{info['host']}|{info['machine']}|{info['cpu_count']}|{info['python']}"
+    return info
+
+
+def run_case(name: str, scale: float, rounds: int, warmup: int, verbose: bool) -> dict:
+    """Run one case in a fresh process pointed at the scale's workspace."""
+    workspace = get_benchmark_workspace_dir(scale)
+    env = {
+        **os.environ,
+        "PIPELINE_DATA_DIR": str(workspace),
+        "PIPELINE_APP_DIR": str(workspace / "app"),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "result.json"
+        command = [
+            sys.executable, str(Path(__file__).resolve()),
+            "--worker", name, "--rounds", str(rounds), "--warmup", str(warmup), "--output", str(output),
+        ]
+        result = subprocess.run(
+            command, env=env, cwd=PROJECT_ROOT, check=False,
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.PIPE, text=True,
+        )
+        if result.returncode != 0:
+            tail = "\n".join((result.stderr or "").strip().splitlines()[-15:])
+            raise RuntimeError(f"{name} at {scale:g}× failed (exit {result.returncode})\n{tail}")
+        return json.loads(output.read_text())
+
+
+def load_history(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline_median(history: list[dict], record: dict, window: int = HISTORY_WINDOW) -> float | None:
+    """Median of the last `window` medians of the same case, scale, inputs and machine."""
+    previous = [
+        h["stats"]["median"] for h in history
+        if h["case"] == record["case"]
+        and h["scale"] == record["scale"]
+        and h.get("inputs") == record["inputs"]
+        and h["machine"]["key"] == record["machine"]["key"]
+        and h["run_id"] != record["run_id"]
+    ]
+    return statistics.median(previous[-window:]) if previous else None
+
+
+def compare(records: list[dict], history: list[dict], threshold: float, window: int) -> list[dict]:
+    """Log each result against its baseline; return the regressions."""
+    regressions = []
+    logger.info(f"  {'case':32s} {'scale':>6s} {'median':>9s} {'baseline':>9s} {'change':>8s} {'peak RSS':>9s}")
+    for record in records:
+        baseline = baseline_median(history, record, window)
+        median = record["stats"]["median"]
+        change = median / baseline - 1.0 if baseline else None
+        status = ""
+        if change is not None and change > threshold:
+            status = "  ⚠️ REGRESSION"
+            regressions.append({**record, "baseline_median": baseline, "change": change})
+        logger.info(
+            f"  {record['case']:32s} {record['scale']:>5g}× {median:8.3f}s "
+            f"{(f'{baseline:8.3f}s' if baseline else '        -'):>9s} "
+            f"{(f'{change:+7.1%}' if change is not None else '      -'):>8s} "
+            f"{record['peak_rss_bytes'] / 1024 ** 2:7.0f}MB{status}"
+        )
+    return regressions
+
+
+def run_suite(
+    scales: list[float],
+    cases: list[str],
+    rounds: int | None = None,
+    warmup: int = 0,
+    save: bool = True,
+    threshold: float = REGRESSION_THRESHOLD,
+    window: int = HISTORY_WINDOW,
+    force_generate: bool = False,
+    verbose: bool = False,
+) -> list[dict]:
+    """
+    Generate inputs, run every case at every scale and record the results.
+
+    Returns:
+        Regressions (results slower than their baseline by more than threshold)
+    """
+    from benchmarks.synthetic import generate_inputs
+
+    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}"
+    revision, machine = git_revision(), machine_info()
+    history_path = get_benchmark_history_path()
+    history = load_history(history_path)
+
+    records = []
+    for scale in scales:
+        workspace = get_benchmark_workspace_dir(scale)
+        inputs = generate_inputs(workspace / "raw", scale, force=force_generate)
+        scale_rounds = rounds or ROUNDS_BY_SCALE.get(scale, 1)
+
+        for name in cases:
+            logger.info(f"▶ {name} at {scale:g}× ({scale_rounds} rounds)")
+            result = run_case(name, scale, scale_rounds, warmup, verbose)
+            records.append({
+                "run_id": run_id,
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                **revision,
+                "machine": machine,
+                "case": name,
+                "scale": scale,
+                "inputs": inputs["params"],
+                **result,
+            })
+            logger.info(
+                f"  median {result['stats']['median']:.3f}s (min {result['stats']['min']:.3f}s, "
+                f"IQR {result['stats']['iqr']:.3f}s), peak RSS {result['peak_rss_bytes'] / 1024 ** 2:.0f} MB"
+            )
+
+    logger.info("\n" + "=" * 70)
+    regressions = compare(records, history, threshold, window)
+
+    if save:
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(history_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        logger.info(f"\n📁 Results appended to {history_path}")
+
+    return regressions
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks on synthetic inputs")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1], help=f"Input scales (e.g. {SCALES})")
+    parser.add_argument("--cases", nargs="+", default=CASES, help=f"Cases to run (default: all of {CASES})")
+    parser.add_argument("--rounds", type=int, help=f"Rounds per case (default per scale: {ROUNDS_BY_SCALE})")
+    parser.add_argument("--warmup", type=int, default=0, help="Untimed rounds before timing")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Regression threshold (0.15 = 15%% slower)")
+    parser.add_argument("--window", type=int, default=HISTORY_WINDOW, help="Previous results in the baseline")
+    parser.add_argument("--no-save", action="store_true", help="Do not append results to the history")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    parser.add_argument("--force-generate", action="store_true", help="Regenerate the synthetic inputs")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        run_worker(args.worker, args.rounds or 1, args.warmup, args.output)
+        sys.exit(0)
+
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {unknown}. Must be among {CASES}")
+
+    try:
+        logger.info("=" * 70)
+        logger.info("PIPELINE BENCHMARKS")
+        logger.info("=" * 70)
+
+        regressions = run_suite(
+            args.scales, args.cases, args.rounds, args.warmup, not args.no_save,
+            args.threshold, args.window, args.force_generate, args.verbose,
+        )
+        if regressions:
+            logger.warning(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+    except Exception as e:
+        logger.error(f"Benchmark failed: {e}", exc_info=True)
+        sys.exit(1)
@@ -0,0 +1,169 @@
+"""
+Load benchmark for the price lookup API
+
+Measures p50/p99 latency of:
+1. In-process point lookups (MartIndex.get)
+2. In-process batch lookups (MartIndex.get_many)
+3. HTTP lookups against /api/price with concurrent keep-alive clients
+   (an in-process server on an ephemeral port, or --url for a running one)
+
+Usage:
+    python3 benchmarks/price_lookup_load.py --level commune --clients 200 --requests 50
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from server.price_lookup import PriceLookup
+from server.price_api import PriceApiServer, API_PRICE_PATH
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def summarize(name: str, latencies_ns: list[int] | np.ndarray, n_items: int | None = None) -> dict:
+    """Log and return p50/p99/max latency (µs) and throughput."""
+    lat_us = np.asarray(latencies_ns, dtype="float64") / 1_000
+    stats = {
+        "name": name,
+        "n": int(lat_us.size),
+        "p50_us": float(np.percentile(lat_us, 50)),
+        "p99_us": float(np.percentile(lat_us, 99)),
+        "max_us": float(lat_us.max()),
+    }
+    extra = f", {n_items:,} items" if n_items else ""
+    logger.info(
+        f"  {name:28s} n={stats['n']:,}{extra}  "
+        f"p50={stats['p50_us']:.1f} µs  p99={stats['p99_us']:.1f} µs  max={stats['max_us']:.1f} µs"
+    )
+    return stats
+
+
+def sample_keys(lookup: PriceLookup, level: str, n: int, seed: int = 0) -> list[tuple[str, str]]:
+    """Random (code, property type) keys from the index, with ~10% misses."""
+    rng = random.Random(seed)
+    keys = list(lookup.index(level).index.keys())
+    sampled = [rng.choice(keys) for _ in range(n)]
+    return [(f"missing-{i}", t) if rng.random() < 0.1 else (c, t) for i, (c, t) in enumerate(sampled)]
+
+
+# ----------------------------
+# Benchmarks
+# ----------------------------
+
+def bench_point_lookups(lookup: PriceLookup, level: str, n: int) -> dict:
+    mart_index = lookup.index(level)
+    keys = sample_keys(lookup, level, n)
+    latencies = np.empty(n, dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i, (code, property_type) in enumerate(keys):
+        start = clock()
+        mart_index.get(code, property_type)
+        latencies[i] = clock() - start
+    return summarize("point lookup", latencies)
+
+
+def bench_batch_lookups(lookup: PriceLookup, level: str, n_batches: int, batch_size: int) -> dict:
+    mart_index = lookup.index(level)
+    latencies = []
+    for b in range(n_batches):
+        keys = sample_keys(lookup, level, batch_size, seed=b)
+        codes = [c for c, _ in keys]
+        start = time.perf_counter_ns()
+        mart_index.get_many(codes, "Appartement")
+        latencies.append(time.perf_counter_ns() - start)
+    return summarize(f"batch lookup ({batch_size})", latencies, n_batches * batch_size)
+
+
+async def _http_client(host: str, port: int, paths: list[str], latencies: list[int]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter_ns()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":", 1)[1])
+                for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")
+            )
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter_ns() - start)
+    finally:
+        writer.close()
+
+
+async def bench_http(lookup: PriceLookup, level: str, clients: int, requests: int, url: str | None) -> dict:
+    server = None
+    if url is None:
+        api_server = PriceApiServer(lookup=lookup)
+        server = await asyncio.start_server(api_server.handle_connection, "127.0.0.1", 0, backlog=4096)
+        host, port = server.sockets[0].getsockname()[:2]
+    else:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+
+    keys = sample_keys(lookup, level, clients * requests, seed=42)
+    paths = [f"{API_PRICE_PATH}?level={level}&code={c}&type={t}" for c, t in keys]
+
+    latencies: list[int] = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _http_client(host, port, paths[i * requests:(i + 1) * requests], latencies)
+        for i in range(clients)
+    ])
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    stats = summarize(f"http ({clients} clients)", latencies)
+    stats["requests_per_s"] = len(latencies) / elapsed
+    logger.info(f"  {'':28s} throughput={stats['requests_per_s']:,.0f} req/s")
+    return stats
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price lookup load benchmark")
+    parser.add_argument("--level", default="commune")
+    parser.add_argument("--point", type=int, default=100_000, help="Number of in-process point lookups")
+    parser.add_argument("--batches", type=int, default=100, help="Number of in-process batch lookups")
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per HTTP client")
+    parser.add_argument("--url", default=None, help="Benchmark a running server instead (e.g. http://127.0.0.1:8000)")
+    args = parser.parse_args()
+
+    logger.info("=" * 70)
+    logger.info(f"PRICE LOOKUP BENCHMARK ({args.level.upper()})")
+    logger.info("=" * 70)
+
+    price_lookup = PriceLookup([args.level])
+    bench_point_lookups(price_lookup, args.level, args.point)
+    bench_batch_lookups(price_lookup, args.level, args.batches, args.batch_size)
+    asyncio.run(bench_http(price_lookup, args.level, args.clients, args.requests, args.url))
@@ -0,0 +1,91 @@
+"""
+Throughput benchmark for the reverse-geocoding price lookup
+
+Draws random WGS84 points over the commune polygons' extent and measures
+points/second of:
+1. Point-in-polygon only (ReverseGeocoder.locate)
+2. Full lookup with IRIS -> commune -> department fallback (ReverseGeocoder.lookup)
+
+Usage:
+    python3 benchmarks/reverse_geocode_throughput.py --points 1000000 --batch-size 100000
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from server.reverse_geocode import ReverseGeocoder, BOUNDARIES_CRS, POINTS_CRS
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def sample_points(geocoder: ReverseGeocoder, n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Uniform random lon/lat over the extent of the commune polygons."""
+    import shapely
+    from pyproj import Transformer
+
+    xmin, ymin, xmax, ymax = shapely.total_bounds(geocoder.communes.geometries)
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(xmin, xmax, n)
+    y = rng.uniform(ymin, ymax, n)
+    return Transformer.from_crs(BOUNDARIES_CRS, POINTS_CRS, always_xy=True).transform(x, y)
+
+
+def bench(name: str, func, lon: np.ndarray, lat: np.ndarray, batch_size: int) -> float:
+    """Run func over lon/lat in batches; log and return points/second."""
+    start = time.perf_counter()
+    for i in range(0, len(lon), batch_size):
+        func(lon[i:i + batch_size], lat[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    points_per_s = len(lon) / elapsed
+    logger.info(f"  {name:28s} {len(lon):,} points in {elapsed:.2f}s  ({points_per_s:,.0f} points/s)")
+    return points_per_s
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reverse-geocoding lookup throughput benchmark")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--type", default="Appartement", help="Property type for the full lookup")
+    args = parser.parse_args()
+
+    logger.info("=" * 70)
+    logger.info("REVERSE GEOCODING BENCHMARK")
+    logger.info("=" * 70)
+
+    start = time.perf_counter()
+    geocoder = ReverseGeocoder()
+    logger.info(f"  {'load + index':28s} {time.perf_counter() - start:.2f}s")
+
+    lon, lat = sample_points(geocoder, args.points)
+
+    # Warm up (mart indexes are opened on first use)
+    geocoder.lookup(lon[:10], lat[:10], args.type)
+
+    bench("locate", geocoder.locate, lon, lat, args.batch_size)
+    bench(f"lookup ({args.type})", lambda x, y: geocoder.lookup(x, y, args.type), lon, lat, args.batch_size)
+
+    levels = geocoder.lookup(lon[:args.batch_size], lat[:args.batch_size], args.type)["stats_level"]
+    logger.info(f"  stats level mix: {levels.value_counts().sort('stats_level').rows()}")
@@ -0,0 +1,515 @@
+"""
+Synthetic inputs for the pipeline benchmarks
+
+Generates, for a given scale, files shaped like the real (manual download)
+inputs so that every pipeline can run offline:
+- DVF text export: real '|' separated header, French number formats
+  ('185000,00', '45,30'), multi-row mutations (main local + dependances),
+  non-sale mutation natures, a skewed number of sales per commune
+- ADMIN EXPRESS GeoPackage: COMMUNE / DEPARTEMENT / REGION layers in
+  Lambert-93 built on one jittered lattice (neighbouring polygons share
+  their vertices, departments and regions are blocks of communes)
+- IRIS GeoPackage: each commune split into sub-quads
+
+Scale 1 is ~20k DVF rows and 400 communes; rows and polygon counts grow
+linearly with the scale (100× ~ 2M rows and 40k communes, close to a
+real semester of DVF over metropolitan France).
+
+Usage:
+    python3 benchmarks/synthetic.py --scale 10 --output /tmp/dvf_10x
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import math
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import DVF_RAW_FILE, ADMIN_BOUNDARIES_FILE, IRIS_BOUNDARIES_FILE
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+DVF_HEADER = [
+    "Identifiant de document", "Reference document", "1 Articles CGI", "2 Articles CGI",
+    "3 Articles CGI", "4 Articles CGI", "5 Articles CGI", "No disposition", "Date mutation",
+    "Nature mutation", "Valeur fonciere", "No voie", "B/T/Q", "Type de voie", "Code voie", "Voie",
+    "Code postal", "Commune", "Code departement", "Code commune", "Prefixe de section", "Section",
+    "No plan", "No Volume", "1er lot", "Surface Carrez du 1er lot", "2eme lot",
+    "Surface Carrez du 2eme lot", "3eme lot", "Surface Carrez du 3eme lot", "4eme lot",
+    "Surface Carrez du 4eme lot", "5eme lot", "Surface Carrez du 5eme lot", "Nombre de lots",
+    "Code type local", "Type local", "Identifiant local", "Surface reelle bati",
+    "Nombre pieces principales", "Nature culture", "Nature culture speciale", "Surface terrain",
+]
+
+# Size of scale 1
+BASE_DVF_ROWS = 20_000
+BASE_COMMUNES = 400
+
+# Extent of the lattice (Lambert-93, roughly metropolitan France)
+GRID_ORIGIN = (100_000.0, 6_100_000.0)
+GRID_EXTENT_M = 1_000_000.0
+GRID_JITTER = 0.3  # fraction of a cell
+
+# Metropolitan department codes (in the order they are assigned) and regions
+DEPARTMENT_CODES = (
+    [f"{i:02d}" for i in range(1, 20)] + ["2A", "2B"] + [f"{i:02d}" for i in range(21, 96)]
+)
+REGION_CODES = ["11", "24", "27", "28", "32", "44", "52", "53", "75", "76", "84", "93", "94"]
+MAX_DEPARTMENT_SIDE = 9  # at most 9 × 9 departments
+MAX_REGION_SIDE = 3  # at most 3 × 3 regions
+
+# Mutations: share of natures, rows per mutation and main local types
+MUTATION_NATURES = {
+    "Vente": 0.90,
+    "Vente en l'état futur d'achèvement": 0.04,
+    "Echange": 0.02,
+    "Adjudication": 0.02,
+    "Vente terrain à bâtir": 0.02,
+}
+ROWS_PER_MUTATION = {1: 0.65, 2: 0.25, 3: 0.10}
+MAIN_LOCAL_TYPES = {
+    "Maison": (1, 0.45),
+    "Appartement": (2, 0.40),
+    "Local industriel. commercial ou assimilé": (4, 0.05),
+    "Dépendance": (3, 0.10),
+}
+EXTRA_LOCAL_TYPES = {"Dépendance": (3, 0.85), "Appartement": (2, 0.15)}
+STREET_TYPES = ["RUE", "AV", "CHE", "BD", "IMP", "ALL", "PL", "RTE"]
+
+
+def scale_sizes(scale: float) -> tuple[int, int]:
+    """(DVF rows, lattice side) for a scale."""
+    return int(BASE_DVF_ROWS * scale), max(2, round(math.sqrt(BASE_COMMUNES * scale)))
+
+
+# ----------------------------
+# Polygon grid
+# ----------------------------
+
+@dataclass
+class SyntheticGrid:
+    """Administrative layers built on one jittered lattice (Lambert-93)."""
+
+    communes: "gpd.GeoDataFrame"
+    departments: "gpd.GeoDataFrame"
+    regions: "gpd.GeoDataFrame"
+    iris: "gpd.GeoDataFrame"
+
+    @property
+    def code_insee(self) -> np.ndarray:
+        return self.communes["code_insee"].to_numpy()
+
+
+def jittered_lattice(side: int, rng: np.random.Generator) -> np.ndarray:
+    """(side + 1, side + 1, 2) lattice vertices; outer vertices stay on the extent."""
+    cell = GRID_EXTENT_M / side
+    ii, jj = np.meshgrid(np.arange(side + 1), np.arange(side + 1), indexing="ij")
+    lattice = np.stack([GRID_ORIGIN[0] + jj * cell, GRID_ORIGIN[1] + ii * cell], axis=-1)
+    inner = (slice(1, side), slice(1, side))
+    lattice[inner] += rng.uniform(-GRID_JITTER, GRID_JITTER, lattice[inner].shape) * cell
+    return lattice
+
+
+def block_ring(lattice: np.ndarray, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+    """Closed exterior ring of the lattice block rows [r0, r1] × cols [c0, c1]."""
+    return np.concatenate([
+        lattice[r0, c0:c1 + 1],
+        lattice[r0 + 1:r1 + 1, c1],
+        lattice[r1, c0:c1][::-1],
+        lattice[r0:r1, c0][::-1],
+        lattice[r0:r0 + 1, c0],
+    ])
+
+
+def block_polygons(lattice: np.ndarray, bounds: list[tuple[int, int, int, int]], segment_length: float) -> np.ndarray:
+    """Polygons of lattice blocks, densified so that shared edges carry the same vertices."""
+    import shapely
+
+    polygons = shapely.polygons([shapely.linearrings(block_ring(lattice, *b)) for b in bounds])
+    return shapely.segmentize(polygons, segment_length)
+
+
+def build_polygon_grid(
+    side: int,
+    vertices_per_edge: int = 16,
+    iris_per_side: int = 2,
+    seed: int = 0,
+) -> SyntheticGrid:
+    """
+    Build communes, departments, regions and IRIS on a side × side lattice.
+
+    Args:
+        side: Communes per lattice row/column (side² communes)
+        vertices_per_edge: Vertices per commune edge after densification
+        iris_per_side: IRIS per commune row/column (iris_per_side² per commune)
+        seed: Random seed
+
+    Returns:
+        SyntheticGrid (EPSG:2154)
+    """
+    import geopandas as gpd
+
+    rng = np.random.default_rng(seed)
+    cell = GRID_EXTENT_M / side
+    segment_length = cell / vertices_per_edge
+
+    # Departments are blocks of the lattice, regions blocks of departments
+    dep_side = min(MAX_DEPARTMENT_SIDE, max(2, side // 7))
+    dep_edges = np.linspace(0, side, dep_side + 1).round().astype(int)
+    reg_side = min(MAX_REGION_SIDE, dep_side)
+    per_region = math.ceil(dep_side / reg_side)
+    if dep_side ** 2 > len(DEPARTMENT_CODES) or reg_side ** 2 > len(REGION_CODES):
+        raise ValueError(f"Lattice side {side} needs more department/region codes than available")
+    if math.ceil(side / dep_side) ** 2 > 999:
+        raise ValueError(f"Lattice side {side} puts more than 999 communes in a department")
+
+    lattice = jittered_lattice(side, rng)
+
+    # Communes
+    rows, cols = np.divmod(np.arange(side * side), side)
+    dep_row = np.searchsorted(dep_edges, rows, side="right") - 1
+    dep_col = np.searchsorted(dep_edges, cols, side="right") - 1
+    dep_index = dep_row * dep_side + dep_col
+    reg_index = (dep_row // per_region) * reg_side + dep_col // per_region
+    dep_codes = np.array(DEPARTMENT_CODES[:dep_side ** 2])
+    reg_codes = np.array(REGION_CODES[:reg_side ** 2])
+
+    # Commune number within its department (001, 002, ...)
+    order = np.argsort(dep_index, kind="stable")
+    first = np.searchsorted(dep_index[order], dep_index[order])
+    number = np.empty(len(order), dtype=int)
+    number[order] = np.arange(len(order)) - first + 1
+    code_insee = np.char.add(dep_codes[dep_index], np.char.zfill(number.astype(str), 3))
+
+    communes = gpd.GeoDataFrame({
+        "code_insee": code_insee,
+        "nom_officiel": np.char.add("Commune ", code_insee),
+        "code_insee_du_departement": dep_codes[dep_index],
+        "code_insee_de_la_region": reg_codes[reg_index],
+    }, geometry=block_polygons(lattice, [(r, r + 1, c, c + 1) for r, c in zip(rows, cols)], segment_length), crs=2154)
+
+    # Departments and regions
+    dep_bounds = [
+        (dep_edges[i], dep_edges[i + 1], dep_edges[j], dep_edges[j + 1])
+        for i in range(dep_side) for j in range(dep_side)
+    ]
+    dep_region = [
+        reg_codes[(i // per_region) * reg_side + j // per_region]
+        for i in range(dep_side) for j in range(dep_side)
+    ]
+    departments = gpd.GeoDataFrame({
+        "code_insee": dep_codes,
+        "nom_officiel": np.char.add("Département ", dep_codes),
+        "code_insee_de_la_region": dep_region,
+    }, geometry=block_polygons(lattice, dep_bounds, segment_length), crs=2154)
+
+    reg_edges = [dep_edges[min(k * per_region, dep_side)] for k in range(reg_side + 1)]
+    reg_bounds = [
+        (reg_edges[i], reg_edges[i + 1], reg_edges[j], reg_edges[j + 1])
+        for i in range(reg_side) for j in range(reg_side)
+    ]
+    regions = gpd.GeoDataFrame({
+        "code_insee": reg_codes,
+        "nom_officiel": np.char.add("Région ", reg_codes),
+    }, geometry=block_polygons(lattice, reg_bounds, segment_length), crs=2154)
+
+    # IRIS: bilinear sub-quads of each commune
+    iris = build_iris(lattice, communes, iris_per_side, segment_length / iris_per_side)
+
+    logger.info(
+        f"✓ Grid {side}×{side}: {len(communes):,} communes, {len(departments)} departments, "
+        f"{len(regions)} regions, {len(iris):,} IRIS"
+    )
+    return SyntheticGrid(communes, departments, regions, iris)
+
+
+def build_iris(lattice: np.ndarray, communes, iris_per_side: int, segment_length: float):
+    """Split each lattice cell into iris_per_side² bilinear sub-quads."""
+    import shapely
+    import geopandas as gpd
+
+    side = lattice.shape[0] - 1
+    t = np.linspace(0.0, 1.0, iris_per_side + 1)
+    rows, cols = np.divmod(np.arange(side * side), side)
+    p00, p01 = lattice[rows, cols], lattice[rows, cols + 1]
+    p10, p11 = lattice[rows + 1, cols], lattice[rows + 1, cols + 1]
+
+    # (communes, k + 1, k + 1, 2) sub-lattice of every commune
+    u = t[None, None, :, None]
+    v = t[None, :, None, None]
+    sub = (
+        (1 - u) * (1 - v) * p00[:, None, None] + u * (1 - v) * p01[:, None, None]
+        + (1 - u) * v * p10[:, None, None] + u * v * p11[:, None, None]
+    )
+
+    rings, codes, insee = [], [], []
+    code_insee = communes["code_insee"].to_numpy()
+    for a in range(iris_per_side):
+        for b in range(iris_per_side):
+            rings.append(np.stack([sub[:, a, b], sub[:, a, b + 1], sub[:, a + 1, b + 1], sub[:, a + 1, b], sub[:, a, b]], axis=1))
+            codes.append(np.char.add(code_insee, f"{a * iris_per_side + b + 1:04d}"))
+            insee.append(code_insee)
+
+    geometries = shapely.segmentize(shapely.polygons(np.concatenate(rings)), segment_length)
+    code_iris = np.concatenate(codes)
+    iris = gpd.GeoDataFrame({
+        "code_iris": code_iris,
+        "code_insee": np.concatenate(insee),
+        "nom_iris": np.char.add("Iris ", code_iris),
+        "nom_commune": np.char.add("Commune ", np.concatenate(insee)),
+    }, geometry=geometries, crs=2154)
+    return iris.sort_values("code_iris", ignore_index=True)
+
+
+def write_admin_express(grid: SyntheticGrid, path: Path) -> Path:
+    """Write the COMMUNE / DEPARTEMENT / REGION layers to an ADMIN EXPRESS-shaped GeoPackage."""
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    grid.communes.to_file(path, layer="COMMUNE", driver="GPKG")
+    grid.departments.to_file(path, layer="DEPARTEMENT", driver="GPKG")
+    grid.regions.to_file(path, layer="REGION", driver="GPKG")
+    return path
+
+
+def write_iris_contours(grid: SyntheticGrid, path: Path) -> Path:
+    """Write the IRIS contours GeoPackage."""
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    grid.iris.to_file(path, driver="GPKG")
+    return path
+
+
+# ----------------------------
+# DVF text export
+# ----------------------------
+
+def _choice(rng: np.random.Generator, options: dict, n: int) -> np.ndarray:
+    keys = list(options)
+    weights = np.array([v[1] if isinstance(v, tuple) else v for v in options.values()], dtype=float)
+    return np.array(keys, dtype=object)[rng.choice(len(keys), n, p=weights / weights.sum())]
+
+
+def _french_decimal(cents: pl.Expr) -> pl.Expr:
+    """Integer hundredths -> '1234,56'."""
+    return (cents // 100).cast(pl.Utf8) + "," + (cents % 100).cast(pl.Utf8).str.zfill(2)
+
+
+def build_dvf_frame(n_rows: int, code_insee: np.ndarray, seed: int = 0, year: int = 2025) -> pl.DataFrame:
+    """
+    DVF-shaped rows (all columns as text, real header order).
+
+    Args:
+        n_rows: Approximate number of rows (mutations × rows per mutation)
+        code_insee: Commune codes sales are drawn from
+        seed: Random seed
+        year: Sale year (dates in the first semester)
+
+    Returns:
+        DataFrame with the DVF_HEADER columns
+    """
+    rng = np.random.default_rng(seed)
+    mean_rows = sum(k * p for k, p in ROWS_PER_MUTATION.items())
+    n_mutations = max(1, int(n_rows / mean_rows))
+
+    # Skewed commune activity: a few dense communes, many with a handful of sales
+    activity = rng.lognormal(0.0, 1.5, len(code_insee))
+    commune = rng.choice(len(code_insee), n_mutations, p=activity / activity.sum())
+    dep = np.array([c[:2] for c in code_insee])
+    dep_level = {d: rng.lognormal(np.log(2_800), 0.45) for d in np.unique(dep)}
+    commune_level = np.array([dep_level[d] for d in dep]) * rng.lognormal(0.0, 0.25, len(code_insee))
+
+    rows_per_mutation = rng.choice(list(ROWS_PER_MUTATION), n_mutations, p=list(ROWS_PER_MUTATION.values()))
+    main_type = _choice(rng, MAIN_LOCAL_TYPES, n_mutations)
+    main_surface = np.where(main_type == "Maison", rng.lognormal(np.log(105), 0.35, n_mutations),
+                            rng.lognormal(np.log(58), 0.45, n_mutations)).round()
+    price_m2 = commune_level[commune] * np.where(main_type == "Maison", 0.85, 1.0) * rng.lognormal(0.0, 0.3, n_mutations)
+    price = (main_surface * price_m2).round(-2)
+    # A few symbolic or erroneous amounts (filtered by clean_dvf)
+    price[rng.random(n_mutations) < 0.01] = rng.choice([1.0, 150.0, 5_000.0])
+
+    mutations = pl.DataFrame({
+        "mutation": np.arange(n_mutations),
+        "commune": commune,
+        "n_rows": rows_per_mutation,
+        "main_type": main_type.astype(str),
+        "main_surface": main_surface.astype(np.int64),
+        "price_cents": (price * 100).astype(np.int64),
+        "nature": _choice(rng, MUTATION_NATURES, n_mutations).astype(str),
+        "day": rng.integers(1, 182, n_mutations),
+        "plan": rng.integers(1, 2_000, n_mutations),
+    })
+
+    # One row per local of the mutation; the first row is the main local
+    df = mutations.select(pl.all().repeat_by("n_rows").explode()).with_columns(
+        pl.int_range(pl.len()).over("mutation").alias("local_rank")
+    )
+    n = len(df)
+    extra_type = _choice(rng, EXTRA_LOCAL_TYPES, n).astype(str)
+    type_codes = {k: v[0] for k, v in {**MAIN_LOCAL_TYPES, **EXTRA_LOCAL_TYPES}.items()}
+
+    df = df.with_columns(
+        pl.when(pl.col("local_rank") == 0).then(pl.col("main_type")).otherwise(pl.Series(extra_type)).alias("type"),
+        pl.Series("extra_surface", rng.integers(8, 40, n)),
+        pl.Series("rooms", rng.integers(1, 7, n)),
+        pl.Series("terrain", rng.integers(0, 2_500, n)),
+        pl.Series("carrez_cents", rng.integers(-300, 300, n)),
+        pl.Series("street_no", rng.integers(1, 250, n)),
+        pl.Series("street_type", np.array(STREET_TYPES)[rng.integers(0, len(STREET_TYPES), n)]),
+        pl.Series("missing_surface", rng.random(n) < 0.03),
+        pl.Series("code_insee", code_insee[df["commune"].to_numpy()]),
+    )
+    is_main = pl.col("local_rank") == 0
+    surface = pl.when(is_main).then(pl.col("main_surface")).otherwise(pl.col("extra_surface"))
+    is_dwelling = pl.col("type").is_in(["Maison", "Appartement"])
+    date = pl.date(year, 1, 1) + pl.duration(days=pl.col("day") - 1)
+
+    return df.select(
+        pl.lit(None, pl.Utf8).alias("Identifiant de document"),
+        pl.lit(None, pl.Utf8).alias("Reference document"),
+        *[pl.lit(None, pl.Utf8).alias(f"{i} Articles CGI") for i in range(1, 6)],
+        pl.lit("000001").alias("No disposition"),
+        date.dt.strftime("%d/%m/%Y").alias("Date mutation"),
+        pl.col("nature").alias("Nature mutation"),
+        _french_decimal(pl.col("price_cents")).alias("Valeur fonciere"),
+        pl.col("street_no").cast(pl.Utf8).alias("No voie"),
+        pl.lit(None, pl.Utf8).alias("B/T/Q"),
+        pl.col("street_type").alias("Type de voie"),
+        (pl.col("street_no") * 7 % 9_000).cast(pl.Utf8).str.zfill(4).alias("Code voie"),
+        ("DE LA " + pl.col("street_type") + " " + pl.col("street_no").cast(pl.Utf8)).alias("Voie"),
+        (pl.col("code_insee").str.slice(0, 2).str.replace("2[AB]", "20") + pl.col("code_insee").str.slice(2, 3)).alias("Code postal"),
+        ("COMMUNE " + pl.col("code_insee")).alias("Commune"),
+        pl.col("code_insee").str.slice(0, 2).alias("Code departement"),
+        pl.col("code_insee").str.slice(2, 3).cast(pl.Int64).cast(pl.Utf8).alias("Code commune"),
+        pl.lit(None, pl.Utf8).alias("Prefixe de section"),
+        pl.lit("AB").alias("Section"),
+        pl.col("plan").cast(pl.Utf8).alias("No plan"),
+        pl.lit(None, pl.Utf8).alias("No Volume"),
+        pl.when(pl.col("type") == "Appartement").then(pl.col("local_rank") + 1).cast(pl.Utf8).alias("1er lot"),
+        pl.when(pl.col("type") == "Appartement")
+        .then(_french_decimal(surface * 100 + pl.col("carrez_cents")))
+        .alias("Surface Carrez du 1er lot"),
+        *[pl.lit(None, pl.Utf8).alias(c) for c in DVF_HEADER[26:34]],
+        pl.when(pl.col("type") == "Appartement").then(pl.lit("1")).otherwise(pl.lit("0")).alias("Nombre de lots"),
+        pl.col("type").replace_strict(type_codes, return_dtype=pl.Int64).cast(pl.Utf8).alias("Code type local"),
+        pl.col("type").alias("Type local"),
+        pl.lit(None, pl.Utf8).alias("Identifiant local"),
+        pl.when((pl.col("missing_surface") & is_main) | (pl.col("type") == "Dépendance"))
+        .then(None).otherwise(surface).cast(pl.Utf8).alias("Surface reelle bati"),
+        pl.when(is_dwelling).then(pl.col("rooms")).otherwise(0).cast(pl.Utf8).alias("Nombre pieces principales"),
+        pl.when(pl.col("type") == "Maison").then(pl.lit("S")).alias("Nature culture"),
+        pl.lit(None, pl.Utf8).alias("Nature culture speciale"),
+        pl.when(pl.col("type") == "Maison").then(pl.col("terrain")).cast(pl.Utf8).alias("Surface terrain"),
+    )
+
+
+def write_dvf_text(df: pl.DataFrame, path: Path) -> Path:
+    """Write DVF-shaped rows as a '|' separated export (no quoting, empty nulls)."""
+    path = Path(path)
+    df.select(DVF_HEADER).write_csv(path, separator="|", quote_style="never", null_value="")
+    return path
+
+
+# ----------------------------
+# Workspace
+# ----------------------------
+
+def generate_inputs(
+    raw_dir: Path,
+    scale: float = 1,
+    seed: int = 0,
+    vertices_per_edge: int = 16,
+    iris_per_side: int = 2,
+    force: bool = False,
+) -> dict:
+    """
+    Write synthetic DVF, ADMIN EXPRESS and IRIS inputs under the config file
+    names (so that a data directory pointing at raw_dir's parent runs as is).
+
+    Inputs are regenerated only when the parameters changed (or force).
+
+    Returns:
+        Generation parameters and sizes (also written to raw_dir/synthetic.json)
+    """
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    n_rows, side = scale_sizes(scale)
+    params = {
+        "scale": scale,
+        "seed": seed,
+        "dvf_rows_target": n_rows,
+        "side": side,
+        "vertices_per_edge": vertices_per_edge,
+        "iris_per_side": iris_per_side,
+    }
+
+    manifest_path = raw_dir / "synthetic.json"
+    outputs = [raw_dir / DVF_RAW_FILE.name, raw_dir / ADMIN_BOUNDARIES_FILE.name, raw_dir / IRIS_BOUNDARIES_FILE.name]
+    if not force and manifest_path.exists() and all(p.exists() for p in outputs):
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("params") == params:
+            logger.info(f"✓ Synthetic inputs up to date ({raw_dir})")
+            return manifest
+
+    logger.info(f"Generating synthetic inputs at scale {scale}× → {raw_dir}")
+    grid = build_polygon_grid(side, vertices_per_edge, iris_per_side, seed)
+    write_admin_express(grid, outputs[1])
+    write_iris_contours(grid, outputs[2])
+
+    dvf = build_dvf_frame(n_rows, grid.code_insee, seed=seed)
+    write_dvf_text(dvf, outputs[0])
+    logger.info(f"✓ DVF: {len(dvf):,} rows ({outputs[0].stat().st_size / 1024 ** 2:.1f} MB)")
+
+    manifest = {
+        "params": params,
+        "dvf_rows": len(dvf),
+        "communes": len(grid.communes),
+        "departments": len(grid.departments),
+        "regions": len(grid.regions),
+        "iris": len(grid.iris),
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic DVF / ADMIN EXPRESS / IRIS inputs")
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--output", type=Path, required=True, help="Directory for the generated raw files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vertices-per-edge", type=int, default=16)
+    parser.add_argument("--iris-per-side", type=int, default=2)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        manifest = generate_inputs(
+            args.output, args.scale, args.seed, args.vertices_per_edge, args.iris_per_side, args.force
+        )
+        logger.info(json.dumps(manifest, indent=2))
+    except Exception as e:
+        logger.error(f"Generation failed: {e}", exc_info=True)
+        sys.exit(1)
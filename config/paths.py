@@ -5,22 +5,36 @@ All file paths used across pipelines should be defined here to ensure
 consistency and make path management easier.
 """
 
+import os
 from pathlib import Path
 
 # Project root directory
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 
-# Main data directories
-DATA_DIR = PROJECT_ROOT / "data"
+# Main data directories ($PIPELINE_DATA_DIR relocates them, e.g. for benchmarks)
+DATA_DIR = Path(os.environ.get("PIPELINE_DATA_DIR") or PROJECT_ROOT / "data")
 RAW_DATA_DIR = DATA_DIR / "raw"
 INTERMEDIATE_DATA_DIR = DATA_DIR / "intermediate"
 MART_DATA_DIR = DATA_DIR / "mart"
+MODELS_DIR = DATA_DIR / "models"
+REPORTS_DIR = DATA_DIR / "reports"
 
 # Pipeline directory
 PIPELINES_DIR = PROJECT_ROOT / "pipelines"
 
-# App directory
-APP_DIR = PROJECT_ROOT / "app"
+# App directory ($PIPELINE_APP_DIR relocates the generated tiles)
+APP_DIR = Path(os.environ.get("PIPELINE_APP_DIR") or PROJECT_ROOT / "app")
+
+# Served tiles: a symlink to the current generation when tiles are published
+# with pipelines/publish_tiles.py, a plain directory when built in place
+APP_CURRENT_TILES_DIR = APP_DIR / "tiles"
+APP_GENERATIONS_DIR = APP_DIR / "generations"
+
+# Where the pipelines write tiles ($PIPELINE_TILES_DIR: a generation being built)
+APP_TILES_DIR = Path(os.environ.get("PIPELINE_TILES_DIR") or APP_CURRENT_TILES_DIR)
+
+# Static web app (map frontend)
+DOCS_DIR = PROJECT_ROOT / "docs"
 
 # Raw data files
 DVF_RAW_FILE = RAW_DATA_DIR / "ValeursFoncieres-2025-S1.txt"
@@ -34,6 +48,18 @@ POSTCODE_HEXASMAL_FILE = RAW_DATA_DIR / "laposte-hexasmal.geojson"
 DVF_CLEAN_FILE = INTERMEDIATE_DATA_DIR / "dvf_clean.parquet"
 DVF_WITH_GEOMETRIES_FILE = INTERMEDIATE_DATA_DIR / "dvf_with_geometries.parquet"
 
+# Commune adjacency graph (CSR arrays, from ADMIN EXPRESS)
+COMMUNE_ADJACENCY_FILE = INTERMEDIATE_DATA_DIR / "commune_adjacency.npz"
+
+# Intermediates spilled to disk by memory-budgeted runs (temporary)
+SPILL_DIR = INTERMEDIATE_DATA_DIR / "spill"
+
+# Repaired / simplified / reprojected geometries (WKB, one file per input + operations hash)
+GEOMETRY_CACHE_DIR = INTERMEDIATE_DATA_DIR / "geometry_cache"
+
+# Nearest-comparable-sales index (one sub-directory per property type)
+COMPARABLES_INDEX_DIR = INTERMEDIATE_DATA_DIR / "comparables"
+
 # Mart data files (aggregated by level)
 MART_COUNTRY_FILE = MART_DATA_DIR / "country.parquet"
 MART_REGION_FILE = MART_DATA_DIR / "region.parquet"
@@ -41,6 +67,18 @@ MART_DEPARTMENT_FILE = MART_DATA_DIR / "department.parquet"
 MART_COMMUNE_FILE = MART_DATA_DIR / "commune.parquet"
 MART_POSTCODE_FILE = MART_DATA_DIR / "postcode.parquet"
 MART_IRIS_FILE = MART_DATA_DIR / "iris.parquet"
+MART_COMMUNE_SMOOTHED_FILE = MART_DATA_DIR / "commune_smoothed.parquet"
+MART_COMMUNE_CODES_FILE = MART_DATA_DIR / "commune_codes.parquet"
+
+# Run reports (one JSON line per instrumented pipeline stage)
+RUN_REPORT_FILE = REPORTS_DIR / "pipeline_runs.jsonl"
+
+# Benchmarks: synthetic workspaces (one data directory per scale) and results history
+BENCHMARKS_DATA_DIR = DATA_DIR / "benchmarks"
+BENCHMARK_HISTORY_FILE = REPORTS_DIR / "benchmark_history.jsonl"
+
+# Model artifacts (one sub-directory per training data hash)
+HEDONIC_MODELS_DIR = MODELS_DIR / "hedonic"
 
 
 def ensure_data_directories():
@@ -50,6 +88,7 @@ def ensure_data_directories():
     RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
     INTERMEDIATE_DATA_DIR.mkdir(parents=True, exist_ok=True)
     MART_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def get_dvf_raw_path() -> Path:
@@ -87,11 +126,18 @@ def get_mart_path(level: str) -> Path:
     Get the path to a mart file for a specific aggregation level.
 
     Args:
-        level: One of 'country', 'region', 'department', 'commune', 'postcode', 'iris'
+        level: One of 'country', 'region', 'department', 'commune', 'postcode', 'iris',
+            or 'h3_<resolution>' (H3 hexagons, resolution 0-15)
 
     Returns:
         Path to the mart file
     """
+    if level.startswith("h3_"):
+        resolution = level[3:]
+        if not (resolution.isdigit() and 0 <= int(resolution) <= 15):
+            raise ValueError(f"Unknown H3 level: {level}. Resolution must be 0-15")
+        return MART_DATA_DIR / f"{level}.parquet"
+
     level_map = {
         "country": MART_COUNTRY_FILE,
         "region": MART_REGION_FILE,
@@ -105,6 +151,101 @@ def get_mart_path(level: str) -> Path:
     return level_map[level]
 
 
+def get_mart_ipc_path(level: str) -> Path:
+    """
+    Get the path to the Arrow IPC copy of a mart file (memory-mapped by the lookup API).
+
+    Args:
+        level: Aggregation level (see get_mart_path)
+
+    Returns:
+        Path to the .arrow mart file
+    """
+    return get_mart_path(level).with_suffix(".arrow")
+
+
+def get_run_report_path() -> Path:
+    """Get the path to the JSON-lines pipeline run report."""
+    return RUN_REPORT_FILE
+
+
+def get_benchmark_workspace_dir(scale: float) -> Path:
+    """
+    Get the synthetic data directory of a benchmark scale.
+
+    Args:
+        scale: Benchmark scale (1, 10, 100, ...)
+
+    Returns:
+        Path used as $PIPELINE_DATA_DIR by the benchmark runs
+    """
+    return BENCHMARKS_DATA_DIR / f"{scale:g}x"
+
+
+def get_benchmark_history_path() -> Path:
+    """Get the path to the JSON-lines benchmark results history."""
+    return BENCHMARK_HISTORY_FILE
+
+
+def get_spill_dir() -> Path:
+    """Get the directory for intermediates spilled to disk under a memory budget."""
+    return SPILL_DIR
+
+
+def get_geometry_cache_path(key: str) -> Path:
+    """
+    Get the cache file of processed geometries.
+
+    Args:
+        key: Hash of the input geometries and operations (see pipelines/geometry_ops.py)
+
+    Returns:
+        Path to the cached WKB Parquet file
+    """
+    return GEOMETRY_CACHE_DIR / f"{key}.parquet"
+
+
+def get_commune_adjacency_path() -> Path:
+    """Get the path to the commune adjacency graph (CSR arrays)."""
+    return COMMUNE_ADJACENCY_FILE
+
+
+def get_commune_codes_path() -> Path:
+    """Get the path to the commune code lookup (code_insee -> DVF department/commune codes)."""
+    return MART_COMMUNE_CODES_FILE
+
+
+def get_smoothed_commune_mart_path() -> Path:
+    """Get the path to the spatially smoothed commune mart."""
+    return MART_COMMUNE_SMOOTHED_FILE
+
+
+def get_comparables_index_dir(property_type: str) -> Path:
+    """
+    Get the directory of the comparable-sales index of one property type.
+
+    Args:
+        property_type: 'Maison' or 'Appartement'
+
+    Returns:
+        Path to the index directory
+    """
+    return COMPARABLES_INDEX_DIR / property_type.lower()
+
+
+def get_hedonic_model_dir(data_hash: str) -> Path:
+    """
+    Get the artifact directory of a hedonic model.
+
+    Args:
+        data_hash: Hash of the training data (see pipelines/hedonic_model.py)
+
+    Returns:
+        Path to the model directory
+    """
+    return HEDONIC_MODELS_DIR / data_hash
+
+
 if __name__ == "__main__":
     # Print all paths for verification
     print("Project paths:")
@@ -113,6 +254,11 @@ if __name__ == "__main__":
     print(f"  RAW_DATA_DIR: {RAW_DATA_DIR}")
     print(f"  INTERMEDIATE_DATA_DIR: {INTERMEDIATE_DATA_DIR}")
     print(f"  MART_DATA_DIR: {MART_DATA_DIR}")
+    print(f"  MODELS_DIR: {MODELS_DIR}")
+    print(f"  REPORTS_DIR: {REPORTS_DIR}")
+    print(f"  APP_CURRENT_TILES_DIR: {APP_CURRENT_TILES_DIR}")
+    print(f"  APP_TILES_DIR: {APP_TILES_DIR}")
+    print(f"  DOCS_DIR: {DOCS_DIR}")
     print(f"\nRaw data files:")
     print(f"  DVF_RAW_FILE: {DVF_RAW_FILE}")
     print(f"  ADMIN_BOUNDARIES_FILE: {ADMIN_BOUNDARIES_FILE}")
@@ -0,0 +1,56 @@
+/*
+ * Data worker of the map app: fetches and decodes tile data off the main thread.
+ *
+ * Messages: { id, type, url } -> { id, result } or { id, error }
+ * - 'stats': Arrow IPC stats sidecar -> { numRows, columns }, one array per
+ *   column (numeric columns without nulls as typed arrays, transferred)
+ * - 'geojson': GeoJSON file (e.g. a department chunk) -> its features
+ */
+importScripts('https://unpkg.com/apache-arrow@17.0.0/Arrow.es2015.min.js');
+
+async function fetchOk(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status} for ${url}`);
+    }
+    return response;
+}
+
+async function decodeStats(url) {
+    const buffer = await (await fetchOk(url)).arrayBuffer();
+    const table = Arrow.tableFromIPC(new Uint8Array(buffer));
+    const columns = {};
+    const transfer = [];
+
+    table.schema.fields.forEach(field => {
+        const vector = table.getChild(field.name);
+        const values = vector.toArray();
+        if (ArrayBuffer.isView(values) && vector.nullCount === 0 && typeof values[0] !== 'bigint') {
+            // Copy out of the shared IPC buffer so each column can be transferred
+            const copy = values.slice();
+            columns[field.name] = copy;
+            transfer.push(copy.buffer);
+        } else {
+            // Strings, and numbers with nulls (null kept instead of a fill value)
+            columns[field.name] = Array.from(vector, value => (typeof value === 'bigint' ? Number(value) : value));
+        }
+    });
+
+    return { result: { numRows: table.numRows, columns }, transfer };
+}
+
+async function decodeGeojson(url) {
+    const collection = await (await fetchOk(url)).json();
+    return { result: collection.features, transfer: [] };
+}
+
+const decoders = { stats: decodeStats, geojson: decodeGeojson };
+
+self.onmessage = async ({ data: { id, type, url } }) => {
+    try {
+        const { result, transfer } = await decoders[type](url);
+        self.postMessage({ id, result }, transfer);
+    } catch (e) {
+        self.postMessage({ id, error: String(e) });
+    }
+};
@@ -8,6 +8,7 @@ Aggregates DVF transaction data to multiple geographic levels:
 - Commune (city)
 - Postcode
 - IRIS (neighborhood) - when available
+- H3 hexagons (several resolutions) - when transaction coordinates are available
 
 For each level + property type, computes:
 - n_sales: number of transactions
@@ -17,6 +18,22 @@ For each level + property type, computes:
 - last_tx_date: most recent transaction date
 
 Only keeps areas with >= MIN_SALES transactions for stability.
+
+Communes are keyed by their INSEE code (code_insee, department + commune, e.g.
+'01053'): DVF commune codes repeat across departments. The communes with
+transactions are also published as a small lookup (data/mart/commune_codes.parquet:
+code_insee -> DVF department, commune and region codes) so that downstream
+stages never rescan the transactions for it.
+
+Under a memory budget ($PIPELINE_MEMORY_BUDGET, see pipelines/memory_budget.py)
+that the transactions would not fit in, they are spilled to a temporary
+Parquet file and every level is aggregated from it with the Polars streaming
+engine; the marts are then returned as lazy scans of the written files.
+
+The run is recorded in the mart build manifest (data/mart/manifest.json, see
+pipelines/build_manifest.py): when the transactions and the boundary file
+have the same content hashes as in the last run, the aggregation is skipped
+and the existing marts are returned as lazy scans.
 """
 
 from __future__ import annotations
@@ -38,10 +55,25 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.paths import (
     get_dvf_clean_path,
+    get_dvf_with_geometries_path,
+    get_admin_boundaries_path,
     get_mart_path,
+    get_mart_ipc_path,
+    get_commune_codes_path,
     ensure_data_directories,
     MART_DATA_DIR,
 )
+from pipelines.spatial_join import COORDINATE_COLUMNS
+from pipelines.instrumentation import instrumented, stage
+from pipelines.build_manifest import BuildManifest
+from pipelines.atomic_files import atomic_output
+from pipelines.memory_budget import (
+    memory_budget,
+    available_bytes,
+    parquet_uncompressed_bytes,
+    release_memory,
+    SpillDirectory,
+)
 
 
 # ----------------------------
@@ -62,6 +94,64 @@ MIN_SALES_BY_LEVEL = {
 # Default fallback
 MIN_SALES_DEFAULT = 10
 
+# H3 hexagon resolutions, finest first: transactions are assigned to the
+# finest cell, coarser cells are its parents (~0.1 km², ~5 km², ~250 km²)
+H3_RESOLUTIONS = [9, 7, 5]
+H3_CELL_COLUMN = "h3_cell"
+
+
+def h3_level(resolution: int) -> str:
+    """Aggregation level name of an H3 resolution (e.g. 7 -> 'h3_7')."""
+    return f"h3_{resolution}"
+
+
+H3_LEVELS = [h3_level(res) for res in H3_RESOLUTIONS]
+
+# Same stability rule as the other fine-grained levels
+MIN_SALES_BY_LEVEL.update({level: 10 for level in H3_LEVELS})
+
+# INSEE commune code (department + commune), the commune area key
+INSEE_CODE_COLUMN = "code_insee"
+
+# Columns of the commune code lookup (get_commune_codes_path)
+COMMUNE_CODE_COLUMNS = [INSEE_CODE_COLUMN, "Code departement", "Code commune", "Code region"]
+
+# Area code column(s) identifying one area at each level
+LEVEL_KEY_COLUMNS = {
+    'country': [],
+    'region': ["Code region"],
+    'department': ["Code departement"],
+    'commune': [INSEE_CODE_COLUMN],
+    'postcode': ["Code postal"],
+    'iris': ["CODE_IRIS"],
+    **{level: [H3_CELL_COLUMN] for level in H3_LEVELS},
+}
+
+# Transaction columns read by the aggregation (area keys, statistics inputs)
+AGGREGATE_INPUT_COLUMNS = [
+    "Type local",
+    "price_m2",
+    "Date mutation",
+    "Code departement",
+    "Code commune",
+    "Code postal",
+    "CODE_IRIS",
+    *COORDINATE_COLUMNS,
+]
+
+# In-memory size of the transactions relative to their uncompressed Parquet
+# size (derived columns, group-by state); above the budget they are spilled
+AGGREGATE_MEMORY_FACTOR = 3.0
+
+# Property types pivoted to per-type columns for the web layers
+PROPERTY_TYPES = ["Appartement", "Maison"]
+
+# Statistics pivoted per property type (e.g. median_price_m2_maison)
+PIVOT_STAT_COLUMNS = ["n_sales", "median_price_m2", "p25_price_m2", "p75_price_m2", "last_tx_date"]
+
+# Stage name in the mart build manifest
+AGGREGATE_STAGE = "aggregate"
+
 
 # ----------------------------
 # Core aggregation logic
@@ -97,6 +187,54 @@ def aggregate_price(
     )
 
 
+def property_type_slug(property_type: str) -> str:
+    """Column suffix used for a property type (e.g. 'Maison' -> 'maison')."""
+    return property_type.lower()
+
+
+def pivot_property_types(df: pl.DataFrame, group_cols: list[str]) -> pl.DataFrame:
+    """
+    Pivot an area × property type aggregation to one row per area.
+
+    Each statistic gets one column per property type (e.g. median_price_m2_maison,
+    median_price_m2_appartement); types without data for an area are null.
+    A total 'n_sales' column (all types) is kept for convenience.
+
+    Args:
+        df: Aggregated dataframe (output of aggregate_price)
+        group_cols: Area columns identifying one row (e.g. ['Code departement'])
+
+    Returns:
+        Dataframe with one row per area and per-type statistics columns
+    """
+    values = [c for c in PIVOT_STAT_COLUMNS if c in df.columns]
+    slugs = [property_type_slug(t) for t in PROPERTY_TYPES]
+
+    wide = (
+        df.filter(pl.col("Type local").is_in(PROPERTY_TYPES))
+        .with_columns(pl.col("Type local").str.to_lowercase())
+        .pivot(on="Type local", index=group_cols, values=values)
+    )
+
+    # Pivot only creates columns for types present in the data
+    per_type_cols = [f"{v}_{slug}" for v in values for slug in slugs]
+    missing = [
+        pl.lit(None, dtype=df.schema[v]).alias(f"{v}_{slug}")
+        for v in values for slug in slugs
+        if f"{v}_{slug}" not in wide.columns
+    ]
+
+    return (
+        wide.with_columns(missing)
+        .with_columns(
+            n_sales=pl.sum_horizontal([f"n_sales_{slug}" for slug in slugs]),
+        )
+        .select(group_cols + ["n_sales"] + per_type_cols)
+        .sort(group_cols)
+    )
+
+
+@instrumented()
 def add_region_code(df: pl.DataFrame) -> pl.DataFrame:
     """
     Add region code using official department-to-region mapping.
@@ -107,7 +245,7 @@ def add_region_code(df: pl.DataFrame) -> pl.DataFrame:
         import geopandas as gpd
 
         # Load official department → region mapping from geometry file
-        gpkg_path = Path(__file__).parent.parent / 'data' / 'raw' / 'ADE_4-0_GPKG_LAMB93_FXX-ED2025-12-05.gpkg'
+        gpkg_path = get_admin_boundaries_path()
         dept_gdf = gpd.read_file(gpkg_path, layer='DEPARTEMENT')
 
         # Extract mapping from 'code_insee_de_la_region' column
@@ -135,6 +273,129 @@ def add_region_code(df: pl.DataFrame) -> pl.DataFrame:
         return df.with_columns(pl.lit(None).alias("Code region"))
 
 
+def insee_code() -> pl.Expr:
+    """
+    INSEE commune code built from the DVF 'Code departement' and 'Code commune'.
+
+    DVF commune codes are not zero padded ('53' in department '01' -> '01053').
+    Overseas departments have three characters and two-digit commune numbers
+    ('971' + '101' or '1' -> '97101').
+    """
+    department = pl.col("Code departement").cast(pl.String).str.zfill(2)
+    commune = pl.col("Code commune").cast(pl.String).str.zfill(3)
+    return (
+        pl.when(department.str.len_chars() == 3)
+        .then(department + commune.str.slice(1))
+        .otherwise(department + commune)
+        .alias(INSEE_CODE_COLUMN)
+    )
+
+
+@instrumented()
+def add_h3_cells(df: pl.DataFrame, resolutions: list[int] = H3_RESOLUTIONS) -> pl.DataFrame:
+    """
+    Assign each transaction to H3 cells from its coordinates.
+
+    The finest resolution is computed from latitude/longitude; coarser ones
+    are derived from it with cell_to_parent, so every cell nests exactly in
+    its parent. Adds one string column per resolution (h3_<res>, hex cell id).
+
+    Args:
+        df: DVF dataframe with COORDINATE_COLUMNS (longitude, latitude)
+        resolutions: H3 resolutions (finest first)
+
+    Returns:
+        DataFrame with h3_<res> columns (null where coordinates are missing)
+    """
+    import polars_h3 as plh3
+
+    lon_col, lat_col = COORDINATE_COLUMNS
+    finest, *coarser = resolutions
+    finest_cell = plh3.latlng_to_cell(
+        pl.col(lat_col).cast(pl.Float64), pl.col(lon_col).cast(pl.Float64), finest
+    )
+
+    return (
+        df.with_columns(finest_cell.alias("_h3_finest"))
+        .with_columns(
+            plh3.int_to_str("_h3_finest").alias(h3_level(finest)),
+            *[plh3.int_to_str(plh3.cell_to_parent("_h3_finest", res)).alias(h3_level(res)) for res in coarser],
+        )
+        .drop("_h3_finest")
+    )
+
+
+@instrumented(labels=("level",))
+def write_mart(df: pl.DataFrame, level: str) -> Path:
+    """
+    Write a mart as Parquet, plus an uncompressed Arrow IPC copy that the
+    lookup API memory-maps.
+
+    Returns:
+        Path to the Parquet mart file
+    """
+    output_path = get_mart_path(level)
+    with atomic_output(output_path) as tmp_path:
+        df.write_parquet(tmp_path)
+    with atomic_output(get_mart_ipc_path(level)) as tmp_path:
+        df.write_ipc(tmp_path, compression="uncompressed")
+    return output_path
+
+
+@instrumented()
+def write_commune_codes(df: pl.DataFrame | pl.LazyFrame) -> Path:
+    """
+    Write the commune code lookup: one row per commune with transactions,
+    code_insee -> 'Code departement', 'Code commune', 'Code region'.
+
+    Args:
+        df: Transactions with the commune and region codes (in memory or lazy)
+
+    Returns:
+        Path to the lookup Parquet file
+    """
+    codes = (
+        df.lazy()
+        .select(COMMUNE_CODE_COLUMNS)
+        .filter(pl.col(INSEE_CODE_COLUMN).is_not_null())
+        .sort(COMMUNE_CODE_COLUMNS, nulls_last=True)
+        .unique(subset=INSEE_CODE_COLUMN, keep="first", maintain_order=True)
+        .collect(engine="streaming")
+    )
+    output_path = get_commune_codes_path()
+    with atomic_output(output_path) as tmp_path:
+        codes.write_parquet(tmp_path)
+    logger.info(f"✓ Saved {len(codes):,} commune codes to {output_path}")
+    return output_path
+
+
+@instrumented("aggregate_price", labels=("level",))
+def aggregate_level(df: pl.DataFrame | pl.LazyFrame, level: str) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Aggregate one level (LEVEL_KEY_COLUMNS / MIN_SALES_BY_LEVEL) and write its mart.
+
+    Args:
+        df: Transactions, in memory or a lazy scan of spilled transactions
+            (aggregated with the streaming engine)
+        level: Aggregation level
+
+    Returns:
+        Aggregated dataframe (a lazy scan of the written mart for lazy input)
+    """
+    agg = aggregate_price(df, LEVEL_KEY_COLUMNS[level], min_sales=MIN_SALES_BY_LEVEL[level])
+    if isinstance(agg, pl.LazyFrame):
+        agg = agg.collect(engine="streaming")
+        output_path = write_mart(agg, level)
+        logger.info(f"✓ Saved {len(agg):,} rows to {output_path}")
+        del agg
+        release_memory()
+        return pl.scan_parquet(output_path)
+
+    output_path = write_mart(agg, level)
+    logger.info(f"✓ Saved {len(agg):,} rows to {output_path}")
+    return agg
+
+
 # ----------------------------
 # Multi-level aggregation
 # ----------------------------
@@ -142,89 +403,150 @@ def add_region_code(df: pl.DataFrame) -> pl.DataFrame:
 def aggregate_all_levels(
     input_path: Path | None = None,
     output_dir: Path | None = None,
-) -> dict[str, pl.DataFrame]:
+    force: bool = False,
+) -> dict[str, pl.DataFrame | pl.LazyFrame]:
     """
     Generate all aggregation levels from cleaned DVF data.
 
     Args:
-        input_path: Path to cleaned DVF parquet file (default: from config)
+        input_path: Path to cleaned DVF parquet file (default: from config;
+            the spatially enriched file with CODE_IRIS is used when it is up to date)
         output_dir: Directory to save mart files (default: from config)
+        force: Aggregate even if the inputs did not change since the last run
 
     Returns:
-        Dictionary mapping level name to aggregated dataframe
+        Dictionary mapping level name to aggregated dataframe (lazy scans of
+        the written marts when the transactions were spilled)
     """
+    with SpillDirectory("aggregate") as spill:
+        return _aggregate_all_levels(input_path, output_dir, spill, force)
+
+
+def _aggregate_all_levels(
+    input_path: Path | None,
+    output_dir: Path | None,
+    spill: SpillDirectory,
+    force: bool = False,
+) -> dict[str, pl.DataFrame | pl.LazyFrame]:
     try:
         # Use centralized paths if not provided
         if input_path is None:
             input_path = get_dvf_clean_path()
+            enriched_path = get_dvf_with_geometries_path()
+            if enriched_path.exists() and enriched_path.stat().st_mtime >= input_path.stat().st_mtime:
+                logger.info("Using spatially enriched transactions (IRIS codes)")
+                input_path = enriched_path
         if output_dir is None:
             output_dir = MART_DATA_DIR
 
         # Ensure output directory exists
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Load cleaned data
-        logger.info(f"Loading cleaned DVF data from {input_path}")
-        df = pl.read_parquet(input_path)
-        logger.info(f"Loaded {len(df):,} transactions")
+        # Skip when the inputs did not change since the last run
+        manifest = BuildManifest(MART_DATA_DIR)
+        inputs = [input_path, get_admin_boundaries_path()]
+        params = {
+            "input": input_path.name,
+            "min_sales": MIN_SALES_BY_LEVEL,
+            "h3_resolutions": H3_RESOLUTIONS,
+        }
+        outputs = None if force else manifest.unchanged(AGGREGATE_STAGE, inputs, params)
+        if outputs is not None:
+            logger.info("⏭️  Transactions unchanged since the last aggregation, using the existing marts")
+            return {name: pl.scan_parquet(path) for name, path in outputs.items() if name in LEVEL_KEY_COLUMNS}
+
+        # Only the columns the aggregation reads
+        schema = pl.read_parquet_schema(input_path)
+        columns = [c for c in AGGREGATE_INPUT_COLUMNS if c in schema]
+
+        budget = memory_budget("aggregate")
+        estimated_bytes = parquet_uncompressed_bytes(input_path, columns) * AGGREGATE_MEMORY_FACTOR
+        if budget is not None and estimated_bytes > available_bytes(budget):
+            # Spill: region and INSEE codes are added while streaming to a temporary
+            # Parquet file, each level is then aggregated from a lazy scan
+            logger.info(
+                f"Transactions (~{estimated_bytes / 1024 ** 2:,.0f} MB) do not fit in the "
+                f"{budget / 1024 ** 2:,.0f} MB memory budget, spilling to {spill.path}"
+            )
+            with stage("spill_transactions", path=input_path.name) as s:
+                spill_path = spill.file("transactions.parquet")
+                (
+                    add_region_code(pl.scan_parquet(input_path).select(columns))
+                    .with_columns(insee_code())
+                    .sink_parquet(spill_path)
+                )
+                df = pl.scan_parquet(spill_path)
+                s.rows = df.select(pl.len()).collect().item()
+            logger.info(f"Spilled {s.rows:,} transactions")
+        else:
+            # Load cleaned data
+            logger.info(f"Loading cleaned DVF data from {input_path}")
+            with stage("load_transactions", path=input_path.name) as s:
+                df = pl.read_parquet(input_path, columns=columns)
+                s.rows = len(df)
+            logger.info(f"Loaded {len(df):,} transactions")
 
-        # Add region code for regional aggregation
-        df = add_region_code(df)
+            # Add region and INSEE codes for the region and commune levels
+            df = add_region_code(df).with_columns(insee_code())
 
         results = {}
 
         # 1. Country level
         logger.info("\nStep 1: Aggregating at COUNTRY level")
-        country_agg = aggregate_price(df, [], min_sales=MIN_SALES_BY_LEVEL['country'])
-        output_path = get_mart_path("country")
-        country_agg.write_parquet(output_path)
-        results["country"] = country_agg
-        logger.info(f"✓ Saved {len(country_agg):,} rows to {output_path}")
+        results["country"] = aggregate_level(df, "country")
 
         # 2. Region level
         logger.info("\nStep 2: Aggregating at REGION level")
-        region_agg = aggregate_price(df, ["Code region"], min_sales=MIN_SALES_BY_LEVEL['region'])
-        output_path = get_mart_path("region")
-        region_agg.write_parquet(output_path)
-        results["region"] = region_agg
-        logger.info(f"✓ Saved {len(region_agg):,} rows to {output_path}")
+        results["region"] = aggregate_level(df, "region")
 
         # 3. Department level
         logger.info("\nStep 3: Aggregating at DEPARTMENT level")
-        department_agg = aggregate_price(df, ["Code departement"], min_sales=MIN_SALES_BY_LEVEL['department'])
-        output_path = get_mart_path("department")
-        department_agg.write_parquet(output_path)
-        results["department"] = department_agg
-        logger.info(f"✓ Saved {len(department_agg):,} rows to {output_path}")
+        results["department"] = aggregate_level(df, "department")
 
         # 4. Commune level
         logger.info("\nStep 4: Aggregating at COMMUNE level")
-        commune_agg = aggregate_price(df, ["Code commune"], min_sales=MIN_SALES_BY_LEVEL['commune'])
-        output_path = get_mart_path("commune")
-        commune_agg.write_parquet(output_path)
-        results["commune"] = commune_agg
-        logger.info(f"✓ Saved {len(commune_agg):,} rows to {output_path}")
+        results["commune"] = aggregate_level(df, "commune")
+        write_commune_codes(df)
 
         # 5. Postcode level
         logger.info("\nStep 5: Aggregating at POSTCODE level")
-        postcode_agg = aggregate_price(df, ["Code postal"], min_sales=MIN_SALES_BY_LEVEL['postcode'])
-        output_path = get_mart_path("postcode")
-        postcode_agg.write_parquet(output_path)
-        results["postcode"] = postcode_agg
-        logger.info(f"✓ Saved {len(postcode_agg):,} rows to {output_path}")
+        results["postcode"] = aggregate_level(df, "postcode")
 
         # 6. IRIS level (if available)
-        if "CODE_IRIS" in df.columns:
+        if "CODE_IRIS" in columns:
             logger.info("\nStep 6: Aggregating at IRIS level")
-            iris_agg = aggregate_price(df, ["CODE_IRIS"], min_sales=MIN_SALES_BY_LEVEL['iris'])
-            output_path = get_mart_path("iris")
-            iris_agg.write_parquet(output_path)
-            results["iris"] = iris_agg
-            logger.info(f"✓ Saved {len(iris_agg):,} rows to {output_path}")
+            results["iris"] = aggregate_level(df, "iris")
         else:
             logger.info("\nStep 6: IRIS level - SKIPPED (CODE_IRIS column not available)")
             logger.info("Run spatial_join.py first to add IRIS codes")
 
+        # 7. H3 hexagon levels (if coordinates available)
+        if all(col in columns for col in COORDINATE_COLUMNS):
+            logger.info(f"\nStep 7: Aggregating at H3 levels (resolutions {H3_RESOLUTIONS})")
+            try:
+                df = add_h3_cells(df)
+            except ImportError:
+                logger.warning("polars-h3 not installed, H3 levels skipped")
+                logger.info("Install with: pip install polars-h3")
+            else:
+                # Transactions without coordinates have no cell (no null-cell group)
+                finest_cell = pl.col(h3_level(H3_RESOLUTIONS[0]))
+                located = df.filter(finest_cell.is_not_null())
+                counts = df.select(pl.len(), finest_cell.is_not_null().sum())
+                if isinstance(counts, pl.LazyFrame):
+                    counts = counts.collect(engine="streaming")
+                n_total, n_located = counts.row(0)
+                logger.info(f"  {n_located:,} of {n_total:,} transactions have coordinates")
+                for level in H3_LEVELS:
+                    results[level] = aggregate_level(located.with_columns(pl.col(level).alias(H3_CELL_COLUMN)), level)
+        else:
+            logger.info("\nStep 7: H3 levels - SKIPPED (transaction coordinates not available)")
+
+        written = {level: get_mart_path(level) for level in results}
+        written.update({f"{level}_ipc": get_mart_ipc_path(level) for level in results})
+        written["commune_codes"] = get_commune_codes_path()
+        manifest.record(AGGREGATE_STAGE, inputs, written, params)
+
         return results
 
     except Exception as e:
@@ -236,13 +558,15 @@ def aggregate_all_levels(
 # Summary statistics
 # ----------------------------
 
-def print_aggregation_summary(results: dict[str, pl.DataFrame]) -> None:
+def print_aggregation_summary(results: dict[str, pl.DataFrame | pl.LazyFrame]) -> None:
     """Print summary statistics for all aggregation levels."""
     logger.info("\n" + "=" * 70)
     logger.info("AGGREGATION SUMMARY")
     logger.info("=" * 70)
 
     for level, df in results.items():
+        if isinstance(df, pl.LazyFrame):
+            df = df.collect()
         logger.info(f"\n{level.upper()}:")
         logger.info(f"  Total areas: {df.select(pl.col('Type local').n_unique()).item():,}")
         logger.info(f"  Total rows (area × property type): {len(df):,}")
@@ -275,7 +599,7 @@ if __name__ == "__main__":
         logger.info("\nMinimum sales thresholds by level:")
         for level, threshold in MIN_SALES_BY_LEVEL.items():
             logger.info(f"  {level:12s}: >= {threshold:3d} sales")
-        logger.info("\nLevels: Country → Region → Department → Commune → Postcode → IRIS")
+        logger.info("\nLevels: Country → Region → Department → Commune → Postcode → IRIS → H3")
 
         # Run aggregation
         results = aggregate_all_levels()
@@ -0,0 +1,72 @@
+"""
+Atomic artifact writes
+
+Every artifact is written to a temporary file next to its destination and
+renamed over it once complete (os.replace, atomic within a filesystem), so a
+reader - the tile server, the price API memory-mapping a mart, a concurrent
+rebuild - sees either the previous file or the new one, never a partial write.
+A failed write leaves the previous file in place and removes the temporary one.
+
+Because files are replaced rather than rewritten, a file hard-linked into
+another tiles generation (pipelines/publish_tiles.py) is never modified
+through the link.
+
+Usage:
+    with atomic_output(get_mart_path("commune")) as tmp_path:
+        df.write_parquet(tmp_path)
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import secrets
+from pathlib import Path
+from contextlib import contextmanager
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def temporary_path(path: Path) -> Path:
+    """
+    Hidden, unique temporary path next to a destination, keeping its suffix
+    (writers such as GDAL pick the format from it).
+    """
+    path = Path(path)
+    return path.with_name(f".{path.stem}.{os.getpid()}-{secrets.token_hex(4)}.tmp{path.suffix}")
+
+
+@contextmanager
+def atomic_output(path: Path):
+    """
+    Context manager yielding a temporary path to write, renamed over `path`
+    when the block succeeds (removed when it raises).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_text_atomic(path: Path, text: str, encoding: str = "utf-8") -> None:
+    """Write a text file atomically."""
+    with atomic_output(path) as tmp_path:
+        tmp_path.write_text(text, encoding=encoding)
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """
+    Atomically place a hard link to `source` at `destination`, or a copy
+    when hard links are not supported (other filesystem).
+    """
+    with atomic_output(destination) as tmp_path:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
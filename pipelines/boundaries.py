@@ -0,0 +1,218 @@
+"""
+Filtered reads of the boundary GeoPackages
+
+Reads go through pyogrio's Arrow interface with their filters pushed down to
+GDAL, so the rows that are filtered out are never decoded:
+- attribute filters: an SQL `where` on code_insee, run by SQLite inside the
+  GeoPackage
+- bbox filters: the extent of the departments being built (from the ADMIN
+  EXPRESS DEPARTEMENT layer), answered from the GeoPackage R-tree index
+
+Features come back as Polars frames: attributes stay in Arrow and geometries
+are a WKB column (GEOMETRY_COLUMN); no geometry object is built until a stage
+needs one (pipelines/geometry_ops.py) or the final write.
+
+The IRIS file covers France entière; overseas IRIS are excluded by the
+metropolitan `where` (and fall outside the metropolitan Lambert-93 extent).
+
+Usage:
+    where = sql_in("code_insee", communes)
+    iris, crs = read_iris_geometries(where=where, bbox=department_bounds(departments))
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_admin_boundaries_path, get_iris_boundaries_path
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Metropolitan departments (01-95 plus 2A, 2B for Corsica); overseas IRIS are not shipped
+METROPOLITAN_DEPARTMENTS = [f'{i:02d}' for i in range(1, 96)] + ['2A', '2B']
+
+# WKB geometry column of the frames returned by the readers
+GEOMETRY_COLUMN = "geometry"
+
+DEPARTMENT_LAYER = "DEPARTEMENT"
+DEPARTMENT_CODE_COLUMN = "code_insee"
+
+
+# ----------------------------
+# Editions
+# ----------------------------
+
+def get_boundary_edition(level: str) -> str:
+    """
+    Get the edition identifier of the boundary file a level is built from.
+
+    Uses the ADMIN EXPRESS edition tag in the file name (e.g. 'ED2025-12-05');
+    falls back to the file size and modification time.
+    """
+    path = get_iris_boundaries_path() if level == "iris" else get_admin_boundaries_path()
+    match = re.search(r"ED\d{4}-\d{2}-\d{2}", path.name)
+    if match:
+        return match.group(0)
+    stat = path.stat()
+    return f"{stat.st_size:x}-{int(stat.st_mtime):x}"
+
+
+# ----------------------------
+# Filters
+# ----------------------------
+
+def sql_in(column: str, values) -> str:
+    """SQL `column IN ('a', 'b', ...)` filter (quotes escaped)."""
+    quoted = ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+    return f"{column} IN ({quoted})"
+
+
+def metropolitan_where(column: str = "code_insee") -> str:
+    """SQL filter keeping the areas of metropolitan departments."""
+    return sql_in(f"substr({column}, 1, 2)", METROPOLITAN_DEPARTMENTS)
+
+
+def department_code(column: str = "code_insee"):
+    """Polars expression: department of an INSEE commune code (3 characters overseas, e.g. 971)."""
+    import polars as pl
+
+    code = pl.col(column).cast(pl.String)
+    return pl.when(code.str.starts_with("97")).then(code.str.slice(0, 3)).otherwise(code.str.slice(0, 2))
+
+
+def department_bounds(departments: list[str] | None = None) -> tuple[float, float, float, float] | None:
+    """
+    Lambert-93 extent of some departments, from ADMIN EXPRESS.
+
+    Args:
+        departments: Department codes (None: all of metropolitan France)
+
+    Returns:
+        (xmin, ymin, xmax, ymax), or None when the ADMIN EXPRESS file or the
+        departments are missing (no bbox filter)
+    """
+    import pyogrio
+
+    path = get_admin_boundaries_path()
+    if not path.exists():
+        return None
+
+    if departments is None:
+        return tuple(pyogrio.read_info(path, layer=DEPARTMENT_LAYER)["total_bounds"])
+
+    _, bounds = pyogrio.read_bounds(path, layer=DEPARTMENT_LAYER, where=sql_in(DEPARTMENT_CODE_COLUMN, departments))
+    if bounds.shape[1] == 0:
+        return None
+    return (
+        float(bounds[0].min()), float(bounds[1].min()),
+        float(bounds[2].max()), float(bounds[3].max()),
+    )
+
+
+# ----------------------------
+# Readers
+# ----------------------------
+
+def read_boundaries(
+    path: Path,
+    layer: str | None = None,
+    columns: list[str] | None = None,
+    where: str | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+):
+    """
+    Boundary features as a Polars frame, read through the Arrow interface.
+
+    Args:
+        path: Vector file (GeoPackage, GeoJSON, ...)
+        layer: Layer name (None: first layer)
+        columns: Attribute columns to read (None: all)
+        where: SQL attribute filter
+        bbox: (xmin, ymin, xmax, ymax) in the file CRS
+
+    Returns:
+        (frame with the attribute columns and a WKB GEOMETRY_COLUMN, CRS of the file)
+    """
+    import pyarrow as pa
+    import pyogrio
+    import polars as pl
+
+    meta, table = pyogrio.read_arrow(path, layer=layer, columns=columns, where=where, bbox=bbox)
+
+    # Plain binary geometry column (its geoarrow.wkb field metadata is dropped)
+    geometry_name = meta["geometry_name"] or "wkb_geometry"
+    names = [GEOMETRY_COLUMN if name == geometry_name else name for name in table.column_names]
+    return pl.from_arrow(pa.Table.from_arrays(table.columns, names=names)), meta["crs"]
+
+
+def read_attributes(
+    path: Path,
+    layer: str | None = None,
+    columns: list[str] | None = None,
+    where: str | None = None,
+):
+    """
+    Layer attributes without geometries.
+
+    Args:
+        path: Vector file
+        layer: Layer name (None: first layer)
+        columns: Attribute columns to read (None: all)
+        where: SQL attribute filter
+
+    Returns:
+        pyarrow Table
+    """
+    import pyogrio
+
+    _, table = pyogrio.read_arrow(path, layer=layer, columns=columns, where=where, read_geometry=False)
+    return table
+
+
+# ----------------------------
+# IRIS
+# ----------------------------
+
+def read_iris_attributes(columns: list[str], where: str | None = None):
+    """
+    IRIS attributes without geometries.
+
+    Args:
+        columns: Attribute columns to read
+        where: SQL attribute filter
+
+    Returns:
+        pyarrow Table
+    """
+    return read_attributes(get_iris_boundaries_path(), columns=columns, where=where)
+
+
+def read_iris_geometries(
+    where: str | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    columns: list[str] | None = None,
+):
+    """
+    IRIS geometries matching an attribute and a bbox filter.
+
+    Args:
+        where: SQL attribute filter
+        bbox: (xmin, ymin, xmax, ymax) in the file CRS (Lambert-93)
+        columns: Attribute columns to read (None: all)
+
+    Returns:
+        (frame of IRIS with a WKB GEOMETRY_COLUMN, CRS of the file)
+    """
+    iris, crs = read_boundaries(get_iris_boundaries_path(), columns=columns, where=where, bbox=bbox)
+    logger.info(f"Read {len(iris):,} IRIS geometries (filtered in the GeoPackage)")
+    return iris, crs
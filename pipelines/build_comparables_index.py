@@ -0,0 +1,290 @@
+"""
+Nearest-comparable-sales index pipeline
+
+Builds, per property type, a KD-tree over the sales of dvf_clean in a scaled
+feature space:
+- x, y: Lambert-93 coordinates (transaction coordinates when the spatial join
+  produced them, commune centroids from ADMIN EXPRESS otherwise), in km
+- log(surface_final), 0.1 ≈ 10% surface difference ~ 1 km
+- sale date, 90 days ~ 1 km
+
+The tree is stored "implicitly" so every artifact is a flat array that can be
+memory-mapped by the query side (server/comparables.py):
+- points.npy       float32 (n, 4), rows reordered so that each tree node
+                   covers a contiguous range (node i -> children 2i+1, 2i+2,
+                   ranges split at their midpoint)
+- split_dim.npy    int8, split dimension of each internal node
+- split_value.npy  float32, split value of each internal node
+- sales.arrow      Arrow IPC table of the sales, in the same row order
+- meta.json        scales, leaf size, depth, coordinate source
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import math
+import logging
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import (
+    get_dvf_clean_path,
+    get_dvf_with_geometries_path,
+    get_admin_boundaries_path,
+    get_comparables_index_dir,
+    ensure_data_directories,
+)
+from pipelines.aggregate import PROPERTY_TYPES, insee_code
+from pipelines.spatial_join import COORDINATE_COLUMNS
+from pipelines.instrumentation import instrumented
+from pipelines.atomic_files import atomic_output, write_text_atomic
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Feature scales: one unit of each scaled feature weighs as much as 1 km
+DISTANCE_SCALE_M = 1_000.0
+SURFACE_LOG_SCALE = 0.1
+DATE_SCALE_DAYS = 90.0
+DATE_ORIGIN = "2020-01-01"
+
+# Maximum number of sales per leaf
+LEAF_SIZE = 32
+
+# Sale columns stored with the index and returned by queries
+SALE_COLUMNS = [
+    "Date mutation",
+    "price_eur",
+    "surface_final",
+    "price_m2",
+    "Nombre pieces principales",
+    "surface_terrain",
+    "No voie",
+    "Type de voie",
+    "Voie",
+    "Code postal",
+    "Commune",
+    "Code departement",
+    "Code commune",
+]
+
+BOUNDARIES_CRS = "EPSG:2154"
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+
+@instrumented()
+def load_sales() -> tuple[pl.DataFrame, str]:
+    """
+    Load residential sales with Lambert-93 coordinates.
+
+    Returns:
+        (sales with 'x', 'y' and 'sale_date' columns, coordinate source)
+    """
+    geo_path = get_dvf_with_geometries_path()
+    df = None
+    if geo_path.exists():
+        df = pl.read_parquet(geo_path)
+        if not all(col in df.columns for col in COORDINATE_COLUMNS):
+            df = None
+    if df is None:
+        df = pl.read_parquet(get_dvf_clean_path())
+
+    df = df.filter(
+        pl.col("Type local").is_in(PROPERTY_TYPES)
+        & (pl.col("surface_final") > 0)
+        & (pl.col("price_m2") > 0)
+    ).with_columns(
+        pl.col("Date mutation").str.strptime(pl.Date, "%d/%m/%Y", strict=False).alias("sale_date"),
+        insee_code(),
+    ).filter(pl.col("sale_date").is_not_null())
+
+    if all(col in df.columns for col in COORDINATE_COLUMNS):
+        from pyproj import Transformer
+
+        df = df.filter(pl.col(COORDINATE_COLUMNS[0]).is_not_null() & pl.col(COORDINATE_COLUMNS[1]).is_not_null())
+        transformer = Transformer.from_crs("EPSG:4326", BOUNDARIES_CRS, always_xy=True)
+        x, y = transformer.transform(
+            df[COORDINATE_COLUMNS[0]].cast(pl.Float64).to_numpy(),
+            df[COORDINATE_COLUMNS[1]].cast(pl.Float64).to_numpy(),
+        )
+        return df.with_columns(x=pl.Series(x), y=pl.Series(y)), "coordinates"
+
+    return df.join(load_commune_centroids(), on="code_insee", how="inner"), "commune_centroids"
+
+
+def load_commune_centroids() -> pl.DataFrame:
+    """Commune centroids (Lambert-93) keyed by code_insee."""
+    import geopandas as gpd
+
+    communes = gpd.read_file(get_admin_boundaries_path(), layer="COMMUNE", columns=["code_insee"])
+    if communes.crs is not None and communes.crs != BOUNDARIES_CRS:
+        communes = communes.to_crs(BOUNDARIES_CRS)
+    centroids = communes.geometry.centroid
+    return pl.DataFrame({
+        "code_insee": communes["code_insee"].astype(str).to_numpy(),
+        "x": centroids.x.to_numpy(),
+        "y": centroids.y.to_numpy(),
+    })
+
+
+def feature_matrix(df: pl.DataFrame) -> np.ndarray:
+    """Scaled (x, y, log surface, date) features as float32 (n, 4)."""
+    return df.select(
+        pl.col("x") / DISTANCE_SCALE_M,
+        pl.col("y") / DISTANCE_SCALE_M,
+        pl.col("surface_final").log() / SURFACE_LOG_SCALE,
+        (pl.col("sale_date") - pl.lit(DATE_ORIGIN).str.to_date()).dt.total_days() / DATE_SCALE_DAYS,
+    ).to_numpy().astype(np.float32)
+
+
+# ----------------------------
+# KD-tree
+# ----------------------------
+
+@instrumented()
+def build_kd_tree(points: np.ndarray, leaf_size: int = LEAF_SIZE) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Build an implicit, balanced KD-tree.
+
+    Node i covers a contiguous row range of the reordered points; its range is
+    split at the midpoint, left rows <= split value <= right rows.
+
+    Args:
+        points: (n, d) array
+        leaf_size: Maximum rows per leaf
+
+    Returns:
+        (row order, split_dim, split_value, depth)
+    """
+    n = len(points)
+    depth = max(0, math.ceil(math.log2(max(n, 1) / leaf_size)))
+    n_internal = 2 ** depth - 1
+
+    order = np.arange(n)
+    split_dim = np.zeros(n_internal, dtype=np.int8)
+    split_value = np.zeros(n_internal, dtype=np.float32)
+    lo = np.zeros(2 * n_internal + 1, dtype=np.int64)
+    hi = np.zeros(2 * n_internal + 1, dtype=np.int64)
+    hi[0] = n
+
+    for node in range(n_internal):
+        start, stop = lo[node], hi[node]
+        mid = (start + stop) // 2
+        lo[2 * node + 1], hi[2 * node + 1] = start, mid
+        lo[2 * node + 2], hi[2 * node + 2] = mid, stop
+        if stop - start < 2:
+            split_value[node] = points[order[start], 0] if stop > start else 0.0
+            continue
+
+        rows = order[start:stop]
+        sub = points[rows]
+        dim = int(np.argmax(sub.max(axis=0) - sub.min(axis=0)))
+        part = np.argpartition(sub[:, dim], mid - start)
+        order[start:stop] = rows[part]
+        split_dim[node] = dim
+        split_value[node] = points[order[mid], dim]
+
+    return order, split_dim, split_value, depth
+
+
+# ----------------------------
+# Build
+# ----------------------------
+
+@instrumented(labels=("property_type",))
+def build_index(df: pl.DataFrame, property_type: str, coordinate_source: str) -> Path:
+    """
+    Build and write the index of one property type.
+
+    Args:
+        df: Sales from load_sales()
+        property_type: 'Maison' or 'Appartement'
+        coordinate_source: 'coordinates' or 'commune_centroids'
+
+    Returns:
+        Index directory
+    """
+    sales = df.filter(pl.col("Type local") == property_type)
+    points = feature_matrix(sales)
+    order, split_dim, split_value, depth = build_kd_tree(points)
+
+    index_dir = get_comparables_index_dir(property_type)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    arrays = {
+        "points.npy": np.ascontiguousarray(points[order]),
+        "split_dim.npy": split_dim,
+        "split_value.npy": split_value,
+    }
+    for name, array in arrays.items():
+        with atomic_output(index_dir / name) as tmp_path:
+            np.save(tmp_path, array)
+
+    columns = [c for c in SALE_COLUMNS if c in sales.columns] + ["code_insee", "x", "y"]
+    with atomic_output(index_dir / "sales.arrow") as tmp_path:
+        sales.select(columns)[order].write_ipc(tmp_path, compression="uncompressed")
+
+    meta = {
+        "property_type": property_type,
+        "n_sales": len(sales),
+        "leaf_size": LEAF_SIZE,
+        "depth": depth,
+        "coordinate_source": coordinate_source,
+        "crs": BOUNDARIES_CRS,
+        "distance_scale_m": DISTANCE_SCALE_M,
+        "surface_log_scale": SURFACE_LOG_SCALE,
+        "date_scale_days": DATE_SCALE_DAYS,
+        "date_origin": DATE_ORIGIN,
+        "last_sale_date": str(sales["sale_date"].max()) if len(sales) else None,
+    }
+    write_text_atomic(index_dir / "meta.json", json.dumps(meta, indent=2))
+
+    logger.info(f"✓ {property_type}: {len(sales):,} sales, depth {depth} → {index_dir}")
+    return index_dir
+
+
+def build_comparables_index(property_types: list[str] = PROPERTY_TYPES) -> list[Path]:
+    """Build the comparable-sales index for each property type."""
+    df, coordinate_source = load_sales()
+    if coordinate_source == "commune_centroids":
+        logger.warning("No transaction coordinates: sales are placed at their commune centroid")
+    return [build_index(df, property_type, coordinate_source) for property_type in property_types]
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    try:
+        ensure_data_directories()
+
+        logger.info("=" * 70)
+        logger.info("COMPARABLE SALES INDEX")
+        logger.info("=" * 70)
+
+        build_comparables_index()
+
+        logger.info("\n✅ Comparable sales index complete!")
+
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}", exc_info=True)
+        sys.exit(1)
@@ -3,10 +3,17 @@ Simplified vector tiles generation using Python only.
 
 This version doesn't require tippecanoe - generates GeoJSON that can be
 served directly or converted later.
+
+Each level is recorded in the build manifest (app/tiles/manifest.json, see
+pipelines/build_manifest.py) with the hashes of its mart and boundary file:
+a level whose inputs did not change since the last build is skipped. The
+files the map fetches are published under content-addressed names listed in
+layers.json.
 """
 
 from __future__ import annotations
 
+import os
 import sys
 import logging
 from pathlib import Path
@@ -24,7 +31,41 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.paths import (
     get_mart_path,
-    PROJECT_ROOT,
+    get_admin_boundaries_path,
+    get_iris_boundaries_path,
+    DATA_DIR,
+    RAW_DATA_DIR,
+    APP_TILES_DIR,
+)
+from pipelines.geojson_writer import (
+    write_geojson,
+    get_coordinate_precision,
+    get_flatgeobuf_path,
+    get_size_report,
+    format_size_report,
+    GeoJSONChunkWriter,
+    CHUNK_INDEX_NAME,
+)
+from pipelines.geometry_ops import GeometryOps, GEOMETRY_OPS_VERSION, process_wkb, union_by_group
+from pipelines.build_manifest import BuildManifest, publish_content_addressed, update_layers_index
+from pipelines.boundaries import (
+    metropolitan_where,
+    department_bounds,
+    department_code,
+    get_boundary_edition,
+    read_attributes,
+    read_boundaries,
+    read_iris_geometries,
+)
+from pipelines.stats_sidecar import build_stats_sidecar, write_stats_sidecar
+from pipelines.instrumentation import instrumented
+from pipelines.aggregate import (
+    pivot_property_types,
+    property_type_slug,
+    PROPERTY_TYPES,
+    H3_LEVELS,
+    H3_CELL_COLUMN,
+    LEVEL_KEY_COLUMNS,
 )
 
 
@@ -32,9 +73,31 @@ from config.paths import (
 # Config
 # ----------------------------
 
-TILES_DIR = PROJECT_ROOT / "data" / "tiles"
-APP_TILES_DIR = PROJECT_ROOT / "app" / "tiles"
-RAW_DIR = PROJECT_ROOT / "data" / "raw"
+TILES_DIR = DATA_DIR / "tiles"
+RAW_DIR = RAW_DATA_DIR
+
+# Static geometry tiles (rebuilt once per boundary edition) and per-period stats sidecars
+GEOMETRY_TILES_DIR = APP_TILES_DIR / "geometry"
+STATS_TILES_DIR = APP_TILES_DIR / "stats"
+
+# Attribute columns kept on geometry-only tiles (besides the 'code' feature id)
+GEOMETRY_NAME_COLUMNS = ["nom_officiel", "nom_iris", "nom_commune"]
+
+# Geometry tiles also split per department (geometry/<level>-<edition>/<dept>.geojson),
+# fetched by the map for the departments in view only
+CHUNKED_LEVELS = ["commune"]
+
+# Derive department and region geometries from the commune layer ('1' to enable):
+# communes are simplified as a coverage and merged per department / region, so
+# the boundaries of nested levels match exactly
+BOUNDARIES_FROM_COMMUNES_ENV = "PIPELINE_BOUNDARIES_FROM_COMMUNES"
+
+# Levels that can be derived from communes: their layer in ADMIN EXPRESS (for
+# the names) and their code column in the COMMUNE layer (current, legacy name)
+DERIVED_LEVELS = {
+    "department": {"layer": "DEPARTEMENT", "group_cols": ["code_insee_du_departement", "INSEE_DEP"]},
+    "region": {"layer": "REGION", "group_cols": ["code_insee_de_la_region", "INSEE_REG"]},
+}
 
 
 # ----------------------------
@@ -45,30 +108,43 @@ def ensure_directories():
     """Create necessary directories for tiles."""
     TILES_DIR.mkdir(parents=True, exist_ok=True)
     APP_TILES_DIR.mkdir(parents=True, exist_ok=True)
+    GEOMETRY_TILES_DIR.mkdir(parents=True, exist_ok=True)
+    STATS_TILES_DIR.mkdir(parents=True, exist_ok=True)
+
 
+def boundaries_from_communes() -> bool:
+    """Whether $PIPELINE_BOUNDARIES_FROM_COMMUNES asks for derived department/region geometries."""
+    return os.environ.get(BOUNDARIES_FROM_COMMUNES_ENV, "").strip().lower() in ("1", "true", "yes")
 
-def load_geometries_simple(level: str):
+
+@instrumented(labels=("level",))
+def load_geometries_simple(level: str, from_communes: bool = False, geometry_cache: bool = True):
     """
     Load geometries from GeoPackage using available tools.
 
     Args:
         level: commune, department, region, or iris
+        from_communes: Simplify communes as a coverage and derive departments
+            and regions from them (load_derived_geometries)
+        geometry_cache: Read/write the geometry processing cache (see geometry_ops)
 
     Returns:
-        Dictionary mapping codes to geometries
+        Tuple of (frame with the layer attributes and a WKB 'geometry'
+        column in EPSG:4326, name of the area code column)
     """
+    if from_communes and level in DERIVED_LEVELS:
+        return load_derived_geometries(level, geometry_cache=geometry_cache)
+
     logger.info(f" Loading {level.upper()} geometries")
 
     try:
-        import geopandas as gpd
-
         if level == "iris":
             # Special handling for IRIS
-            gpkg_path = RAW_DIR / "contours-iris-pe.gpkg"
+            gpkg_path = get_iris_boundaries_path()
             id_col = "code_iris"
             layer = None
         else:
-            gpkg_path = RAW_DIR / "ADE_4-0_GPKG_LAMB93_FXX-ED2025-12-05.gpkg"
+            gpkg_path = get_admin_boundaries_path()
 
             if level == "commune":
                 layer = "COMMUNE"
@@ -82,21 +158,22 @@ def load_geometries_simple(level: str):
             else:
                 raise ValueError(f"Unknown level: {level}")
 
-        # Read GeoPackage layer
+        # Read GeoPackage layer (Arrow attributes + WKB geometries)
         if level == "iris":
-            gdf = gpd.read_file(gpkg_path)
+            # Metropolitan IRIS only: filtered in the GeoPackage (where + bbox)
+            frame, crs = read_iris_geometries(where=metropolitan_where(), bbox=department_bounds())
         else:
-            gdf = gpd.read_file(gpkg_path, layer=layer)
+            frame, crs = read_boundaries(gpkg_path, layer=layer)
 
         # Debug: Show available columns
-        logger.debug(f"Available columns in {layer}: {list(gdf.columns)[:10]}")
+        logger.debug(f"Available columns in {layer}: {list(frame.columns)[:10]}")
 
         # Check if id_col exists, if not try to find it
-        if id_col not in gdf.columns:
+        if id_col not in frame.columns:
             logger.warning(f"Column {id_col} not found!")
             # Try to find a suitable ID column
-            insee_cols = [c for c in gdf.columns if 'INSEE' in c.upper()]
-            code_cols = [c for c in gdf.columns if 'CODE' in c.upper() or 'COM' in c.upper()]
+            insee_cols = [c for c in frame.columns if 'INSEE' in c.upper()]
+            code_cols = [c for c in frame.columns if 'CODE' in c.upper() or 'COM' in c.upper()]
 
             if insee_cols:
                 id_col = insee_cols[0]
@@ -105,38 +182,128 @@ def load_geometries_simple(level: str):
                 id_col = code_cols[0]
                 logger.info(f"Using {id_col} instead")
             else:
-                logger.error(f"Cannot find suitable ID column. Available columns: {list(gdf.columns)}")
+                logger.error(f"Cannot find suitable ID column. Available columns: {list(frame.columns)}")
                 return None, None
 
         # Simplify geometries for web (tolerance in meters, adjust as needed)
-        logger.info("Simplifying geometries")
+        # and convert to WGS84 (EPSG:4326), in parallel chunks (cached)
+        logger.info("Simplifying geometries and converting to WGS84")
         # Use higher tolerance for commune level (more features = more aggressive simplification needed)
         tolerance = 200 if level == "commune" else 100
-        gdf['geometry'] = gdf['geometry'].simplify(tolerance=tolerance, preserve_topology=True)
+        ops = GeometryOps(
+            simplify_tolerance=tolerance, source_crs=crs, target_crs='EPSG:4326', drop_invalid=False,
+            coverage=from_communes and level == "commune",
+        )
+        frame = frame.with_columns(process_wkb(frame['geometry'], ops, cache=geometry_cache))
 
-        # Convert to WGS84 (EPSG:4326) for web
-        logger.info("Converting to WGS84")
-        gdf = gdf.to_crs('EPSG:4326')
+        logger.info(f"✓ Loaded {len(frame):,} geometries with ID column: {id_col}")
 
-        logger.info(f"✓ Loaded {len(gdf):,} geometries with ID column: {id_col}")
-
-        return gdf, id_col
+        return frame, id_col
 
     except ImportError:
-        logger.error("geopandas not installed")
-        logger.info("Install with: pip install geopandas")
+        logger.error("pyogrio not installed")
+        logger.info("Install with: pip install pyogrio")
         return None, None
     except Exception as e:
         logger.error(f"Error loading geometries: {e}", exc_info=True)
         return None, None
 
 
-def create_geojson(level: str):
+@instrumented(labels=("level",))
+def load_derived_geometries(level: str, geometry_cache: bool = True):
+    """
+    Department or region geometries as the union of their simplified communes.
+
+    Only the commune layer is parsed and simplified (as a coverage, cached);
+    each department / region is the coverage union of its communes, computed
+    in parallel and cached, so its boundary runs exactly along commune edges.
+    Names come from the level's own layer (attributes only).
+
+    Args:
+        level: department or region
+        geometry_cache: Read/write the geometry processing cache
+
+    Returns:
+        Tuple of (frame with 'code_insee', 'nom_officiel' and a WKB 'geometry'
+        column in EPSG:4326, name of the area code column)
+    """
+    logger.info(f" Deriving {level.upper()} geometries from communes")
+
+    communes, _ = load_geometries_simple("commune", from_communes=True, geometry_cache=geometry_cache)
+    if communes is None:
+        return None, None
+
+    config = DERIVED_LEVELS[level]
+    group_col = next((c for c in config["group_cols"] if c in communes.columns), None)
+    if group_col is None:
+        logger.error(f"COMMUNE layer has no {level} code column ({', '.join(config['group_cols'])})")
+        return None, None
+
+    frame = union_by_group(
+        communes['geometry'], communes[group_col].cast(pl.String), cache=geometry_cache
+    ).rename({group_col: 'code_insee'})
+
+    names = pl.from_arrow(read_attributes(get_admin_boundaries_path(), layer=config["layer"]))
+    if {'code_insee', 'nom_officiel'} <= set(names.columns):
+        frame = frame.join(
+            names.select(pl.col('code_insee').cast(pl.String), 'nom_officiel'),
+            on='code_insee', how='left', maintain_order='left',
+        )
+
+    logger.info(f"✓ Merged {len(communes):,} communes into {len(frame):,} {level} geometries")
+    return frame, 'code_insee'
+
+
+@instrumented(labels=("level",))
+def load_level_stats(level: str) -> tuple[pl.DataFrame, str]:
+    """
+    Load the aggregated mart for a level and resolve its geometry join key.
+
+    The mart has one row per area × property type; it is pivoted to one row
+    per area with per-type columns (median_price_m2_maison, ...) so that each
+    polygon appears once in the output.
+
+    Args:
+        level: Aggregation level (commune, department, region, h3_<res>)
+
+    Returns:
+        Tuple of (per-area dataframe, name of the area code column)
+    """
+    mart_path = get_mart_path(level)
+    df = pl.read_parquet(mart_path)
+    logger.info(f"Loaded {len(df):,} aggregated areas")
+
+    # Determine join column (communes are keyed by their INSEE code in the mart)
+    if level in ("commune", "department", "region") or level.startswith("h3_"):
+        join_key = LEVEL_KEY_COLUMNS[level][0]
+    else:
+        raise ValueError(f"Unknown level: {level}")
+
+    # One row per area, per-type columns
+    df = pivot_property_types(df, [join_key])
+    logger.info(f"Pivoted to {len(df):,} areas with per-type columns")
+
+    return df, join_key
+
+
+@instrumented(labels=("level",))
+def create_geojson(
+    level: str,
+    precision: int | None = None,
+    delta_encode: bool = False,
+    from_communes: bool = False,
+    geometry_cache: bool = True,
+):
     """
     Create GeoJSON file by joining aggregated data with geometries.
 
     Args:
         level: Aggregation level (commune, department, region)
+        precision: Coordinate decimals to keep (default: per-level setting)
+        delta_encode: Write quantized, delta-encoded coordinates
+        from_communes: Derive department/region geometries from the communes
+        geometry_cache: Read/write the geometry processing cache (False:
+            always reprocess, e.g. for benchmarks)
 
     Returns:
         Path to output GeoJSON file
@@ -145,144 +312,307 @@ def create_geojson(level: str):
 
     try:
         # Load geometries
-        gdf, id_col = load_geometries_simple(level)
-        if gdf is None:
+        geometries, id_col = load_geometries_simple(
+            level, from_communes=from_communes, geometry_cache=geometry_cache
+        )
+        if geometries is None:
             return None
 
         # Load aggregated data
-        mart_path = get_mart_path(level)
-        df = pl.read_parquet(mart_path)
-        logger.info(f"Loaded {len(df):,} aggregated areas")
-
-        # For commune level, we need to construct full INSEE codes
-        # since aggregated data only has commune code, not full INSEE
-        if level == "commune":
-            # Load the clean DVF data to get the mapping of commune + department
-            from config.paths import get_dvf_clean_path
-            dvf_clean = pl.read_parquet(get_dvf_clean_path())
-
-            # Get unique commune + department mapping
-            insee_mapping = (
-                dvf_clean
-                .select(['Code commune', 'Code departement'])
-                .unique()
-                .with_columns(
-                    (pl.col('Code departement').cast(str).str.zfill(2) +
-                     pl.col('Code commune').cast(str).str.zfill(3))
-                    .alias('code_insee')
-                )
+        df, join_key = load_level_stats(level)
+
+        logger.debug(f"Join column in geometry: {id_col}")
+        logger.debug(f"Join column in data: {join_key}")
+
+        # Join in Polars on the area code, compared as strings: the geometry
+        # uses 'code_insee' (or INSEE_*), the data 'Code departement'/'Code region'/etc.
+        # Geometries stay WKB, the data side keeps its key column
+        logger.info("Joining data with geometries")
+        joined = (
+            geometries.select(pl.col(id_col).cast(pl.String).alias('join_code'), 'geometry')
+            .join(
+                df.with_columns(pl.col(join_key).cast(pl.String).alias('join_code')),
+                on='join_code', how='inner', maintain_order='left',
             )
+            .drop('join_code')
+        )
 
-            logger.info(f"Created INSEE code mapping for {len(insee_mapping):,} communes")
+        logger.info(f"Joined {len(joined):,} areas with geometries")
 
-            # Join the mapping with aggregated data
-            df = df.join(insee_mapping, on='Code commune', how='left')
-            logger.info(f"Mapped {df.filter(pl.col('code_insee').is_not_null()).height:,} areas to INSEE codes")
+        # Select only essential columns for web visualization
+        # This significantly reduces file size
+        essential_columns = [
+            join_key,           # Geographic identifier (code_insee, Code departement, etc)
+            'n_sales',          # Number of transactions (all types)
+        ]
+        for property_type in PROPERTY_TYPES:
+            slug = property_type_slug(property_type)
+            essential_columns += [
+                f'n_sales_{slug}',          # Number of transactions
+                f'median_price_m2_{slug}',  # Median price per m²
+                f'p25_price_m2_{slug}',     # 25th percentile
+                f'p75_price_m2_{slug}',     # 75th percentile
+            ]
+        essential_columns.append('geometry')  # Geometry (required)
 
-        # Determine join column
-        if level == "commune":
-            join_key = "code_insee"  # Use the full INSEE code we just created
-        elif level == "department":
-            join_key = "Code departement"
-        elif level == "region":
-            join_key = "Code region"
-        else:
-            raise ValueError(f"Unknown level: {level}")
+        # Filter to only columns that exist
+        columns_to_keep = [col for col in essential_columns if col in joined.columns]
+        joined = joined.select(columns_to_keep)
 
-        # Convert polars to pandas for joining
-        df_pandas = df.to_pandas()
+        logger.info(f"Reduced to {len(columns_to_keep)} essential columns")
 
-        # Debug: print column names
-        logger.debug(f"Geometry columns: {list(gdf.columns)[:5]}")
-        logger.debug(f"Data columns: {list(df_pandas.columns)[:5]}")
-        logger.debug(f"Join column in geometry: {id_col}")
-        logger.debug(f"Join column in data: {join_key}")
+        # Save as GeoJSON (+ .gz/.br siblings)
+        if precision is None:
+            precision = get_coordinate_precision(level)
+        output_path = APP_TILES_DIR / f"{level}.geojson"
+        sizes = write_geojson(joined, output_path, precision=precision, delta_encode=delta_encode, flatgeobuf=True)
 
-        # Ensure the geometry ID column exists
-        if id_col not in gdf.columns:
-            logger.warning(f"{id_col} not found in geometry. Available columns: {list(gdf.columns)}")
-            # Try to find a similar column
-            possible_cols = [c for c in gdf.columns if 'INSEE' in c or 'COM' in c]
-            if possible_cols:
-                id_col = possible_cols[0]
-                logger.info(f"Using {id_col} instead")
+        logger.info(f"✓ Saved {output_path.name} ({format_size_report(sizes)}, {precision} decimals)")
 
-        # Create standardized join columns
-        # The key insight: geometry uses 'code_insee', data uses 'Code departement'/'Code region'/etc
-        # We need to ensure they match on the SAME column with the SAME name
+        return output_path
 
-        gdf_for_join = gdf.copy()
+    except Exception as e:
+        logger.error(f"Error creating GeoJSON for {level}: {e}", exc_info=True)
+        return None
 
-        # For department/region: rename geometry's code_insee to match the data's column name
-        if level in ["department", "region"]:
-            # Geometry has 'code_insee', data has 'Code departement' or 'Code region'
-            # Create a common join column
-            gdf_for_join['join_code'] = gdf_for_join[id_col].astype(str)
-            df_pandas['join_code'] = df_pandas[join_key].astype(str)
-            actual_join_key = 'join_code'
-        else:
-            # For commune, we already created 'code_insee' in both
-            gdf_for_join['join_code'] = gdf_for_join[id_col].astype(str)
-            df_pandas['join_code'] = df_pandas[join_key].astype(str)
-            actual_join_key = 'join_code'
 
-        # Debug: Show sample values
-        logger.debug(f"Sample geometry IDs: {gdf_for_join['join_code'].head(3).tolist()}")
-        logger.debug(f"Sample data IDs: {df_pandas['join_code'].head(3).tolist()}")
+def h3_cells_to_frame(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Build hexagon polygons from H3 cell ids (no geometry file needed).
 
-        # Join on the common column
-        logger.info("Joining data with geometries")
-        gdf_joined = gdf_for_join.merge(df_pandas, on=actual_join_key, how='inner')
+    Args:
+        df: Dataframe with an H3_CELL_COLUMN of hex cell ids
 
-        # Drop the temporary join column
-        if 'join_code' in gdf_joined.columns:
-            gdf_joined = gdf_joined.drop(columns=['join_code'])
+    Returns:
+        The dataframe with a WKB 'geometry' column (EPSG:4326); rows without
+        a cell id (marts built from transactions without coordinates) are dropped
+    """
+    import shapely
+    import polars_h3 as plh3
 
-        logger.info(f"Joined {len(gdf_joined):,} areas with geometries")
+    df = df.filter(pl.col(H3_CELL_COLUMN).is_not_null())
+    boundaries = df.select(plh3.cell_to_boundary(plh3.str_to_int(H3_CELL_COLUMN)))[H3_CELL_COLUMN].to_list()
+    geometries = [shapely.Polygon([(lng, lat) for lat, lng in ring]) for ring in boundaries]
+    return df.with_columns(geometry=pl.Series(shapely.to_wkb(geometries), dtype=pl.Binary))
 
-        # Select only essential columns for web visualization
-        # This significantly reduces file size
-        essential_columns = [
-            join_key,           # Geographic identifier (Code commune, Code departement, etc)
-            'Type local',       # Property type (Maison/Appartement)
-            'n_sales',          # Number of transactions
-            'median_price_m2',  # Median price per m²
-            'p25_price_m2',     # 25th percentile
-            'p75_price_m2',     # 75th percentile
-            'geometry'          # Geometry (required)
-        ]
 
-        # Filter to only columns that exist
-        columns_to_keep = [col for col in essential_columns if col in gdf_joined.columns]
-        gdf_joined = gdf_joined[columns_to_keep]
+@instrumented(labels=("level",))
+def create_h3_geojson(level: str, precision: int | None = None, delta_encode: bool = False):
+    """
+    Create the GeoJSON of an H3 level; hexagons are generated from the cell ids.
 
-        logger.info(f"Reduced to {len(columns_to_keep)} essential columns")
+    Args:
+        level: H3 aggregation level (e.g. 'h3_7')
+        precision: Coordinate decimals to keep (default: per-level setting)
+        delta_encode: Write quantized, delta-encoded coordinates
 
-        # Save as GeoJSON
-        output_path = APP_TILES_DIR / f"{level}.geojson"
-        gdf_joined.to_file(output_path, driver='GeoJSON')
+    Returns:
+        Path to output GeoJSON file
+    """
+    logger.info(f"\n⬡  Creating GeoJSON for {level.upper()}")
+
+    try:
+        df, join_key = load_level_stats(level)
+        cells = h3_cells_to_frame(df)
 
-        # Get file size
-        size_mb = output_path.stat().st_size / (1024 * 1024)
-        logger.info(f"✓ Saved {output_path.name} ({size_mb:.2f} MB)")
+        columns_to_keep = [join_key, 'n_sales']
+        for property_type in PROPERTY_TYPES:
+            slug = property_type_slug(property_type)
+            columns_to_keep += [f'n_sales_{slug}', f'median_price_m2_{slug}', f'p25_price_m2_{slug}', f'p75_price_m2_{slug}']
+        cells = cells.select([c for c in columns_to_keep if c in cells.columns] + ['geometry'])
+
+        if precision is None:
+            precision = get_coordinate_precision(level)
+        output_path = APP_TILES_DIR / f"{level}.geojson"
+        sizes = write_geojson(cells, output_path, precision=precision, delta_encode=delta_encode, flatgeobuf=True)
 
+        logger.info(f"✓ Saved {output_path.name} ({len(cells):,} cells, {format_size_report(sizes)})")
         return output_path
 
+    except ImportError:
+        logger.warning("polars-h3 not installed, H3 tiles skipped")
+        logger.info("Install with: pip install polars-h3")
+        return None
     except Exception as e:
         logger.error(f"Error creating GeoJSON for {level}: {e}", exc_info=True)
         return None
 
 
+@instrumented(labels=("level",))
+def create_geometry_tiles(level: str, force: bool = False, from_communes: bool = False):
+    """
+    Create the static geometry-only GeoJSON for a level, keyed by area code.
+
+    The file name carries the boundary edition, so it is only rebuilt when the
+    boundaries change (or when force=True). Features have a 'code' property used
+    as feature id by the frontend (promoteId) to join the stats sidecar.
+    CHUNKED_LEVELS are also written per department, in a directory named
+    after the file (see GeoJSONChunkWriter).
+
+    Args:
+        level: Aggregation level (commune, department, region)
+        force: Rebuild even if the file for this edition already exists
+        from_communes: Coverage-simplified communes and derived departments/regions
+            (a separate '-coverage' file)
+
+    Returns:
+        Path to output GeoJSON file
+    """
+    edition = get_boundary_edition(level)
+    suffix = "-coverage" if from_communes and level != "iris" else ""
+    output_path = GEOMETRY_TILES_DIR / f"{level}-{edition}{suffix}.geojson"
+
+    chunk_dir = output_path.with_suffix("") if level in CHUNKED_LEVELS else None
+    built = output_path.exists() and get_flatgeobuf_path(output_path).exists()
+    if chunk_dir is not None:
+        built = built and (chunk_dir / CHUNK_INDEX_NAME).exists()
+
+    if built and not force:
+        logger.info(f"⏭️  {output_path.name} already built for edition {edition}, skipping")
+        return output_path
+
+    logger.info(f"\n🧩 Creating geometry tiles for {level.upper()} (edition {edition})")
+
+    try:
+        geometries, id_col = load_geometries_simple(level, from_communes=from_communes)
+        if geometries is None:
+            return None
+
+        name_cols = [c for c in GEOMETRY_NAME_COLUMNS if c in geometries.columns]
+        geometries = geometries.select(pl.col(id_col).cast(pl.String).alias('code'), *name_cols, 'geometry')
+
+        sizes = write_geojson(geometries, output_path, precision=get_coordinate_precision(level), flatgeobuf=True)
+        logger.info(f"✓ Saved {output_path.name} ({format_size_report(sizes)})")
+
+        if chunk_dir is not None:
+            with GeoJSONChunkWriter(chunk_dir, 'department', precision=get_coordinate_precision(level)) as chunks:
+                chunks.write(geometries.with_columns(department_code('code').alias('department')))
+            logger.info(f"✓ Saved {len(chunks.chunks)} department chunks to {chunk_dir.name}/")
+
+        return output_path
+
+    except Exception as e:
+        logger.error(f"Error creating geometry tiles for {level}: {e}", exc_info=True)
+        return None
+
+
+@instrumented(labels=("level",))
+def create_stats_sidecar(level: str):
+    """
+    Create the Arrow IPC statistics sidecar for a level, keyed by area code.
+
+    Args:
+        level: Aggregation level (commune, department, region)
+
+    Returns:
+        Path to output .arrow file
+    """
+    logger.info(f"\n📊 Creating stats sidecar for {level.upper()}")
+
+    try:
+        df, join_key = load_level_stats(level)
+        sidecar = build_stats_sidecar(df, join_key)
+
+        output_path = STATS_TILES_DIR / f"{level}.arrow"
+        sizes = write_stats_sidecar(sidecar, output_path)
+        logger.info(f"✓ Saved {output_path.name} ({len(sidecar):,} rows, {format_size_report(sizes)})")
+
+        return output_path
+
+    except Exception as e:
+        logger.error(f"Error creating stats sidecar for {level}: {e}", exc_info=True)
+        return None
+
+
+def publish_layer_files(level: str, geometry_path: Path, stats_path: Path) -> dict[str, Path]:
+    """
+    Publish the files the map fetches for a level under content-addressed
+    names: geometry, stats sidecar, and the FlatGeobuf copy and department
+    chunk index of the geometry when there are some.
+
+    Args:
+        level: Aggregation level
+        geometry_path: Geometry tiles path
+        stats_path: Stats sidecar path
+
+    Returns:
+        File kind ('geometry', 'stats', 'flatgeobuf', 'chunks') -> published path
+    """
+    files = {"geometry": geometry_path, "stats": stats_path}
+    flatgeobuf_path = get_flatgeobuf_path(geometry_path)
+    if flatgeobuf_path.exists():
+        files["flatgeobuf"] = flatgeobuf_path
+    chunk_index_path = geometry_path.with_suffix("") / CHUNK_INDEX_NAME
+    if level in CHUNKED_LEVELS and chunk_index_path.exists():
+        files["chunks"] = chunk_index_path
+
+    return {kind: publish_content_addressed(path) for kind, path in files.items()}
+
+
+def level_inputs(level: str) -> list[Path]:
+    """Files a level's tiles are built from (its mart, and its boundary file unless H3)."""
+    if level in H3_LEVELS:
+        return [get_mart_path(level)]
+    boundary_path = get_iris_boundaries_path() if level == "iris" else get_admin_boundaries_path()
+    return [get_mart_path(level), boundary_path]
+
+
+def build_level_tiles(level: str, delta_encode: bool = False, from_communes: bool = False) -> dict[str, Path] | None:
+    """
+    Create the tiles of a level: its GeoJSON and, for boundary levels, the
+    geometry tiles and stats sidecar, published for the map.
+
+    Args:
+        level: Aggregation level
+        delta_encode: Write quantized, delta-encoded coordinates
+        from_communes: Derive department/region geometries from the communes
+
+    Returns:
+        Output name -> path ('geojson'; 'geometry', 'stats' and the published
+        'layer_<kind>' files for boundary levels), or None if a step failed
+    """
+    if level in H3_LEVELS:
+        # Hexagons are derived from the cell ids: no separate geometry tiles
+        geojson_path = create_h3_geojson(level, delta_encode=delta_encode)
+        return {"geojson": geojson_path} if geojson_path else None
+
+    geojson_path = create_geojson(level, delta_encode=delta_encode, from_communes=from_communes)
+
+    # Static geometry (once per boundary edition) + per-period stats sidecar
+    geometry_path = create_geometry_tiles(level, from_communes=from_communes)
+    stats_path = create_stats_sidecar(level)
+    if not (geojson_path and geometry_path and stats_path):
+        return None
+
+    published = publish_layer_files(level, geometry_path, stats_path)
+    return {
+        "geojson": geojson_path,
+        "geometry": geometry_path,
+        "stats": stats_path,
+        **{f"layer_{kind}": path for kind, path in published.items()},
+    }
+
+
 # ----------------------------
 # Main pipeline
 # ----------------------------
 
-def build_geojson_tiles(levels: list[str] | None = None):
+@instrumented()
+def build_geojson_tiles(
+    levels: list[str] | None = None,
+    delta_encode: bool = False,
+    from_communes: bool | None = None,
+    force: bool = False,
+):
     """
     Build GeoJSON files for specified levels.
 
     Args:
         levels: List of levels to process (default: ['commune'])
+        delta_encode: Write quantized, delta-encoded coordinates
+        from_communes: Derive department/region geometries from the commune
+            layer (default: $PIPELINE_BOUNDARIES_FROM_COMMUNES)
+        force: Rebuild the levels whose inputs did not change since the last build
     """
     try:
         logger.info("=" * 70)
@@ -295,15 +625,50 @@ def build_geojson_tiles(levels: list[str] | None = None):
         # Default to commune only
         if levels is None:
             levels = ['commune']
+        if from_communes is None:
+            from_communes = boundaries_from_communes()
+        if from_communes:
+            logger.info("Department and region geometries derived from the commune layer")
 
         logger.info(f"\n📍 Processing levels: {', '.join(levels)}")
 
         results = {}
+        layers = {}
+        manifest = BuildManifest(APP_TILES_DIR)
 
         for level in levels:
-            geojson_path = create_geojson(level)
-            if geojson_path:
-                results[level] = geojson_path
+            stage_name = f"tiles_{level}"
+            inputs = level_inputs(level)
+            params = {
+                "delta_encode": delta_encode,
+                "from_communes": from_communes,
+                "precision": get_coordinate_precision(level),
+                "geometry_ops_version": GEOMETRY_OPS_VERSION,
+            }
+
+            outputs = None if force else manifest.unchanged(stage_name, inputs, params)
+            if outputs is not None:
+                logger.info(f"\n⏭️  {level.upper()}: inputs unchanged since the last build, skipping")
+            else:
+                outputs = build_level_tiles(level, delta_encode=delta_encode, from_communes=from_communes)
+                if outputs is None:
+                    continue
+                extra = [get_flatgeobuf_path(outputs["geojson"])]
+                if "geometry" in outputs:
+                    extra += [get_flatgeobuf_path(outputs["geometry"])]
+                    if level in CHUNKED_LEVELS:
+                        extra += [outputs["geometry"].with_suffix("")]
+                manifest.record(stage_name, inputs, outputs, params, extra=extra)
+
+            results[level] = outputs["geojson"]
+            published = {name[len("layer_"):]: path for name, path in outputs.items() if name.startswith("layer_")}
+            if published:
+                layers[level] = {kind: path.relative_to(APP_TILES_DIR).as_posix() for kind, path in published.items()}
+
+        if layers:
+            index_path = update_layers_index(APP_TILES_DIR, layers)
+            manifest.record("layers_index", [], {"index": index_path})
+            logger.info(f"✓ Saved {index_path.name} ({len(layers)} levels)")
 
         # Summary
         logger.info("\n" + "=" * 70)
@@ -312,8 +677,8 @@ def build_geojson_tiles(levels: list[str] | None = None):
 
         if results:
             for level, path in results.items():
-                size_mb = path.stat().st_size / (1024 * 1024)
-                logger.info(f"  ✓ {level.upper()}: {path.name} ({size_mb:.2f} MB)")
+                sizes = get_size_report(path)
+                logger.info(f"  ✓ {level.upper()}: {path.name} ({format_size_report(sizes)})")
 
             logger.info("\n" + "=" * 70)
             logger.info("✅ GeoJSON files generated!")
@@ -342,5 +707,8 @@ def build_geojson_tiles(levels: list[str] | None = None):
 
 if __name__ == "__main__":
     # Generate multiple levels for zoom-based switching
-    build_geojson_tiles(['commune', 'department', 'region'])
+    # (+ H3 hexagon levels when their marts exist)
+    h3_levels = [level for level in H3_LEVELS if get_mart_path(level).exists()]
+    results = build_geojson_tiles(['commune', 'department', 'region'] + h3_levels)
+    sys.exit(0 if results else 1)
 
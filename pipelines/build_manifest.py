@@ -0,0 +1,316 @@
+"""
+Build manifests: content hashes of what each stage read and wrote
+
+Each output root (data/mart/, app/tiles/) has a manifest.json:
+- "outputs": every file written under the root, by relative path, with its
+  sha256 and size (the tile server serves these hashes as strong ETags)
+- "stages": per stage, the hashes of its inputs, its parameters and the
+  outputs it produced
+
+A stage whose inputs (by content) and parameters match its last run, and
+whose outputs are still on disk unchanged, is skipped (BuildManifest.unchanged).
+Hashes are reused while a file's size and mtime are unchanged, so an
+unchanged multi-GB input is not read again.
+
+Files the map fetches are also published under content-addressed names
+(stats/commune.3f2a9c1b04de.arrow, with their .gz/.br siblings) that can be
+cached forever by browsers and CDNs; layers.json, the one fixed name the map
+starts from, points to them. The last CONTENT_ADDRESSED_VERSIONS versions of
+each file are kept: a map opened before a rebuild still holds the previous
+layers.json and fetches levels and chunks from it lazily.
+
+Usage:
+    manifest = BuildManifest(APP_TILES_DIR)
+    outputs = manifest.unchanged("iris", inputs, params)
+    if outputs is None:
+        ...
+        manifest.record("iris", inputs, {"geojson": output_path}, params)
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pipelines.atomic_files import link_or_copy, write_text_atomic
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+MANIFEST_NAME = "manifest.json"
+
+# Index of the published tile files, read by the map (fixed name)
+LAYERS_INDEX_NAME = "layers.json"
+
+# Hex digits of the sha256 kept in content-addressed names
+CONTENT_HASH_LENGTH = 12
+
+# Pre-compressed siblings published and recorded together with a file
+SIBLING_SUFFIXES = (".gz", ".br")
+
+# Content-addressed versions of a file kept on disk, the current one included
+CONTENT_ADDRESSED_VERSIONS = 3
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+# ----------------------------
+# Hashing
+# ----------------------------
+
+def file_sha256(path: Path) -> str:
+    """sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_entry(path: Path, previous: dict | None = None) -> dict:
+    """
+    Manifest entry of a file (sha256, size, mtime_ns); the previous entry's
+    hash is reused when the size and mtime did not change.
+    """
+    stat = Path(path).stat()
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return previous
+    return {"sha256": file_sha256(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _with_siblings(path: Path) -> list[Path]:
+    """A file (or every file under a directory) plus its pre-compressed siblings."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    siblings = [path.with_name(path.name + suffix) for suffix in SIBLING_SUFFIXES]
+    return [path] + [p for p in siblings if p.exists()]
+
+
+# ----------------------------
+# Content-addressed names
+# ----------------------------
+
+def content_addressed_path(path: Path, sha256: str) -> Path:
+    """Content-addressed name of a file (stats/commune.arrow -> stats/commune.<hash>.arrow)."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{sha256[:CONTENT_HASH_LENGTH]}{path.suffix}")
+
+
+def content_addressed_pattern(path: Path) -> re.Pattern:
+    """Names of the content-addressed versions of a file and of their siblings."""
+    path = Path(path)
+    return re.compile(
+        rf"{re.escape(path.stem)}\.[0-9a-f]{{{CONTENT_HASH_LENGTH}}}{re.escape(path.suffix)}"
+        rf"({'|'.join(re.escape(s) for s in SIBLING_SUFFIXES)})?"
+    )
+
+
+def prune_content_addressed(
+    path: Path,
+    current: Path | None = None,
+    keep: int = CONTENT_ADDRESSED_VERSIONS,
+) -> list[Path]:
+    """
+    Remove the oldest content-addressed versions of a file (with their
+    siblings), keeping the newest `keep` by modification time.
+
+    Args:
+        path: Fixed name of the file (stats/commune.arrow)
+        current: Version that is always kept (the one just published)
+        keep: Versions kept, `current` included
+
+    Returns:
+        Removed files
+    """
+    path = Path(path)
+    pattern = content_addressed_pattern(path)
+
+    # Content-addressed name -> its files (the version and its siblings)
+    versions: dict[str, list[Path]] = {}
+    for file in path.parent.iterdir() if path.parent.exists() else []:
+        match = pattern.fullmatch(file.name)
+        if match:
+            versions.setdefault(file.name.removesuffix(match.group(1) or ""), []).append(file)
+
+    current_name = Path(current).name if current is not None else None
+    newest_first = sorted(
+        versions,
+        key=lambda name: (name == current_name, max(f.stat().st_mtime_ns for f in versions[name])),
+        reverse=True,
+    )
+    removed = [file for name in newest_first[keep:] for file in versions[name]]
+    for file in removed:
+        file.unlink(missing_ok=True)
+    return removed
+
+
+def publish_content_addressed(path: Path, move: bool = False) -> Path:
+    """
+    Hard-link (or move) a file and its pre-compressed siblings to its
+    content-addressed name, and remove versions older than the last
+    CONTENT_ADDRESSED_VERSIONS.
+
+    A hard link is safe because writers replace files rather than rewrite
+    them (pipelines/atomic_files.py): rebuilding the fixed name leaves the
+    published copy untouched.
+
+    Args:
+        path: File to publish
+        move: Rename instead of copying (the fixed name disappears)
+
+    Returns:
+        Content-addressed path
+    """
+    path = Path(path)
+    target = content_addressed_path(path, file_sha256(path))
+
+    for source in _with_siblings(path):
+        destination = target.with_name(target.name + source.name[len(path.name):])
+        if move:
+            source.replace(destination)
+        elif not destination.exists():
+            link_or_copy(source, destination)
+
+    prune_content_addressed(path, current=target)
+    return target
+
+
+def update_layers_index(root: Path, entries: dict[str, dict]) -> Path:
+    """
+    Merge level entries (file kind -> path relative to root) into the layers
+    index read by the map.
+
+    Returns:
+        Path to the index file
+    """
+    index_path = Path(root) / LAYERS_INDEX_NAME
+    index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+    index.update(entries)
+    write_text_atomic(index_path, json.dumps(index, indent=2, sort_keys=True))
+    return index_path
+
+
+# ----------------------------
+# Manifest
+# ----------------------------
+
+class BuildManifest:
+    """
+    manifest.json of an output root: output hashes and the last run of each stage.
+
+    Every record() re-reads the file before writing it, so stages run by
+    different pipelines (build_geojson.py, generate_iris.py) do not drop each
+    other's entries.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self.data = self._load()
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            data = {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable build manifest {self.path}: {e}")
+            data = {}
+        data.setdefault("outputs", {})
+        data.setdefault("stages", {})
+        return data
+
+    def _relative(self, path: Path) -> str:
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def _input_entries(self, stage: str, inputs: list[Path]) -> dict[str, dict | None]:
+        previous = self.data["stages"].get(stage, {}).get("inputs", {})
+        return {
+            str(path): file_entry(path, previous.get(str(path))) if Path(path).exists() else None
+            for path in inputs
+        }
+
+    @staticmethod
+    def _params(params: dict | None) -> dict:
+        return json.loads(json.dumps(params or {}, sort_keys=True, default=str))
+
+    def unchanged(self, stage: str, inputs: list[Path], params: dict | None = None) -> dict[str, Path] | None:
+        """
+        Outputs of the last run of a stage, if it can be skipped.
+
+        Args:
+            stage: Stage name
+            inputs: Files the stage reads
+            params: Settings the outputs depend on (JSON-serializable)
+
+        Returns:
+            Output name -> path of the last run, or None when the stage must
+            run (never run, inputs or params changed, outputs missing or modified)
+        """
+        last = self.data["stages"].get(stage)
+        if last is None or last.get("params") != self._params(params):
+            return None
+
+        hashes = {path: entry and entry["sha256"] for path, entry in self._input_entries(stage, inputs).items()}
+        if hashes != {path: entry and entry["sha256"] for path, entry in last.get("inputs", {}).items()}:
+            return None
+
+        outputs = {name: self.root / rel for name, rel in last.get("outputs", {}).items()}
+        for path in outputs.values():
+            if not path.exists():
+                return None
+            for file in _with_siblings(path):
+                recorded = self.data["outputs"].get(self._relative(file))
+                if recorded is None or file_entry(file, recorded)["sha256"] != recorded["sha256"]:
+                    return None
+        return outputs
+
+    def record(
+        self,
+        stage: str,
+        inputs: list[Path],
+        outputs: dict[str, Path],
+        params: dict | None = None,
+        extra: list[Path] | None = None,
+    ) -> None:
+        """
+        Record a finished stage and the hashes of its outputs, then save.
+
+        Args:
+            stage: Stage name
+            inputs: Files the stage read
+            outputs: Output name -> file or directory written under the root
+            params: Settings the outputs depend on
+            extra: Other files written by the stage (e.g. content-addressed copies)
+        """
+        input_entries = self._input_entries(stage, inputs)
+        self.data = self._load()
+
+        written = [file for path in list(outputs.values()) + list(extra or []) for file in _with_siblings(path)]
+        for file in written:
+            rel = self._relative(file)
+            self.data["outputs"][rel] = file_entry(file, self.data["outputs"].get(rel))
+        self.data["outputs"] = {
+            rel: entry for rel, entry in sorted(self.data["outputs"].items()) if (self.root / rel).exists()
+        }
+
+        self.data["stages"][stage] = {
+            "inputs": input_entries,
+            "params": self._params(params),
+            "outputs": {name: self._relative(path) for name, path in outputs.items()},
+        }
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest (to a temporary file renamed over it)."""
+        write_text_atomic(self.path, json.dumps(self.data, indent=2, sort_keys=True))
@@ -10,6 +10,9 @@ Generates PMTiles for efficient web mapping visualization:
 Outputs:
 - GeoJSON intermediate files (data/tiles/*.geojson)
 - PMTiles for web (app/tiles/*.pmtiles)
+
+tippecanoe is skipped for a level whose GeoJSON has the same content hash
+(and options) as in the last run recorded in app/tiles/manifest.json.
 """
 
 from __future__ import annotations
@@ -33,7 +36,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.paths import (
     get_mart_path,
     PROJECT_ROOT,
+    APP_TILES_DIR,
 )
+from pipelines.build_manifest import BuildManifest
+from pipelines.atomic_files import atomic_output
 
 
 # ----------------------------
@@ -41,7 +47,6 @@ from config.paths import (
 # ----------------------------
 
 TILES_DIR = PROJECT_ROOT / "data" / "tiles"
-APP_TILES_DIR = PROJECT_ROOT / "app" / "tiles"
 
 # Layer configuration
 LEVELS_CONFIG = {
@@ -140,7 +145,7 @@ def join_with_geometry(level: str, config: dict) -> Path:
 
         # Prepare join key based on level
         if level == "commune":
-            join_key = "Code commune"
+            join_key = "code_insee"
         elif level == "department":
             join_key = "Code departement"
         elif level == "region":
@@ -181,33 +186,33 @@ def join_with_geometry(level: str, config: dict) -> Path:
 
         logger.info(f"✓ Exported geometries to {temp_geojson.name}")
 
-        # Now join using geopandas (if available) or create a simplified version
+        # Now join in Polars (geometries stay WKB) and write with GDAL from Arrow
         try:
-            import geopandas as gpd
+            from pipelines.boundaries import read_boundaries
+            from pipelines.geojson_writer import write_gdal_geojson
 
             # Load geometry
-            gdf = gpd.read_file(temp_geojson)
-
-            # Load data
-            df_pandas = df.to_pandas()
+            geometries, crs = read_boundaries(temp_geojson)
 
-            # Rename join column in geodataframe to match
-            gdf = gdf.rename(columns={config["join_col"]: join_key})
+            # Rename join column in geometries to match (same type as the data)
+            geometries = geometries.rename({config["join_col"]: join_key}).with_columns(
+                pl.col(join_key).cast(df.schema[join_key], strict=False)
+            )
 
             # Join
-            gdf_joined = gdf.merge(df_pandas, on=join_key, how="inner")
+            joined = geometries.join(df, on=join_key, how="inner", maintain_order="left")
 
             # Select relevant columns
             cols = [join_key, "Type local", "n_sales", "median_price_m2",
                     "p25_price_m2", "p75_price_m2", "last_tx_date", "geometry"]
-            gdf_joined = gdf_joined[[c for c in cols if c in gdf_joined.columns]]
+            joined = joined.select([c for c in cols if c in joined.columns])
 
             # Save to GeoJSON
-            gdf_joined.to_file(geojson_path, driver="GeoJSON")
-            logger.info(f"✓ Created {geojson_path.name} with {len(gdf_joined):,} features")
+            write_gdal_geojson(joined, geojson_path, crs=crs)
+            logger.info(f"✓ Created {geojson_path.name} with {len(joined):,} features")
 
         except ImportError:
-            logger.warning("geopandas not available, using simplified approach")
+            logger.warning("pyogrio not available, using simplified approach")
             # Fallback: just copy the geometry file for now
             import shutil
             shutil.copy(temp_geojson, geojson_path)
@@ -237,24 +242,36 @@ def generate_pmtiles(level: str, geojson_path: Path, config: dict) -> Path:
 
         output_path = APP_TILES_DIR / f"{level}.pmtiles"
 
-        cmd = [
-            "tippecanoe",
-            "-o", str(output_path),
-            "--force",  # Overwrite if exists
+        options = [
             "-Z", str(config["min_zoom"]),
             "-z", str(config["max_zoom"]),
             "--drop-densest-as-needed",
             "--extend-zooms-if-still-dropping",
             "-l", level,  # Layer name
-            str(geojson_path),
         ]
+        # Same GeoJSON content and options as the last run: keep the PMTiles
+        manifest = BuildManifest(APP_TILES_DIR)
+        stage_name = f"pmtiles_{level}"
+        params = {"options": options}
+        if manifest.unchanged(stage_name, [geojson_path], params) is not None:
+            logger.info(f"⏭️  {output_path.name} is up to date (same GeoJSON), skipping tippecanoe")
+            return output_path
 
         logger.info("Running tippecanoe")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            logger.error(f"Error generating PMTiles: {result.stderr}")
-            return None
+        with atomic_output(output_path) as tmp_path:
+            cmd = [
+                "tippecanoe",
+                "-o", str(tmp_path),
+                "--force",  # Overwrite if exists
+                *options,
+                str(geojson_path),
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+
+            if result.returncode != 0:
+                raise RuntimeError(f"Error generating PMTiles: {result.stderr}")
+
+        manifest.record(stage_name, [geojson_path], {"pmtiles": output_path}, params)
 
         # Get file size
         size_mb = output_path.stat().st_size / (1024 * 1024)
@@ -27,6 +27,8 @@ logger = logging.getLogger(__name__)
 # Add project root to path to import config
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.paths import get_dvf_raw_path, get_dvf_clean_path, ensure_data_directories
+from pipelines.instrumentation import instrumented, stage
+from pipelines.atomic_files import atomic_output
 
 
 # ----------------------------
@@ -90,6 +92,7 @@ def parse_float_fr(expr: pl.Expr) -> pl.Expr:
 # Load
 # ----------------------------
 
+@instrumented()
 def load_dvf(path: str | Path) -> pl.DataFrame:
     """
     Load DVF CSV robustly:
@@ -122,6 +125,7 @@ def load_dvf(path: str | Path) -> pl.DataFrame:
 # Transform
 # ----------------------------
 
+@instrumented()
 def add_mutation_id(df: pl.DataFrame) -> pl.DataFrame:
     """
     Build a stable mutation key. DVF does not always provide a unique transaction id.
@@ -147,6 +151,7 @@ def add_mutation_id(df: pl.DataFrame) -> pl.DataFrame:
     )
 
 
+@instrumented()
 def filter_residential_sales(df: pl.DataFrame) -> pl.DataFrame:
     """
     Keep only existing residential sales:
@@ -173,6 +178,7 @@ def filter_residential_sales(df: pl.DataFrame) -> pl.DataFrame:
     )
 
 
+@instrumented()
 def select_main_local(df: pl.DataFrame) -> pl.DataFrame:
     """
     DVF often has multiple rows per mutation (annexes, multiple parcels, etc.).
@@ -185,6 +191,7 @@ def select_main_local(df: pl.DataFrame) -> pl.DataFrame:
     )
 
 
+@instrumented()
 def compute_price_m2(df: pl.DataFrame) -> pl.DataFrame:
     """
     Compute €/m² and apply plausibility bounds with robust outlier removal.
@@ -224,6 +231,7 @@ def compute_price_m2(df: pl.DataFrame) -> pl.DataFrame:
 # Public API
 # ----------------------------
 
+@instrumented()
 def build_clean_transactions(path: str | Path) -> pl.DataFrame:
     """
     End-to-end: DVF raw -> clean transaction-level €/m² table.
@@ -267,7 +275,9 @@ if __name__ == "__main__":
 
         # Save the cleaned data
         output_path = get_dvf_clean_path()
-        df_clean.write_parquet(output_path)
+        with stage("write_clean", path=output_path.name) as s, atomic_output(output_path) as tmp_path:
+            df_clean.write_parquet(tmp_path)
+            s.rows = len(df_clean)
         logger.info(f"✅ Cleaned data saved to: {output_path}")
 
     except Exception as e:
@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
 """
 Generate IRIS-level GeoJSON tiles.
+
+Each IRIS carries its own statistics from data/mart/iris.parquet (built by
+aggregate.py from CODE_IRIS assignments). IRIS without enough sales fall back
+to their commune statistics; IRIS with neither are not shipped.
+
+Also writes app/tiles/iris.fgb (FlatGeobuf with a spatial index), one file
+per department under app/tiles/iris/ (with an index.json of their bounding
+boxes) that the map fetches for the departments in view, and the statistics
+alone as an Arrow IPC sidecar (app/tiles/stats/iris.arrow, keyed by code_iris)
+that the map applies through feature-state. The files the map fetches are
+published under content-addressed names (the "iris" entry of layers.json).
+
+The run is recorded in the build manifest (app/tiles/manifest.json) with the
+hashes of the marts and the IRIS GeoPackage, and skipped when they did not
+change since the last build.
 """
 
 import logging
 import sys
 from pathlib import Path
+from dataclasses import asdict, replace
+
+import polars as pl
 
 # Configure logging
 logging.basicConfig(
@@ -15,152 +33,383 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main():
+# Add project root to path to import shared pipeline helpers
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pipelines.geojson_writer import (
+    GeoJSONBatchWriter,
+    GeoJSONChunkWriter,
+    get_coordinate_precision,
+    get_flatgeobuf_path,
+    format_size_report,
+)
+from pipelines.aggregate import MIN_SALES_BY_LEVEL
+from config.paths import get_mart_path, get_iris_boundaries_path, APP_TILES_DIR
+from pipelines.boundaries import (
+    department_code,
+    sql_in,
+    metropolitan_where,
+    department_bounds,
+    read_iris_attributes,
+    read_iris_geometries,
+)
+from pipelines.geometry_ops import GeometryOps, GEOMETRY_OPS_VERSION, process_wkb
+from pipelines.build_manifest import BuildManifest, publish_content_addressed, update_layers_index
+from pipelines.instrumentation import instrumented, stage
+from pipelines.memory_budget import memory_budget, plan_batch, observed_bytes_per_unit, release_memory
+from pipelines.stats_sidecar import build_stats_sidecar, write_stats_sidecar
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Statistics carried by each IRIS feature
+IRIS_STAT_COLUMNS = [
+    'n_sales',
+    'median_price_m2',
+    'p25_price_m2',
+    'p75_price_m2',
+    'last_tx_date',
+    'Type local',
+]
+
+# Peak memory of one IRIS while it is read, repaired, reprojected and
+# serialized, relative to its share of the GeoPackage (refined from the
+# measured peak RSS after each batch)
+IRIS_MEMORY_FACTOR = 8.0
+
+# Repair + reprojection of the shipped IRIS (no simplification; source CRS from the file)
+IRIS_GEOMETRY_OPS = GeometryOps(repair=True, target_crs='EPSG:4326')
+
+# Stage name in the build manifest
+IRIS_STAGE = "tiles_iris"
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+@instrumented(labels=("key_col",))
+def combine_property_types(df: pl.DataFrame, key_col: str) -> pl.DataFrame:
+    """
+    Combine the per-property-type rows of a mart into one row per area.
+
+    - percentiles weighted by number of sales (approximation of the pooled values)
+    - dominant property type = the one with the most sales
+
+    Args:
+        df: Mart dataframe (one row per area × property type)
+        key_col: Area code column
+
+    Returns:
+        Dataframe with one row per area and IRIS_STAT_COLUMNS
+    """
+    def sales_weighted(col: str) -> pl.Expr:
+        return ((pl.col(col) * pl.col('n_sales')).sum() / pl.col('n_sales').sum()).alias(col)
+
+    return (
+        df.filter(pl.col(key_col).is_not_null())
+        .group_by(key_col)
+        .agg(
+            pl.col('n_sales').sum(),
+            sales_weighted('median_price_m2'),
+            sales_weighted('p25_price_m2'),
+            sales_weighted('p75_price_m2'),
+            pl.col('last_tx_date').max(),
+            pl.col('Type local').get(pl.col('n_sales').arg_max()),
+        )
+    )
+
+
+@instrumented()
+def attach_iris_stats(
+    iris_keys: pl.DataFrame,
+    iris_stats: pl.DataFrame | None,
+    commune_stats: pl.DataFrame,
+    min_sales: int = MIN_SALES_BY_LEVEL['iris'],
+) -> pl.DataFrame:
+    """
+    Resolve the statistics of every IRIS, falling back to its commune.
+
+    Args:
+        iris_keys: One row per IRIS with 'code_iris' and 'code_insee'
+        iris_stats: IRIS statistics keyed by 'code_iris' (None if no IRIS mart)
+        commune_stats: Commune statistics keyed by 'code_insee'
+        min_sales: Minimum IRIS sales to use the IRIS's own statistics
+
+    Returns:
+        One row per IRIS having statistics, with IRIS_STAT_COLUMNS and a
+        'stats_level' column ('iris' or 'commune')
+    """
+    if iris_stats is None:
+        iris_stats = commune_stats.clear().rename({'code_insee': 'code_iris'})
+
+    iris_stats = iris_stats.filter(pl.col('n_sales') >= min_sales)
+
+    return (
+        iris_keys
+        .join(iris_stats, on='code_iris', how='left')
+        .join(commune_stats, on='code_insee', how='left', suffix='_commune')
+        .with_columns(
+            stats_level=pl.when(pl.col('n_sales').is_not_null()).then(pl.lit('iris'))
+            .when(pl.col('n_sales_commune').is_not_null()).then(pl.lit('commune'))
+        )
+        .with_columns([
+            pl.when(pl.col('stats_level') == 'iris').then(pl.col(c)).otherwise(pl.col(f'{c}_commune')).alias(c)
+            for c in IRIS_STAT_COLUMNS
+        ])
+        .filter(pl.col('stats_level').is_not_null())
+        .select(['code_iris'] + IRIS_STAT_COLUMNS + ['stats_level'])
+    )
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+
+def load_area_stats() -> tuple[pl.DataFrame, pl.DataFrame | None]:
+    """
+    Per-area statistics of the commune and IRIS marts (one row per area).
+
+    Returns:
+        (commune statistics keyed by code_insee, IRIS statistics keyed by
+        code_iris or None when the IRIS mart does not exist)
+    """
+    # Load commune data
+    logger.info("Loading commune aggregation")
+    commune_df = pl.read_parquet(get_mart_path('commune'))
+    logger.info(f"Loaded {len(commune_df):,} commune aggregations")
+
+    # One row per commune (the mart has one row per commune × property type),
+    # keyed by code_insee like the IRIS
+    commune_agg = combine_property_types(commune_df, 'code_insee')
+    logger.info(f"Reduced to {len(commune_agg):,} unique communes")
+
+    # Load IRIS data (real transaction-level statistics)
+    iris_mart_path = get_mart_path('iris')
+    if iris_mart_path.exists():
+        logger.info("Loading IRIS aggregation")
+        iris_df = pl.read_parquet(iris_mart_path).rename({'CODE_IRIS': 'code_iris'})
+        iris_agg = combine_property_types(iris_df, 'code_iris')
+        logger.info(f"Loaded {len(iris_agg):,} IRIS with own statistics")
+    else:
+        logger.warning(f"{iris_mart_path} not found, all IRIS fall back to commune statistics")
+        logger.info("Run spatial_join.py then aggregate.py to build it")
+        iris_agg = None
+
+    return commune_agg, iris_agg
+
+
+def read_iris_keys() -> pl.DataFrame:
+    """
+    IRIS codes of metropolitan France, read without geometries.
+
+    Returns:
+        One row per IRIS with 'code_iris', 'code_insee' and 'dept'
+    """
+    # Overseas IRIS are filtered in the GeoPackage, never read
+    metro = pl.from_arrow(
+        read_iris_attributes(['code_iris', 'code_insee'], where=metropolitan_where())
+    ).with_columns(pl.col('code_insee').str.slice(0, 2).alias('dept'))
+    logger.info(f"Read {len(metro):,} metropolitan IRIS codes")
+    return metro
+
+
+@instrumented()
+def load_iris_geometries(departments: list[str], communes: list[str]):
+    """
+    Load the IRIS geometries (Lambert-93) of some communes.
+
+    The commune filter runs in the GeoPackage (SQL `where`), the departments'
+    extent through its spatial index (bbox): IRIS outside them are never decoded.
+
+    Args:
+        departments: Department codes of the batch
+        communes: INSEE codes of the communes to read (those with data)
+
+    Returns:
+        (frame of IRIS with a WKB 'geometry' column, CRS of the file)
+    """
+    return read_iris_geometries(where=sql_in('code_insee', communes), bbox=department_bounds(departments))
+
+
+@instrumented()
+def prepare_iris_geometries(
+    iris: pl.DataFrame, crs: str, iris_stats: pl.DataFrame, geometry_cache: bool = True
+) -> pl.DataFrame:
+    """
+    Repair, reproject and attach statistics to IRIS geometries.
+
+    Args:
+        iris: IRIS frame with a WKB 'geometry' column
+        crs: CRS of the geometries (Lambert-93)
+        iris_stats: Resolved statistics (see attach_iris_stats)
+        geometry_cache: Read/write the geometry processing cache
+
+    Returns:
+        IRIS having statistics and a valid geometry, WKB in WGS84
+    """
+    # Only IRIS that will be shipped are repaired and reprojected
+    iris = iris.filter(pl.col('code_iris').is_in(iris_stats['code_iris'].implode()))
+
+    # Repair invalid geometries and convert to WGS84 WITHOUT simplification
+    # (parallel chunks, cached); still-invalid or empty results come back null
+    logger.info("Repairing and converting to WGS84 (no simplification)")
+    with stage("reproject_iris") as s:
+        ops = replace(IRIS_GEOMETRY_OPS, source_crs=crs)
+        iris = iris.with_columns(process_wkb(iris['geometry'], ops, cache=geometry_cache))
+        s.rows = len(iris)
+
+    # Each IRIS matches at most once (stats are one row per IRIS)
+    iris_with_data = iris.join(iris_stats, on='code_iris', how='inner', maintain_order='left')
+
+    # Filter out any invalid geometries
+    initial_count = len(iris_with_data)
+    iris_with_data = iris_with_data.filter(pl.col('geometry').is_not_null())
+    if initial_count != len(iris_with_data):
+        logger.info(f"Removed {initial_count - len(iris_with_data)} invalid geometries")
+
+    return iris_with_data
+
+
+# ----------------------------
+# Main
+# ----------------------------
+
+def main(force: bool = False, geometry_cache: bool = True):
+    """
+    Generate the IRIS tiles.
+
+    Args:
+        force: Rebuild even if the inputs did not change since the last build
+        geometry_cache: Read/write the geometry processing cache (False:
+            always reprocess, e.g. for benchmarks)
+
+    Returns:
+        True on success
+    """
     logger.info("="*70)
     logger.info("GENERATING IRIS TILES")
     logger.info("="*70)
 
     try:
-        import geopandas as gpd
-        import polars as pl
-
-        # Load IRIS geometries
-        logger.info("Loading IRIS geometries")
-        iris_gdf = gpd.read_file('data/raw/contours-iris-pe.gpkg')
-        logger.info(f"Loaded {len(iris_gdf):,} IRIS geometries")
-        logger.info(f"CRS: {iris_gdf.crs}")
-
-        # Filter to ONLY metropolitan France (exclude overseas territories)
-        # Metropolitan France departments: 01-19, 2A, 2B, 21-95
-        # Exclude: 971 (Guadeloupe), 972 (Martinique), 973 (Guyane), 974 (Réunion), 976 (Mayotte)
-        logger.info("Filtering to metropolitan France only")
-
-        # Extract department code from code_insee (first 2-3 characters)
-        iris_gdf['dept'] = iris_gdf['code_insee'].str[:2]
-
-        # Metropolitan departments (01-95 plus 2A, 2B for Corsica)
-        metropolitan_depts = set([f'{i:02d}' for i in range(1, 96)]) | {'2A', '2B'}
-
-        iris_metro = iris_gdf[iris_gdf['dept'].isin(metropolitan_depts)].copy()
-
-        logger.info(f"Filtered from {len(iris_gdf):,} to {len(iris_metro):,} IRIS")
-        logger.info(f"Removed {len(iris_gdf) - len(iris_metro):,} overseas IRIS")
-
-        # Drop the temporary dept column
-        iris_metro = iris_metro.drop(columns=['dept'])
-        iris_gdf = iris_metro
-
-        logger.debug(f"Geometry types: {iris_gdf.geometry.type.value_counts().to_dict()}")
-
-        # Check for invalid geometries BEFORE conversion
-        logger.info("Validating original geometries")
-        invalid_before = (~iris_gdf.geometry.is_valid).sum()
-        if invalid_before > 0:
-            logger.warning(f"Found {invalid_before} invalid geometries, attempting to fix...")
-            iris_gdf['geometry'] = iris_gdf.geometry.buffer(0)  # Fix invalid geometries
-            invalid_after = (~iris_gdf.geometry.is_valid).sum()
-            logger.info(f"Fixed, {invalid_after} invalid remaining")
-        else:
-            logger.info("All geometries valid")
-
-        # Convert to WGS84 WITHOUT simplification
-        logger.info("Converting to WGS84 (no simplification)")
-        iris_gdf = iris_gdf.to_crs('EPSG:4326')
-        logger.info(f"Converted {len(iris_gdf):,} IRIS to WGS84")
-
-        # Load commune data
-        logger.info("Loading commune aggregation")
-        commune_df = pl.read_parquet('data/mart/commune.parquet')
-        logger.info(f"Loaded {len(commune_df):,} commune aggregations")
-
-        # Create INSEE mapping
-        logger.info("Creating INSEE code mapping")
-        dvf_clean = pl.read_parquet('data/intermediate/dvf_clean.parquet')
-        insee_mapping = (
-            dvf_clean
-            .select(['Code commune', 'Code departement'])
-            .unique()
-            .with_columns(
-                (pl.col('Code departement').cast(str).str.zfill(2) +
-                 pl.col('Code commune').cast(str).str.zfill(3))
-                .alias('code_insee')
-            )
-        )
-        logger.info(f"✓ Created INSEE mapping for {len(insee_mapping):,} communes")
-
-        # Join
-        logger.info("\n🗺️  Joining data")
-        commune_with_insee = commune_df.join(insee_mapping, on='Code commune', how='left')
-        commune_pandas = commune_with_insee.to_pandas()
-
-        logger.debug(f"Commune data shape: {commune_pandas.shape}")
-        logger.debug(f"IRIS geometries: {len(iris_gdf)}")
-
-        # IMPORTANT: Group commune data by code_insee to avoid duplicates
-        # Each commune has multiple rows (one per property type)
-        # We need to aggregate to avoid duplicate IRIS geometries
-        logger.info("\n🔄 Deduplicating commune data")
-
-        # Aggregate the statistics across property types
-        # Also keep track of the dominant property type
-        def get_dominant_type(series):
-            """Get the property type with more sales"""
-            if len(series) == 0:
-                return 'Mixed'
-            type_counts = {}
-            for idx in series.index:
-                prop_type = commune_pandas.loc[idx, 'Type local']
-                n_sales = commune_pandas.loc[idx, 'n_sales']
-                type_counts[prop_type] = type_counts.get(prop_type, 0) + n_sales
-            return max(type_counts, key=type_counts.get) if type_counts else 'Mixed'
-
-        commune_agg = commune_pandas.groupby('code_insee').agg({
-            'Code commune': 'first',
-            'n_sales': 'sum',  # Total sales across both types
-            'median_price_m2': 'mean',  # Average median price
-            'p25_price_m2': 'mean',
-            'p75_price_m2': 'mean',
-            'last_tx_date': 'max',
-            'Type local': lambda x: get_dominant_type(x)  # Dominant property type
-        }).reset_index()
-
-        logger.info(f"Reduced to {len(commune_agg):,} unique communes")
-
-        # Filter IRIS to only include those from communes we have data for
-        logger.info("\n🔍 Filtering IRIS to communes with data")
-        communes_with_data = set(commune_agg['code_insee'].values)
-        iris_filtered = iris_gdf[iris_gdf['code_insee'].isin(communes_with_data)].copy()
-        logger.info(f"Filtered from {len(iris_gdf):,} to {len(iris_filtered):,} IRIS")
-        logger.info(f"Removed {len(iris_gdf) - len(iris_filtered):,} IRIS without data")
-
-        # Now join - each IRIS will only match once
-        iris_with_data = iris_filtered.merge(commune_agg, on='code_insee', how='inner')
-        logger.info(f"✓ Joined: {len(iris_with_data):,} IRIS with data")
-
-        if len(iris_with_data) == 0:
+        budget = memory_budget("generate_iris")
+        if budget is not None:
+            logger.info(f"Memory budget: {budget / 1024 ** 2:,.0f} MB (department batches)")
+
+        manifest = BuildManifest(APP_TILES_DIR)
+        inputs = [get_mart_path('commune'), get_mart_path('iris'), get_iris_boundaries_path()]
+        params = {
+            'precision': get_coordinate_precision('iris'),
+            'min_sales': MIN_SALES_BY_LEVEL['iris'],
+            'geometry_ops': asdict(IRIS_GEOMETRY_OPS),
+            'geometry_ops_version': GEOMETRY_OPS_VERSION,
+        }
+        outputs = None if force else manifest.unchanged(IRIS_STAGE, inputs, params)
+        if outputs is not None:
+            logger.info("⏭️  Marts and IRIS boundaries unchanged since the last build, skipping")
+            index_path = update_layers_index(APP_TILES_DIR, {'iris': {
+                name[len('layer_'):]: path.relative_to(APP_TILES_DIR).as_posix()
+                for name, path in outputs.items() if name.startswith('layer_')
+            }})
+            manifest.record("layers_index", [], {"index": index_path})
+            return True
+
+        commune_agg, iris_agg = load_area_stats()
+
+        # IRIS codes only (no geometries), metropolitan France
+        logger.info("Loading IRIS codes")
+        with stage("load_iris_keys") as s:
+            iris_keys = read_iris_keys()
+            s.rows = len(iris_keys)
+
+        # Resolve stats per IRIS: own stats, else commune stats, else dropped
+        logger.info("\n🔍 Resolving IRIS statistics (fallback to commune)")
+        iris_stats = attach_iris_stats(iris_keys.select(['code_iris', 'code_insee']), iris_agg, commune_agg)
+
+        level_counts = dict(iris_stats.group_by('stats_level').len().iter_rows())
+        logger.info(f"IRIS stats: {level_counts.get('iris', 0):,} own, {level_counts.get('commune', 0):,} commune fallback")
+        logger.info(f"Removed {len(iris_keys) - len(iris_stats):,} IRIS without data")
+
+        if len(iris_stats) == 0:
             logger.warning("No matches! Check data...")
             return False
 
-        # Filter out any invalid geometries
-        logger.info("\n🧹 Cleaning geometries")
-        initial_count = len(iris_with_data)
-        iris_with_data = iris_with_data[iris_with_data.geometry.is_valid]
-        iris_with_data = iris_with_data[~iris_with_data.geometry.is_empty]
-        final_count = len(iris_with_data)
-
-        if initial_count != final_count:
-            logger.info(f"Removed {initial_count - final_count} invalid geometries")
-        logger.info(f"✓ {final_count:,} valid IRIS geometries")
+        # Statistics sidecar (the map colours IRIS from it, through feature-state)
+        sidecar_path = APP_TILES_DIR / 'stats' / 'iris.arrow'
+        sidecar = build_stats_sidecar(iris_stats, 'code_iris')
+        sizes = write_stats_sidecar(sidecar, sidecar_path)
+        logger.info(f"✓ Saved {sidecar_path.name} ({len(sidecar):,} rows, {format_size_report(sizes)})")
+
+        # IRIS to ship per department (batch weights) and their communes (read filter)
+        shipped_keys = iris_keys.filter(pl.col('code_iris').is_in(iris_stats['code_iris'].implode()))
+        iris_per_dept = dict(shipped_keys.group_by('dept').len().sort('dept').iter_rows())
+        communes_per_dept = dict(
+            shipped_keys.group_by('dept').agg(pl.col('code_insee').unique().sort()).iter_rows()
+        )
+        remaining = list(iris_per_dept)
+        bytes_per_iris = IRIS_MEMORY_FACTOR * get_iris_boundaries_path().stat().st_size / max(len(iris_keys), 1)
+        del iris_keys, shipped_keys
 
-        # Save
+        # Geometries, one department batch at a time (a single batch without a budget)
         logger.info("\n💾 Saving iris.geojson")
-        output_path = Path('app/tiles/iris.geojson')
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        iris_with_data.to_file(str(output_path), driver='GeoJSON')
+        output_path = APP_TILES_DIR / 'iris.geojson'
+        precision = get_coordinate_precision('iris')
+        with stage("write_iris_geojson") as write_stage, \
+                GeoJSONBatchWriter(output_path, precision=precision, flatgeobuf=True) as writer, \
+                GeoJSONChunkWriter(APP_TILES_DIR / 'iris', 'department', precision=precision) as chunks:
+            while remaining:
+                departments = plan_batch(remaining, iris_per_dept, budget, bytes_per_iris)
+                remaining = remaining[len(departments):]
+
+                with stage("iris_batch", departments=f"{departments[0]}-{departments[-1]}") as batch_stage:
+                    communes = [c for d in departments for c in communes_per_dept[d]]
+                    iris, crs = load_iris_geometries(departments, communes)
+                    iris_with_data = prepare_iris_geometries(iris, crs, iris_stats, geometry_cache=geometry_cache)
+                    del iris
+                    batch_stage.rows = writer.write(iris_with_data)
+                    chunks.write(iris_with_data.with_columns(department_code('code_insee').alias('department')))
+                    del iris_with_data
+
+                if budget is not None:
+                    bytes_per_iris = observed_bytes_per_unit(
+                        batch_stage.record, sum(iris_per_dept[d] for d in departments), bytes_per_iris
+                    )
+                    logger.info(
+                        f"✓ Departments {departments[0]}-{departments[-1]}: {batch_stage.rows:,} IRIS "
+                        f"(peak {batch_stage.record['peak_rss_bytes'] / 1024 ** 2:,.0f} MB)"
+                    )
+                release_memory()
+            write_stage.rows = writer.n_features
+
+        final_count = writer.n_features
+        if final_count == 0:
+            logger.warning("No matches! Check data...")
+            return False
+        logger.info(f"✓ {final_count:,} valid IRIS geometries")
 
-        size_mb = output_path.stat().st_size / (1024 * 1024)
-        logger.info(f"✓ Saved: {output_path} ({size_mb:.2f} MB)")
+        sizes = writer.sizes
+        size_mb = sizes['raw'] / (1024 * 1024)
+        logger.info(f"✓ Saved: {output_path} ({format_size_report(sizes)})")
+
+        # Publish the files the map fetches under content-addressed names
+        flatgeobuf_path = get_flatgeobuf_path(output_path)
+        published = {
+            'stats': publish_content_addressed(sidecar_path),
+            'chunks': publish_content_addressed(chunks.index_path),
+            'flatgeobuf': publish_content_addressed(flatgeobuf_path),
+        }
+        index_path = update_layers_index(APP_TILES_DIR, {
+            'iris': {kind: path.relative_to(APP_TILES_DIR).as_posix() for kind, path in published.items()},
+        })
+        manifest.record(IRIS_STAGE, inputs, {
+            'geojson': output_path,
+            'flatgeobuf': flatgeobuf_path,
+            'stats': sidecar_path,
+            'chunks': chunks.output_dir,
+            **{f'layer_{kind}': path for kind, path in published.items()},
+        }, params)
+        manifest.record("layers_index", [], {"index": index_path})
 
         logger.info("\n" + "="*70)
         logger.info("✅ IRIS TILES GENERATED SUCCESSFULLY!")
@@ -176,4 +425,3 @@ def main():
 if __name__ == '__main__':
     success = main()
     exit(0 if success else 1)
-
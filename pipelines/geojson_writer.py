@@ -0,0 +1,550 @@
+"""
+GeoJSON writer for web tiles
+
+Shared by build_geojson.py and generate_iris.py:
+- Rounds coordinates to a configurable number of decimals per level
+- Optional quantized + delta-encoded coordinates (TopoJSON-style transform)
+- Writes pre-compressed siblings (.geojson.gz / .geojson.br) in the same pass
+  so a CDN can serve them without on-the-fly compression (streamed, so the
+  payload is never held in memory)
+- Reports raw and compressed sizes per level
+- GeoJSONBatchWriter writes one FeatureCollection from several batches, for
+  memory-budgeted runs (see pipelines/memory_budget.py)
+- Optional FlatGeobuf copy (.fgb) with a packed Hilbert R-tree, so that the
+  map can read only the features intersecting the viewport with HTTP range
+  requests instead of downloading and parsing the whole GeoJSON
+- GeoJSONChunkWriter splits a layer into one file per chunk (department)
+  plus an index of their bounding boxes, for lazy loading by the map; chunk
+  files have content-addressed names (see pipelines/build_manifest.py)
+- Every file is written to a temporary file renamed over the destination
+  (pipelines/atomic_files.py): readers never see a partial tile
+
+Features are Polars frames with a WKB geometry column in EPSG:4326 (see
+pipelines/boundaries.py), handed to GDAL as Arrow (pyogrio.write_arrow): no
+pandas or GeoDataFrame copy on the way out.
+
+Usage:
+    sizes = write_geojson(frame, APP_TILES_DIR / "commune.geojson", precision=5, flatgeobuf=True)
+
+    with GeoJSONBatchWriter(APP_TILES_DIR / "iris.geojson", precision=5) as writer:
+        for batch in batches:
+            writer.write(batch)
+    sizes = writer.sizes
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import gzip
+import json
+import shutil
+import itertools
+import logging
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from pipelines.atomic_files import atomic_output, temporary_path, write_text_atomic
+from pipelines.build_manifest import (
+    CONTENT_HASH_LENGTH,
+    SIBLING_SUFFIXES,
+    content_addressed_pattern,
+    publish_content_addressed,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Decimal places kept in WGS84 coordinates, per level.
+# 4 decimals ≈ 11 m, 5 ≈ 1.1 m, 6 ≈ 0.11 m at French latitudes.
+COORDINATE_PRECISION_BY_LEVEL = {
+    'region': 4,
+    'department': 4,
+    'commune': 5,
+    'postcode': 5,
+    'iris': 5,
+}
+
+# Default fallback
+COORDINATE_PRECISION_DEFAULT = 5
+
+# Pre-compressed siblings written next to each GeoJSON file
+COMPRESSIONS_DEFAULT = ("gzip", "br")
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Read size when streaming a file through the compressors
+COMPRESSION_CHUNK_BYTES = 1024 * 1024
+
+# Line opening the features array in GDAL's GeoJSON output (one feature per line follows)
+GDAL_FEATURES_LINE = '"features": ['
+
+# WKB geometry column of the written frames, and their CRS
+GEOMETRY_COLUMN = "geometry"
+OUTPUT_CRS = "EPSG:4326"
+
+# FlatGeobuf copy written next to a GeoJSON file (tiles/iris.geojson -> tiles/iris.fgb)
+FLATGEOBUF_SUFFIX = ".fgb"
+
+# Index of a chunked layer (one entry per chunk file: key, path, bbox, features)
+CHUNK_INDEX_NAME = "index.json"
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def get_coordinate_precision(level: str) -> int:
+    """Get the number of coordinate decimals to keep for a level."""
+    return COORDINATE_PRECISION_BY_LEVEL.get(level, COORDINATE_PRECISION_DEFAULT)
+
+
+def get_flatgeobuf_path(path: Path) -> Path:
+    """Path of the FlatGeobuf copy of a GeoJSON file."""
+    return Path(path).with_suffix(FLATGEOBUF_SUFFIX)
+
+
+def round_coordinates(frame, precision: int):
+    """Round the coordinates of a frame's WKB geometries (same values as GDAL's GeoJSON output)."""
+    import shapely
+    import polars as pl
+
+    geometries = shapely.from_wkb(frame[GEOMETRY_COLUMN].to_numpy())
+    rounded = shapely.transform(geometries, lambda coords: np.round(coords, precision))
+    return frame.with_columns(pl.Series(GEOMETRY_COLUMN, shapely.to_wkb(rounded), dtype=pl.Binary))
+
+
+def _delta_encode_positions(positions: list, translate: np.ndarray, scale: float) -> list:
+    """
+    Quantize a list of positions to the integer grid and delta-encode them:
+    the first position is absolute (in grid units), the next ones are offsets
+    from the previous position.
+    """
+    coords = np.asarray(positions, dtype="float64")[:, :2]
+    quantized = np.round((coords - translate) / scale).astype("int64")
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype="int64"))
+    return deltas.tolist()
+
+
+def _delta_encode_coordinates(coords, translate: np.ndarray, scale: float):
+    """Walk a GeoJSON coordinates array and delta-encode every position list."""
+    if len(coords) == 0:
+        return []
+    first = coords[0]
+    # Single position (Point)
+    if isinstance(first, (int, float)):
+        return _delta_encode_positions([coords], translate, scale)[0]
+    # List of positions (LineString, ring)
+    if isinstance(first[0], (int, float)):
+        return _delta_encode_positions(coords, translate, scale)
+    # Nested (Polygon, MultiPolygon, ...)
+    return [_delta_encode_coordinates(c, translate, scale) for c in coords]
+
+
+def to_delta_encoded_geojson(frame, precision: int) -> dict:
+    """
+    Build a GeoJSON FeatureCollection whose coordinates are quantized to
+    10**-precision degrees and delta-encoded per line/ring.
+
+    The decoding parameters are stored in a top-level "transform" member
+    (same convention as TopoJSON): x = (sum of deltas) * scale + translate.
+    Clients must decode before rendering.
+    """
+    import shapely
+
+    scale = 10.0 ** -precision
+    geometries = shapely.from_wkb(frame[GEOMETRY_COLUMN].to_numpy())
+    minx, miny, _, _ = shapely.total_bounds(geometries)
+    translate = np.array([minx, miny])
+
+    features = []
+    properties = frame.drop(GEOMETRY_COLUMN).to_dicts()
+    for props, geometry in zip(properties, geometries):
+        geometry = shapely.geometry.mapping(geometry) if geometry is not None else None
+        if geometry is not None:
+            geometry["coordinates"] = _delta_encode_coordinates(
+                geometry["coordinates"], translate, scale
+            )
+        features.append({"type": "Feature", "properties": props, "geometry": geometry})
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "transform": {
+            "scale": [scale, scale],
+            "translate": [float(minx), float(miny)],
+        },
+    }
+
+
+def write_gdal_geojson(
+    frame,
+    output_path: Path,
+    precision: int | None = None,
+    crs: str = OUTPUT_CRS,
+) -> None:
+    """
+    Write a frame as GeoJSON with GDAL, straight from Arrow.
+
+    Args:
+        frame: Polars frame with a WKB GEOMETRY_COLUMN
+        output_path: Destination .geojson path (replaced)
+        precision: Number of decimals kept per coordinate (None: GDAL default)
+        crs: CRS of the geometries
+    """
+    import pyogrio
+
+    output_path = Path(output_path)
+    layer_options = {"COORDINATE_PRECISION": precision} if precision is not None else None
+    with atomic_output(output_path) as tmp_path:
+        pyogrio.write_arrow(
+            frame.to_arrow(),
+            tmp_path,
+            layer=output_path.stem,
+            driver="GeoJSON",
+            geometry_name=GEOMETRY_COLUMN,
+            geometry_type="Unknown",
+            crs=crs,
+            layer_options=layer_options,
+        )
+
+
+def write_flatgeobuf(data, output_path: Path, crs: str = OUTPUT_CRS) -> None:
+    """
+    Write features as FlatGeobuf with its packed Hilbert R-tree spatial index.
+
+    Args:
+        data: Polars frame with a WKB GEOMETRY_COLUMN, or an Arrow stream of
+            such batches (pyarrow.RecordBatchReader)
+        output_path: Destination .fgb path (replaced)
+        crs: CRS of the geometries
+    """
+    import pyogrio
+
+    output_path = Path(output_path)
+    with atomic_output(output_path) as tmp_path:
+        pyogrio.write_arrow(
+            data.to_arrow() if hasattr(data, "to_arrow") else data,
+            tmp_path,
+            layer=output_path.stem,
+            driver="FlatGeobuf",
+            geometry_name=GEOMETRY_COLUMN,
+            geometry_type="Unknown",
+            crs=crs,
+            layer_options={"SPATIAL_INDEX": "YES"},
+        )
+
+
+def write_compressed_siblings(
+    path: Path,
+    compressions: tuple[str, ...] = COMPRESSIONS_DEFAULT,
+) -> dict[str, Path]:
+    """
+    Write pre-compressed copies of a file next to it (path.gz, path.br).
+
+    Brotli is optional: if the `brotli` package is not installed the .br
+    sibling is skipped with a warning.
+
+    Returns:
+        Dictionary mapping compression name to sibling path
+    """
+    path = Path(path)
+    siblings = {}
+
+    if "gzip" in compressions:
+        gz_path = path.with_name(path.name + ".gz")
+        # mtime=0 and no file name keep the output byte-identical across rebuilds
+        with atomic_output(gz_path) as tmp_path, path.open("rb") as src, tmp_path.open("wb") as dst, \
+                gzip.GzipFile(filename="", mode="wb", fileobj=dst, compresslevel=GZIP_LEVEL, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, COMPRESSION_CHUNK_BYTES)
+        siblings["gzip"] = gz_path
+
+    if "br" in compressions:
+        try:
+            import brotli
+
+            br_path = path.with_name(path.name + ".br")
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            with atomic_output(br_path) as tmp_path, path.open("rb") as src, tmp_path.open("wb") as dst:
+                for chunk in iter(lambda: src.read(COMPRESSION_CHUNK_BYTES), b""):
+                    dst.write(compressor.process(chunk))
+                dst.write(compressor.finish())
+            siblings["br"] = br_path
+        except ImportError:
+            logger.warning("brotli not installed, skipping .br sibling")
+            logger.info("Install with: pip install brotli")
+
+    return siblings
+
+
+def get_size_report(path: Path) -> dict[str, int]:
+    """
+    Get on-disk sizes of a GeoJSON file, its pre-compressed siblings and its
+    FlatGeobuf copy.
+
+    Returns:
+        Dictionary with 'raw', 'gzip', 'br' and 'fgb' sizes in bytes (missing files omitted)
+    """
+    path = Path(path)
+    report = {"raw": path.stat().st_size}
+    for name, suffix in (("gzip", ".gz"), ("br", ".br")):
+        sibling = path.with_name(path.name + suffix)
+        if sibling.exists():
+            report[name] = sibling.stat().st_size
+    flatgeobuf_path = get_flatgeobuf_path(path)
+    if flatgeobuf_path.exists():
+        report["fgb"] = flatgeobuf_path.stat().st_size
+    return report
+
+
+def format_size_report(report: dict[str, int]) -> str:
+    """Format a size report as 'raw X MB, gzip Y MB, br Z MB'."""
+    return ", ".join(f"{name} {size / (1024 * 1024):.2f} MB" for name, size in report.items())
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def write_geojson(
+    frame,
+    output_path: Path,
+    precision: int = COORDINATE_PRECISION_DEFAULT,
+    delta_encode: bool = False,
+    compressions: tuple[str, ...] = COMPRESSIONS_DEFAULT,
+    flatgeobuf: bool = False,
+) -> dict[str, int]:
+    """
+    Write a WGS84 frame as GeoJSON with limited coordinate precision,
+    plus pre-compressed siblings.
+
+    Args:
+        frame: Polars frame with a WKB GEOMETRY_COLUMN in EPSG:4326
+        output_path: Destination .geojson path
+        precision: Number of decimals kept per coordinate
+        delta_encode: Quantize and delta-encode coordinates (see to_delta_encoded_geojson)
+        compressions: Pre-compressed siblings to write ('gzip', 'br')
+        flatgeobuf: Also write a FlatGeobuf copy (same rounded coordinates, plain
+            coordinates even when delta_encode is set)
+
+    Returns:
+        Size report of the written files (see get_size_report)
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if delta_encode:
+        collection = to_delta_encoded_geojson(frame, precision)
+        with atomic_output(output_path) as tmp_path, tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(collection, f, separators=(",", ":"), ensure_ascii=False)
+    else:
+        write_gdal_geojson(frame, output_path, precision)
+
+    write_compressed_siblings(output_path, compressions)
+
+    if flatgeobuf:
+        write_flatgeobuf(round_coordinates(frame, precision), get_flatgeobuf_path(output_path))
+
+    return get_size_report(output_path)
+
+
+class GeoJSONBatchWriter:
+    """
+    Write one GeoJSON FeatureCollection from several frame batches,
+    holding a single batch in memory at a time.
+
+    Each batch is serialized by GDAL (same output as write_geojson) to a
+    temporary file whose feature lines are appended to the output; the
+    output is renamed into place and the compressed siblings are written on
+    close.
+
+    A FlatGeobuf file cannot be appended to (its index covers every
+    feature): with flatgeobuf=True the batches are also staged as Parquet
+    and streamed into one .fgb on close.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        precision: int = COORDINATE_PRECISION_DEFAULT,
+        compressions: tuple[str, ...] = COMPRESSIONS_DEFAULT,
+        flatgeobuf: bool = False,
+    ):
+        self.output_path = Path(output_path)
+        self.precision = precision
+        self.compressions = compressions
+        self.flatgeobuf = flatgeobuf
+        self.n_features = 0
+        self.sizes: dict[str, int] | None = None
+        self._tmp_dir = None
+        self._out = None
+        self._out_path: Path | None = None
+        self._staged: list[Path] = []
+
+    def __enter__(self) -> GeoJSONBatchWriter:
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix="geojson-", dir=self.output_path.parent)
+        self._out_path = temporary_path(self.output_path)
+        self._out = self._out_path.open("w", encoding="utf-8")
+        return self
+
+    def write(self, frame) -> int:
+        """Append the features of a WGS84 frame (WKB geometry); returns the number written."""
+        if len(frame) == 0:
+            return 0
+
+        batch_path = Path(self._tmp_dir.name) / self.output_path.name
+        write_gdal_geojson(frame, batch_path, self.precision)
+
+        with batch_path.open(encoding="utf-8") as f:
+            # Header (type, name, crs, ...) is written once, from the first batch
+            for line in f:
+                if self.n_features == 0:
+                    self._out.write(line)
+                if line.strip() == GDAL_FEATURES_LINE:
+                    break
+            else:
+                raise ValueError(f"Unexpected GDAL GeoJSON layout in {batch_path}")
+
+            for line in f:
+                feature = line.rstrip("\n").rstrip(",")
+                if not feature.startswith("{"):
+                    break
+                if self.n_features:
+                    self._out.write(",\n")
+                self._out.write(feature)
+                self.n_features += 1
+
+        batch_path.unlink()
+
+        if self.flatgeobuf:
+            staged_path = Path(self._tmp_dir.name) / f"batch-{len(self._staged):05d}.parquet"
+            round_coordinates(frame, self.precision).write_parquet(staged_path)
+            self._staged.append(staged_path)
+
+        return len(frame)
+
+    def _write_flatgeobuf(self) -> None:
+        """Stream the staged batches into the FlatGeobuf copy."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        flatgeobuf_path = get_flatgeobuf_path(self.output_path)
+        if not self._staged:
+            flatgeobuf_path.unlink(missing_ok=True)
+            return
+
+        schema = pq.read_schema(self._staged[0])
+        batches = itertools.chain.from_iterable(
+            pq.ParquetFile(path).iter_batches() for path in self._staged
+        )
+        write_flatgeobuf(pa.RecordBatchReader.from_batches(schema, batches), flatgeobuf_path)
+
+    def __exit__(self, exc_type, *exc) -> None:
+        try:
+            if self.n_features == 0:
+                self._out.write('{\n"type": "FeatureCollection",\n"features": [\n')
+            self._out.write("\n]\n}\n")
+            self._out.close()
+            if exc_type is None:
+                os.replace(self._out_path, self.output_path)
+                if self.flatgeobuf:
+                    self._write_flatgeobuf()
+        finally:
+            self._out.close()
+            self._out_path.unlink(missing_ok=True)
+            self._tmp_dir.cleanup()
+
+        if exc_type is None:
+            write_compressed_siblings(self.output_path, self.compressions)
+            self.sizes = get_size_report(self.output_path)
+
+
+class GeoJSONChunkWriter:
+    """
+    Write a layer as one GeoJSON file per chunk (e.g. per department), plus
+    an index.json listing each chunk's file, bounding box and feature count,
+    so that the map fetches only the chunks intersecting its view.
+
+    Chunk files are renamed after their content (01.<hash>.geojson), so
+    they can be cached forever; the index keeps its name. Earlier chunk
+    versions stay on disk for maps still holding an earlier index: the last
+    versions of each chunk are kept (see publish_content_addressed), and the
+    chunks of keys no longer written are removed once no index version left
+    in the directory lists them. A chunk key must only be written once per
+    build (batches must not split a chunk).
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        chunk_col: str,
+        precision: int = COORDINATE_PRECISION_DEFAULT,
+        compressions: tuple[str, ...] = COMPRESSIONS_DEFAULT,
+    ):
+        self.output_dir = Path(output_dir)
+        self.chunk_col = chunk_col
+        self.precision = precision
+        self.compressions = compressions
+        self.chunks: dict[str, dict] = {}
+
+    @property
+    def index_path(self) -> Path:
+        return self.output_dir / CHUNK_INDEX_NAME
+
+    def __enter__(self) -> GeoJSONChunkWriter:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def write(self, frame) -> int:
+        """Write the chunks of a WGS84 frame (WKB geometry, chunk_col dropped); returns the number of features."""
+        import shapely
+
+        for (key,), part in frame.partition_by(self.chunk_col, as_dict=True, maintain_order=True).items():
+            if key is None:
+                continue
+            key = str(key)
+            if key in self.chunks:
+                raise ValueError(f"Chunk {key!r} written twice to {self.output_dir}")
+
+            part = part.drop(self.chunk_col)
+            path = self.output_dir / f"{key}.geojson"
+            write_geojson(part, path, precision=self.precision, compressions=self.compressions)
+            path = publish_content_addressed(path, move=True)
+            bounds = shapely.total_bounds(shapely.from_wkb(part[GEOMETRY_COLUMN].to_numpy()))
+            self.chunks[key] = {
+                "key": key,
+                "path": path.name,
+                "bbox": [round(float(value), self.precision) for value in bounds],
+                "features": len(part),
+            }
+        return len(frame)
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            index = {"chunks": [self.chunks[key] for key in sorted(self.chunks)]}
+            write_text_atomic(self.index_path, json.dumps(index, separators=(",", ":")))
+            self._remove_dropped_chunks()
+
+    def _remove_dropped_chunks(self) -> None:
+        """Remove the chunks of keys not written by this build that no index version lists."""
+        index_pattern = content_addressed_pattern(self.index_path)
+        listed = set()
+        for path in self.output_dir.iterdir():
+            match = index_pattern.fullmatch(path.name)
+            if path.name == CHUNK_INDEX_NAME or (match and not match.group(1)):
+                listed.update(chunk["path"] for chunk in json.loads(path.read_text(encoding="utf-8"))["chunks"])
+
+        siblings = "|".join(re.escape(suffix) for suffix in SIBLING_SUFFIXES)
+        chunk_pattern = re.compile(rf"(.+)\.[0-9a-f]{{{CONTENT_HASH_LENGTH}}}\.geojson({siblings})?")
+        for path in self.output_dir.iterdir():
+            match = chunk_pattern.fullmatch(path.name)
+            if match and match.group(1) not in self.chunks and path.name.removesuffix(match.group(2) or "") not in listed:
+                path.unlink()
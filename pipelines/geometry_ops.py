@@ -0,0 +1,334 @@
+"""
+Parallel geometry processing: repair, simplification and reprojection
+
+Geometry arrays are split into chunks processed across a process pool, each
+chunk with vectorized shapely 2 / pyproj calls:
+- repair: shapely.make_valid on the invalid geometries only ('structure'
+  method, collapsed parts dropped: polygons stay polygons, like buffer(0))
+- simplify: shapely.simplify, topology preserving
+- reproject: one pyproj Transformer per worker, applied to the coordinate
+  arrays (same transform as GeoDataFrame.to_crs)
+- geometries still invalid or empty afterwards are dropped (None)
+
+Polygon layers that tile the territory (communes) can instead be simplified as
+a coverage (GeometryOps.coverage): vertices are snapped to COVERAGE_GRID_SIZE
+and each shared edge is simplified once (shapely.coverage_simplify), so
+neighbouring polygons keep identical edges. Coarser levels are then derived
+with union_by_group (one shapely.coverage_union_all per group, in parallel),
+and their boundaries match the finer polygons exactly.
+
+Geometries travel as WKB (in a Polars Binary column, and to the workers):
+shapely objects only exist inside a chunk being processed.
+
+Results are cached under data/intermediate/geometry_cache/<key>.parquet (WKB),
+keyed by the input geometries and the operations, so a rerun on unchanged
+boundaries skips the stage.
+
+Usage:
+    ops = GeometryOps(repair=True, source_crs=crs, target_crs="EPSG:4326")
+    iris = iris.with_columns(process_wkb(iris["geometry"], ops))
+    departments = union_by_group(communes["geometry"], communes["code_insee_du_departement"])
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import math
+import hashlib
+import logging
+import functools
+from pathlib import Path
+from dataclasses import dataclass, asdict, replace
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_geometry_cache_path
+from pipelines.instrumentation import instrumented
+from pipelines.atomic_files import atomic_output
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Bump when the processing changes (part of the cache key)
+GEOMETRY_OPS_VERSION = 2
+
+# Chunks per worker (load balancing) and smallest chunk worth shipping to a worker
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_SIZE = 2_000
+
+# Grid (in source CRS units, 1 cm in Lambert-93) vertices are snapped to before
+# coverage simplification, so that shared edges carry identical vertices
+COVERAGE_GRID_SIZE = 0.01
+
+
+@dataclass(frozen=True)
+class GeometryOps:
+    """
+    Operations applied to each geometry, in field order.
+
+    With coverage=True the geometries are simplified together as a polygon
+    coverage (Visvalingam-Whyatt, the tolerance is roughly the square root of
+    the triangle areas removed), before the other operations.
+    """
+
+    repair: bool = False
+    simplify_tolerance: float | None = None
+    source_crs: str | None = None
+    target_crs: str | None = None
+    drop_invalid: bool = True
+    coverage: bool = False
+
+
+# ----------------------------
+# Chunk processing (runs in the workers)
+# ----------------------------
+
+@functools.lru_cache(maxsize=None)
+def _transformer(source_crs: str, target_crs: str):
+    from pyproj import Transformer
+
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+
+def process_chunk(wkb: np.ndarray, ops: GeometryOps) -> np.ndarray:
+    """
+    Apply the operations to an array of WKB geometries.
+
+    Args:
+        wkb: WKB bytes array (None for missing geometries)
+        ops: Operations to apply
+
+    Returns:
+        Processed WKB array (None where a geometry was dropped)
+    """
+    import shapely
+
+    geometries = shapely.from_wkb(wkb)
+
+    if ops.repair:
+        invalid = ~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)
+        if invalid.any():
+            geometries[invalid] = shapely.make_valid(geometries[invalid], method="structure", keep_collapsed=False)
+
+    if ops.simplify_tolerance:
+        geometries = shapely.simplify(geometries, ops.simplify_tolerance, preserve_topology=True)
+
+    if ops.target_crs and ops.source_crs and ops.target_crs != ops.source_crs:
+        transformer = _transformer(ops.source_crs, ops.target_crs)
+        geometries = shapely.transform(geometries, transformer.transform, interleaved=False)
+
+    if ops.drop_invalid:
+        dropped = ~shapely.is_valid(geometries) | shapely.is_empty(geometries)
+        geometries[dropped] = None
+
+    return shapely.to_wkb(geometries)
+
+
+def _process_chunk_task(args):
+    return process_chunk(*args)
+
+
+def simplify_coverage(wkb: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify an array of WKB polygons as one coverage (shared edges simplified once).
+
+    Args:
+        wkb: WKB bytes array of polygons tiling an area
+        tolerance: Simplification tolerance (source CRS units)
+
+    Returns:
+        Simplified WKB array
+    """
+    import shapely
+
+    geometries = shapely.set_precision(shapely.from_wkb(wkb), COVERAGE_GRID_SIZE)
+    return shapely.to_wkb(shapely.coverage_simplify(geometries, tolerance))
+
+
+def union_groups(groups: list[np.ndarray]) -> np.ndarray:
+    """
+    Union of each group of WKB polygons.
+
+    Groups are merged with the fast coverage union; a group that is not a
+    valid coverage (overlaps, unmatched edges) falls back to union_all.
+
+    Args:
+        groups: One WKB bytes array per group
+
+    Returns:
+        WKB array with one geometry per group
+    """
+    import shapely
+
+    result = np.empty(len(groups), dtype=object)
+    for i, wkb in enumerate(groups):
+        geometries = shapely.from_wkb(wkb)
+        try:
+            union = shapely.coverage_union_all(geometries)
+        except shapely.errors.GEOSException:
+            union = None
+        if union is None or not shapely.is_valid(union):
+            union = shapely.union_all(geometries)
+        result[i] = union
+    return shapely.to_wkb(result)
+
+
+# ----------------------------
+# Cache
+# ----------------------------
+
+def geometry_cache_key(wkb: pl.Series, ops: GeometryOps | None = None, groups: pl.Series | None = None) -> str:
+    """
+    Cache key of a WKB column: hashes of the input WKB plus the operations
+    (or of the group keys, for a grouped union).
+    """
+    import shapely
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "version": GEOMETRY_OPS_VERSION,
+        "ops": asdict(ops) if ops is not None else None,
+        "union": groups is not None,
+        "n": len(wkb),
+        "shapely": shapely.__version__,
+        "geos": shapely.geos_version_string,
+    }, sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(wkb.hash(seed=0).to_numpy()).tobytes())
+    if groups is not None:
+        digest.update(np.ascontiguousarray(groups.hash(seed=0).to_numpy()).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _write_cache(path: Path, frame: pl.DataFrame) -> None:
+    with atomic_output(path) as tmp_path:
+        frame.write_parquet(tmp_path)
+
+
+def _chunk_size(n: int, max_workers: int) -> int:
+    return max(MIN_CHUNK_SIZE, math.ceil(n / (max_workers * CHUNKS_PER_WORKER)))
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+@instrumented()
+def process_wkb(
+    wkb: pl.Series,
+    ops: GeometryOps,
+    max_workers: int | None = None,
+    cache: bool = True,
+) -> pl.Series:
+    """
+    Apply the operations to a WKB geometry column, in parallel chunks.
+
+    Args:
+        wkb: Binary column of WKB geometries
+        ops: Operations to apply
+        max_workers: Worker processes (default: CPU count, 1: in-process)
+        cache: Read/write the result cache
+
+    Returns:
+        Processed WKB column aligned with the input, same name (null where dropped)
+    """
+    cache_path = get_geometry_cache_path(geometry_cache_key(wkb, ops)) if cache else None
+    if cache_path is not None and cache_path.exists():
+        logger.info(f"⏭️  {len(wkb):,} geometries already processed, read from {cache_path.name}")
+        return pl.read_parquet(cache_path)["geometry"].alias(wkb.name)
+
+    values = wkb.to_numpy()
+    if ops.coverage and ops.simplify_tolerance:
+        # Coverage simplification needs every polygon at once: done here,
+        # the remaining operations run in chunks
+        logger.info(f"Simplifying {len(wkb):,} geometries as a coverage")
+        values = simplify_coverage(values, ops.simplify_tolerance)
+        ops = replace(ops, simplify_tolerance=None, coverage=False)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_size = _chunk_size(len(values), max_workers)
+    n_chunks = math.ceil(len(values) / chunk_size)
+
+    if max_workers == 1 or n_chunks <= 1:
+        result = process_chunk(values, ops)
+    else:
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        logger.info(f"Processing {len(wkb):,} geometries in {n_chunks} chunks ({max_workers} workers)")
+        with ProcessPoolExecutor(max_workers=min(max_workers, n_chunks)) as pool:
+            result = np.concatenate(list(pool.map(_process_chunk_task, [(chunk, ops) for chunk in chunks])))
+
+    result = pl.Series(wkb.name, result, dtype=pl.Binary)
+    if cache_path is not None:
+        _write_cache(cache_path, result.to_frame("geometry"))
+    return result
+
+
+@instrumented()
+def union_by_group(
+    wkb: pl.Series,
+    groups: pl.Series,
+    max_workers: int | None = None,
+    cache: bool = True,
+) -> pl.DataFrame:
+    """
+    Union of the geometries of each group (e.g. communes -> departments), groups
+    spread across a process pool.
+
+    Args:
+        wkb: Binary column of WKB polygons (ideally a coverage, see GeometryOps.coverage)
+        groups: Group key of each geometry, aligned with wkb
+        max_workers: Worker processes (default: CPU count, 1: in-process)
+        cache: Read/write the result cache
+
+    Returns:
+        One row per group, sorted by key: the group column and the WKB union
+        (named like the inputs)
+    """
+    cache_path = get_geometry_cache_path(geometry_cache_key(wkb, groups=groups)) if cache else None
+    if cache_path is not None and cache_path.exists():
+        logger.info(f"⏭️  {len(wkb):,} geometries already merged, read from {cache_path.name}")
+        return pl.read_parquet(cache_path).rename({"group": groups.name, "geometry": wkb.name})
+
+    grouped = (
+        pl.DataFrame({"group": groups, "geometry": wkb})
+        .filter(pl.col("group").is_not_null() & pl.col("geometry").is_not_null())
+        .group_by("group")
+        .agg("geometry")
+        .sort("group")
+    )
+    parts = [np.array(values, dtype=object) for values in grouped["geometry"].to_list()]
+
+    # Contiguous runs of groups holding about chunk_size geometries each
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_size = _chunk_size(len(wkb), max_workers)
+    chunks, filled = [], chunk_size
+    for part in parts:
+        if filled >= chunk_size:
+            chunks.append([])
+            filled = 0
+        chunks[-1].append(part)
+        filled += len(part)
+
+    if max_workers == 1 or len(chunks) <= 1:
+        result = union_groups(parts)
+    else:
+        logger.info(f"Merging {len(wkb):,} geometries into {len(parts):,} groups ({len(chunks)} chunks, {max_workers} workers)")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            result = np.concatenate(list(pool.map(union_groups, chunks)))
+
+    merged = pl.DataFrame({
+        "group": grouped["group"],
+        "geometry": pl.Series(result, dtype=pl.Binary),
+    })
+    if cache_path is not None:
+        _write_cache(cache_path, merged)
+    return merged.rename({"group": groups.name, "geometry": wkb.name})
@@ -0,0 +1,381 @@
+"""
+Hedonic price model pipeline
+
+Estimates the price of each transaction from its characteristics instead of
+the area median:
+- Target: log(price_m2)
+- Features: log(surface_final), Type local, Nombre pieces principales,
+  log(1 + surface_terrain), sale date and a commune effect
+- One ridge-regularised linear model per department, fitted in parallel
+  across departments (closed form, NumPy only)
+- The commune effect is a shrunken mean of the ridge residuals
+  (empirical-Bayes style), so communes with few sales stay close to the
+  department; it is added as an offset rather than used as a regressor,
+  which would leak the target into its own coefficient
+- Missing sale dates are filled with the training mean of the department
+  (stored with the coefficients), so a prediction does not depend on the
+  other rows scored with it
+
+Artifacts (coefficients + commune effects, Parquet) are cached under
+data/models/hedonic/<training data hash>/ and only refitted when the
+training data or the model settings change.
+
+Scoring is a Polars join + expression over the whole frame, so `predict`
+handles millions of rows in one vectorized pass.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_dvf_clean_path, get_hedonic_model_dir, ensure_data_directories
+from pipelines.aggregate import PROPERTY_TYPES
+from pipelines.instrumentation import instrumented
+from pipelines.atomic_files import atomic_output
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Bump when features or the fitting procedure change (part of the cache key)
+MODEL_VERSION = 2
+
+# Ridge penalty (per training row, on standardized features)
+RIDGE_ALPHA = 1e-3
+
+# Pseudo-count pulling commune effects toward the department mean
+AREA_EFFECT_SHRINKAGE = 20
+
+# Departments with fewer training rows get no model (predictions are null)
+MIN_TRAIN_ROWS = 50
+
+DEPARTMENT_COLUMN = "Code departement"
+AREA_COLUMN = "Code commune"
+
+# Raw columns the model reads (also hashed for the cache key)
+TRAINING_COLUMNS = [
+    DEPARTMENT_COLUMN,
+    AREA_COLUMN,
+    "Type local",
+    "Nombre pieces principales",
+    "surface_final",
+    "surface_terrain",
+    "Date mutation",
+    "price_m2",
+]
+
+# Numeric features derived by feature_expressions()
+BASE_FEATURES = ["log_surface", "is_maison", "rooms", "log_terrain", "t_years"]
+
+# Features that may be null, filled with their training mean (fill_<name> column)
+IMPUTED_FEATURES = ["t_years"]
+
+# Reference date for t_years
+DATE_ORIGIN = "2020-01-01"
+
+
+# ----------------------------
+# Features
+# ----------------------------
+
+def feature_expressions() -> list[pl.Expr]:
+    """
+    Polars expressions computing BASE_FEATURES from DVF clean columns
+    (IMPUTED_FEATURES are left null where missing).
+    """
+    sale_date = pl.col("Date mutation").str.strptime(pl.Date, "%d/%m/%Y", strict=False)
+    return [
+        pl.col("surface_final").log().alias("log_surface"),
+        (pl.col("Type local") == "Maison").cast(pl.Float64).alias("is_maison"),
+        pl.col("Nombre pieces principales").cast(pl.Float64, strict=False)
+        .fill_null(0).clip(0, 10).alias("rooms"),
+        pl.col("surface_terrain").fill_null(0).log1p().alias("log_terrain"),
+        ((sale_date - pl.lit(DATE_ORIGIN).str.to_date()).dt.total_days() / 365.25)
+        .alias("t_years"),
+    ]
+
+
+def select_training_rows(df: pl.DataFrame) -> pl.DataFrame:
+    """Rows usable for training: residential sales with a valid price and surface."""
+    return df.filter(
+        pl.col("Type local").is_in(PROPERTY_TYPES)
+        & (pl.col("price_m2") > 0)
+        & (pl.col("surface_final") > 0)
+        & pl.col(DEPARTMENT_COLUMN).is_not_null()
+    )
+
+
+def training_data_hash(df: pl.DataFrame) -> str:
+    """
+    Cache key of a training frame: row hashes of TRAINING_COLUMNS plus the
+    model settings.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "version": MODEL_VERSION,
+        "ridge_alpha": RIDGE_ALPHA,
+        "shrinkage": AREA_EFFECT_SHRINKAGE,
+        "min_train_rows": MIN_TRAIN_ROWS,
+        "polars": pl.__version__,
+        "n_rows": len(df),
+    }, sort_keys=True).encode())
+    row_hashes = df.select(TRAINING_COLUMNS).hash_rows(seed=0).to_numpy()
+    digest.update(np.ascontiguousarray(row_hashes).tobytes())
+    return digest.hexdigest()[:16]
+
+
+# ----------------------------
+# Fitting
+# ----------------------------
+
+def fit_department(
+    code: str, X: np.ndarray, y: np.ndarray, areas: np.ndarray
+) -> tuple[dict, pl.DataFrame]:
+    """
+    Fit the ridge model of one department.
+
+    Args:
+        code: Department code
+        X: (n, len(BASE_FEATURES)) feature matrix (NaN where an
+           IMPUTED_FEATURES value is missing)
+        y: log(price_m2)
+        areas: Commune code of each row
+
+    Returns:
+        (coefficient row, commune effects frame)
+    """
+    n = len(y)
+    intercept = float(y.mean())
+    resid = y - intercept
+
+    X = X.copy()
+    fills = {}
+    for name in IMPUTED_FEATURES:
+        i = BASE_FEATURES.index(name)
+        missing = np.isnan(X[:, i])
+        fills[name] = float(X[~missing, i].mean()) if (~missing).any() else 0.0
+        X[missing, i] = fills[name]
+
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1.0
+    Xs = (X - mean) / std
+
+    gram = Xs.T @ Xs + RIDGE_ALPHA * n * np.eye(Xs.shape[1])
+    coef = np.linalg.solve(gram, Xs.T @ resid)
+    resid = resid - Xs @ coef
+
+    # Commune offset: shrunken mean of the ridge residuals
+    area_codes, inverse = np.unique(areas, return_inverse=True)
+    sums = np.bincount(inverse, weights=resid)
+    counts = np.bincount(inverse)
+    effects = sums / (counts + AREA_EFFECT_SHRINKAGE)
+    sigma2 = float(np.mean((resid - effects[inverse]) ** 2))
+
+    row = {DEPARTMENT_COLUMN: code, "n_train": n, "intercept": intercept, "sigma2": sigma2}
+    for name, value in fills.items():
+        row[f"fill_{name}"] = value
+    for i, name in enumerate(BASE_FEATURES):
+        row[f"mean_{name}"] = float(mean[i])
+        row[f"std_{name}"] = float(std[i])
+        row[f"coef_{name}"] = float(coef[i])
+
+    area_effects = pl.DataFrame({
+        DEPARTMENT_COLUMN: [code] * len(area_codes),
+        AREA_COLUMN: area_codes.tolist(),
+        "area_effect": effects,
+    })
+    return row, area_effects
+
+
+def _fit_department_task(args):
+    return fit_department(*args)
+
+
+@dataclass
+class HedonicModel:
+    """Per-department hedonic model: coefficient table + commune effects."""
+
+    coefficients: pl.DataFrame
+    area_effects: pl.DataFrame
+    data_hash: str
+
+    @instrumented("hedonic_predict")
+    def predict(self, frame: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+        """
+        Score transactions in one vectorized pass.
+
+        Args:
+            frame: Rows with the DVF clean columns used as features
+                   (price_m2 is not required)
+
+        Returns:
+            frame with predicted_price_m2 and predicted_price_eur added
+            (null where the department has no model)
+        """
+        log_pred = pl.col("intercept") + pl.col("area_effect")
+        for name in BASE_FEATURES:
+            log_pred = log_pred + pl.col(f"coef_{name}") * (pl.col(name) - pl.col(f"mean_{name}")) / pl.col(f"std_{name}")
+
+        # exp(sigma²/2): mean of a log-normal rather than its median
+        predicted_m2 = (log_pred + pl.col("sigma2") / 2).exp()
+
+        helper_columns = (
+            BASE_FEATURES + ["area_effect"]
+            + [c for c in self.coefficients.columns if c != DEPARTMENT_COLUMN]
+        )
+        return (
+            frame.lazy()
+            .with_columns(feature_expressions())
+            .join(self.coefficients.lazy(), on=DEPARTMENT_COLUMN, how="left")
+            .join(self.area_effects.lazy(), on=[DEPARTMENT_COLUMN, AREA_COLUMN], how="left")
+            .with_columns(
+                pl.col("area_effect").fill_null(0.0),
+                *[pl.col(name).fill_null(pl.col(f"fill_{name}")) for name in IMPUTED_FEATURES],
+            )
+            .with_columns(predicted_price_m2=predicted_m2)
+            .with_columns(predicted_price_eur=pl.col("predicted_price_m2") * pl.col("surface_final"))
+            .drop(helper_columns)
+            .collect()
+        )
+
+    def save(self) -> Path:
+        """Write the artifacts to data/models/hedonic/<data_hash>/."""
+        model_dir = get_hedonic_model_dir(self.data_hash)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        with atomic_output(model_dir / "coefficients.parquet") as tmp_path:
+            self.coefficients.write_parquet(tmp_path)
+        with atomic_output(model_dir / "area_effects.parquet") as tmp_path:
+            self.area_effects.write_parquet(tmp_path)
+        return model_dir
+
+    @classmethod
+    def load(cls, data_hash: str) -> HedonicModel | None:
+        """Load cached artifacts, or None when this training data was never fitted."""
+        model_dir = get_hedonic_model_dir(data_hash)
+        coefficients_path = model_dir / "coefficients.parquet"
+        area_effects_path = model_dir / "area_effects.parquet"
+        if not (coefficients_path.exists() and area_effects_path.exists()):
+            return None
+        return cls(pl.read_parquet(coefficients_path), pl.read_parquet(area_effects_path), data_hash)
+
+
+@instrumented()
+def fit_hedonic_model(df: pl.DataFrame, max_workers: int | None = None) -> HedonicModel:
+    """
+    Fit one model per department, in parallel.
+
+    Args:
+        df: DVF clean rows (see select_training_rows)
+        max_workers: Worker processes (default: CPU count)
+
+    Returns:
+        Fitted HedonicModel (not saved)
+    """
+    data_hash = training_data_hash(df)
+    features = df.select(
+        pl.col(DEPARTMENT_COLUMN),
+        pl.col(AREA_COLUMN).fill_null(""),
+        pl.col("price_m2").log().alias("y"),
+        *feature_expressions(),
+    )
+
+    tasks = []
+    for (code,), part in features.partition_by(DEPARTMENT_COLUMN, as_dict=True).items():
+        if len(part) < MIN_TRAIN_ROWS:
+            logger.warning(f"Department {code}: {len(part)} rows < {MIN_TRAIN_ROWS}, no model")
+            continue
+        tasks.append((
+            code,
+            part.select(BASE_FEATURES).to_numpy().astype(np.float64),
+            part["y"].to_numpy(),
+            part[AREA_COLUMN].to_numpy(),
+        ))
+
+    logger.info(f"Fitting {len(tasks)} department models ({max_workers or os.cpu_count()} workers)")
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_fit_department_task, tasks))
+
+    if not results:
+        raise ValueError("No department has enough training rows")
+
+    coefficients = pl.DataFrame([row for row, _ in results]).sort(DEPARTMENT_COLUMN)
+    area_effects = pl.concat([effects for _, effects in results])
+    return HedonicModel(coefficients, area_effects, data_hash)
+
+
+@instrumented()
+def train_or_load(df: pl.DataFrame, force: bool = False, max_workers: int | None = None) -> HedonicModel:
+    """
+    Get the model for this training data, refitting only when it changed.
+
+    Args:
+        df: DVF clean dataframe (filtered with select_training_rows)
+        force: Refit even if cached artifacts exist
+        max_workers: Worker processes for fitting
+
+    Returns:
+        HedonicModel
+    """
+    df = select_training_rows(df)
+    data_hash = training_data_hash(df)
+    if not force:
+        model = HedonicModel.load(data_hash)
+        if model is not None:
+            logger.info(f"✓ Loaded cached hedonic model {data_hash}")
+            return model
+
+    model = fit_hedonic_model(df, max_workers=max_workers)
+    model_dir = model.save()
+    logger.info(f"✓ Saved hedonic model to {model_dir}")
+    return model
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    try:
+        ensure_data_directories()
+
+        logger.info("=" * 70)
+        logger.info("HEDONIC PRICE MODEL")
+        logger.info("=" * 70)
+
+        dvf = pl.read_parquet(get_dvf_clean_path(), columns=TRAINING_COLUMNS)
+        model = train_or_load(dvf)
+
+        # In-sample fit quality
+        scored = model.predict(select_training_rows(dvf))
+        ape = ((scored["predicted_price_m2"] - scored["price_m2"]).abs() / scored["price_m2"]).drop_nulls()
+        logger.info(f"  Departments modelled: {len(model.coefficients):,}")
+        logger.info(f"  Rows scored: {ape.len():,}")
+        logger.info(f"  Median absolute % error (in-sample): {ape.median():.1%}")
+
+        logger.info("\n✅ Hedonic model ready!")
+
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}", exc_info=True)
+        sys.exit(1)
@@ -0,0 +1,328 @@
+"""
+Stage-level instrumentation shared by the pipelines
+
+Records, for each instrumented stage:
+- wall and CPU time
+- rows produced (length of the returned dataframe, or set explicitly)
+- RSS at start/end and peak RSS during the stage (Linux: VmHWM, reset per
+  stage through /proc/self/clear_refs; elsewhere the process high-water mark)
+- bytes read and written by the process during the stage (/proc/self/io)
+- the stage's memory budget, if any (pipelines/memory_budget.py); stages
+  peaking over it are logged as warnings
+
+Each finished stage is appended as one JSON line to the run report
+(data/reports/pipeline_runs.jsonl, or $PIPELINE_RUN_REPORT). When
+$PIPELINE_OPENMETRICS is set, an OpenMetrics text file with the per-stage
+totals of the run is written there at exit (e.g. for a node_exporter
+textfile collector).
+
+Usage:
+    @instrumented(labels=("level",))
+    def load_geometries_simple(level): ...
+
+    with stage("aggregate_price", level="commune") as s:
+        df = aggregate_price(...)
+        s.rows = len(df)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import logging
+import resource
+import functools
+from pathlib import Path
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_run_report_path
+from pipelines.atomic_files import write_text_atomic
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+RUN_REPORT_ENV = "PIPELINE_RUN_REPORT"
+OPENMETRICS_ENV = "PIPELINE_OPENMETRICS"
+
+# Metrics exported to OpenMetrics: record field -> (metric name, help)
+OPENMETRICS_FIELDS = {
+    "wall_s": ("pipeline_stage_duration_seconds", "Wall-clock time spent in the stage"),
+    "cpu_s": ("pipeline_stage_cpu_seconds", "CPU time (user + system) spent in the stage"),
+    "rows": ("pipeline_stage_rows", "Rows produced by the stage"),
+    "peak_rss_bytes": ("pipeline_stage_peak_rss_bytes", "Peak resident memory during the stage"),
+    "read_bytes": ("pipeline_stage_read_bytes", "Bytes read by the process during the stage"),
+    "written_bytes": ("pipeline_stage_written_bytes", "Bytes written by the process during the stage"),
+}
+
+RUN_ID = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}"
+SCRIPT = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "interactive"
+
+
+# ----------------------------
+# Process probes
+# ----------------------------
+
+def _read_proc(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def current_rss_bytes() -> int | None:
+    """Resident set size of this process."""
+    statm = _read_proc("/proc/self/statm")
+    if statm is None:
+        return None
+    return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss_bytes() -> int:
+    """Peak RSS since the last reset_peak_rss() (or process start)."""
+    status = _read_proc("/proc/self/status")
+    if status is not None:
+        for line in status.splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux >= 4.0); False when unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def io_counters() -> tuple[int, int] | None:
+    """(bytes read, bytes written) by this process, including page-cache hits."""
+    io = _read_proc("/proc/self/io")
+    if io is None:
+        return None
+    values = dict(line.split(": ") for line in io.splitlines() if ": " in line)
+    return int(values["rchar"]), int(values["wchar"])
+
+
+def _rows_of(result) -> int | None:
+    """Row count of a stage result (dataframe, or first element of a tuple)."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, "__len__") and hasattr(result, "columns"):
+        return len(result)
+    return None
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+
+class Stage:
+    """
+    Measurements of one running stage (set `rows` to override the row count;
+    `record` holds the finished measurements).
+    """
+
+    def __init__(self, name: str, labels: dict[str, str], parent: Stage | None):
+        self.name = name
+        self.labels = labels
+        self.parent = parent
+        self.rows: int | None = None
+        self.child_peak_rss = 0
+        self.record: dict | None = None
+
+    def start(self) -> None:
+        self.started_at = datetime.now(timezone.utc)
+        self.rss_start = current_rss_bytes()
+        self.io_start = io_counters()
+        if self.parent is not None:
+            # The reset is process-wide: keep the parent's peak up to now
+            self.parent.child_peak_rss = max(self.parent.child_peak_rss, peak_rss_bytes())
+        self.own_peak = reset_peak_rss()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+
+    def finish(self, error: BaseException | None) -> dict:
+        from pipelines.memory_budget import memory_budget
+
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        io_end = io_counters()
+        peak = max(peak_rss_bytes(), self.child_peak_rss)
+        if self.parent is not None:
+            self.parent.child_peak_rss = max(self.parent.child_peak_rss, peak)
+        budget = memory_budget(self.name)
+        if budget is not None and peak > budget and self.name not in _over_budget:
+            _over_budget.add(self.name)
+            logger.warning(
+                f"Stage {self.name} peaked at {peak / 1024 ** 2:,.0f} MB, "
+                f"over its {budget / 1024 ** 2:,.0f} MB memory budget"
+            )
+
+        self.record = {
+            "run_id": RUN_ID,
+            "script": SCRIPT,
+            "stage": self.name,
+            "labels": self.labels,
+            "parent": self.parent.name if self.parent else None,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "rows": self.rows,
+            "rss_start_bytes": self.rss_start,
+            "rss_end_bytes": current_rss_bytes(),
+            "peak_rss_bytes": peak,
+            "peak_rss_scope": "stage" if self.own_peak else "process",
+            "memory_budget_bytes": budget,
+            "read_bytes": io_end[0] - self.io_start[0] if io_end and self.io_start else None,
+            "written_bytes": io_end[1] - self.io_start[1] if io_end and self.io_start else None,
+            "status": "error" if error else "ok",
+            "error": type(error).__name__ if error else None,
+        }
+        return self.record
+
+
+_stack: list[Stage] = []
+_records: list[dict] = []
+_over_budget: set[str] = set()
+
+
+def _write_record(record: dict) -> None:
+    _records.append(record)
+    path = os.environ.get(RUN_REPORT_ENV) or get_run_report_path()
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.debug(f"Could not write run report: {e}")
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """
+    Measure a block of code as one stage.
+
+    Args:
+        name: Stage name (e.g. 'aggregate_price')
+        **labels: Extra dimensions (e.g. level='commune')
+
+    Yields:
+        Stage (set .rows to record the produced row count)
+    """
+    current = Stage(name, {k: str(v) for k, v in labels.items()}, _stack[-1] if _stack else None)
+    _stack.append(current)
+    current.start()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _stack.pop()
+        _write_record(current.finish(error))
+
+
+def instrumented(name: str | None = None, labels: tuple[str, ...] = ()):
+    """
+    Decorator measuring every call of a function as a stage.
+
+    Args:
+        name: Stage name (default: function name)
+        labels: Argument names recorded as labels (e.g. ('level',))
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+        signature = inspect.signature(func) if labels else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stage_labels = {}
+            if signature is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                bound.apply_defaults()
+                stage_labels = {k: bound.arguments[k] for k in labels if k in bound.arguments}
+
+            with stage(stage_name, **stage_labels) as current:
+                result = func(*args, **kwargs)
+                if current.rows is None:
+                    current.rows = _rows_of(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+# ----------------------------
+# OpenMetrics export
+# ----------------------------
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_openmetrics(records: list[dict]) -> str:
+    """
+    Per-stage totals of a run in OpenMetrics text format.
+
+    Repeated calls of a stage with the same labels are summed (peak RSS: max).
+    """
+    totals: dict[tuple, dict] = {}
+    for record in records:
+        key = (record["script"], record["stage"], tuple(sorted(record["labels"].items())))
+        total = totals.setdefault(key, {})
+        for field in OPENMETRICS_FIELDS:
+            value = record.get(field)
+            if value is None:
+                continue
+            if field == "peak_rss_bytes":
+                total[field] = max(total.get(field, 0), value)
+            else:
+                total[field] = total.get(field, 0) + value
+
+    lines = []
+    for field, (metric, help_text) in OPENMETRICS_FIELDS.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"# HELP {metric} {help_text}")
+        for (script, stage_name, label_items), total in totals.items():
+            if field not in total:
+                continue
+            label_str = ",".join(
+                f'{k}="{_escape_label(str(v))}"'
+                for k, v in [("script", script), ("stage", stage_name), *label_items]
+            )
+            lines.append(f"{metric}{{{label_str}}} {total[field]}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_openmetrics(path: str | Path, records: list[dict] | None = None) -> Path:
+    """Write the OpenMetrics text file of this run's stages."""
+    path = Path(path)
+    write_text_atomic(path, format_openmetrics(_records if records is None else records))
+    return path
+
+
+@atexit.register
+def _export_at_exit() -> None:
+    openmetrics_path = os.environ.get(OPENMETRICS_ENV)
+    if openmetrics_path and _records:
+        write_openmetrics(openmetrics_path)
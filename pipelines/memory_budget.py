@@ -0,0 +1,200 @@
+"""
+Memory budget shared by the pipelines
+
+A global budget ($PIPELINE_MEMORY_BUDGET, e.g. '6GB') caps the resident
+memory the pipelines plan for; a stage-specific variable overrides it
+($PIPELINE_MEMORY_BUDGET_GENERATE_IRIS, $PIPELINE_MEMORY_BUDGET_AGGREGATE).
+Without a budget the pipelines run in a single in-memory pass.
+
+Under a budget the pipelines:
+- process in department batches sized to the memory left under the budget
+  (plan_batch), re-estimating the per-row cost from the measured peak RSS
+- release intermediates between batches (release_memory)
+- spill intermediates to disk (SpillDirectory) and aggregate them with the
+  Polars streaming engine instead of holding them in memory
+
+Peak RSS per stage is in the run report (pipelines/instrumentation.py),
+together with the stage's budget when one is set.
+
+Usage:
+    budget = memory_budget("generate_iris")
+    batch = plan_batch(remaining_departments, iris_per_department, budget, bytes_per_iris)
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import re
+import sys
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_spill_dir
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+MEMORY_BUDGET_ENV = "PIPELINE_MEMORY_BUDGET"
+
+SIZE_UNITS = {
+    "": 1, "b": 1,
+    "k": 1024, "kb": 1024, "kib": 1024,
+    "m": 1024 ** 2, "mb": 1024 ** 2, "mib": 1024 ** 2,
+    "g": 1024 ** 3, "gb": 1024 ** 3, "gib": 1024 ** 3,
+    "t": 1024 ** 4, "tb": 1024 ** 4, "tib": 1024 ** 4,
+}
+
+# Share of the budget left unplanned (allocator fragmentation, estimate error)
+BUDGET_SAFETY_MARGIN = 0.15
+
+
+# ----------------------------
+# Budget
+# ----------------------------
+
+def parse_size(text: str) -> int:
+    """Parse a memory size ('512MB', '6GB', '1.5g', '1073741824') to bytes."""
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*", str(text))
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise ValueError(f"Invalid memory size: {text!r} (e.g. '512MB', '6GB')")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def stage_budget_env(stage: str) -> str:
+    """Environment variable of a stage-specific budget (e.g. PIPELINE_MEMORY_BUDGET_GENERATE_IRIS)."""
+    return f"{MEMORY_BUDGET_ENV}_{re.sub(r'[^0-9A-Za-z]+', '_', stage).upper()}"
+
+
+def memory_budget(stage: str | None = None) -> int | None:
+    """
+    Memory budget in bytes of a stage (its own variable, else the global one).
+
+    Returns:
+        Budget in bytes, or None when no budget is configured
+    """
+    value = os.environ.get(stage_budget_env(stage)) if stage else None
+    value = value or os.environ.get(MEMORY_BUDGET_ENV)
+    return parse_size(value) if value else None
+
+
+def available_bytes(budget: int) -> int:
+    """Memory that can still be planned under a budget (budget minus margin minus current RSS)."""
+    from pipelines.instrumentation import current_rss_bytes
+
+    return max(0, int(budget * (1.0 - BUDGET_SAFETY_MARGIN)) - (current_rss_bytes() or 0))
+
+
+def parquet_uncompressed_bytes(path: Path, columns: list[str] | None = None) -> int:
+    """Uncompressed size of (some columns of) a Parquet file, from its metadata."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    total = 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            if columns is None or column.path_in_schema in columns:
+                total += column.total_uncompressed_size
+    return total
+
+
+def release_memory() -> None:
+    """Collect garbage and return freed heap pages to the OS (glibc malloc_trim)."""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+# ----------------------------
+# Batches
+# ----------------------------
+
+def plan_batch(
+    keys: list[str],
+    weights: dict[str, int],
+    budget: int | None,
+    bytes_per_unit: float,
+) -> list[str]:
+    """
+    Next batch of keys (in order) whose estimated memory fits under the budget.
+
+    Args:
+        keys: Remaining keys (e.g. department codes), in processing order
+        weights: Units per key (e.g. IRIS per department)
+        budget: Memory budget in bytes (None: everything in one batch)
+        bytes_per_unit: Estimated peak memory per unit
+
+    Returns:
+        Leading keys of `keys` (at least one, even if it alone exceeds the budget)
+    """
+    if budget is None or not keys:
+        return list(keys)
+
+    capacity = available_bytes(budget) / max(bytes_per_unit, 1.0)
+    batch, units = [], 0
+    for key in keys:
+        if batch and units + weights.get(key, 0) > capacity:
+            break
+        batch.append(key)
+        units += weights.get(key, 0)
+
+    if units > capacity:
+        logger.warning(
+            f"Batch {batch[0]} alone is estimated at {units * bytes_per_unit / 1024 ** 2:,.0f} MB, "
+            f"over the {budget / 1024 ** 2:,.0f} MB budget"
+        )
+    return batch
+
+
+def observed_bytes_per_unit(record: dict, units: int, estimate: float) -> float:
+    """
+    Update a per-unit memory estimate from a finished stage record: the
+    stage's peak RSS growth divided by the units it processed (never below
+    the current estimate).
+    """
+    if not units or record.get("peak_rss_bytes") is None or record.get("rss_start_bytes") is None:
+        return estimate
+    return max(estimate, (record["peak_rss_bytes"] - record["rss_start_bytes"]) / units)
+
+
+# ----------------------------
+# Spilling
+# ----------------------------
+
+class SpillDirectory:
+    """
+    Temporary directory for intermediates spilled to disk (under
+    data/intermediate/spill), removed on exit.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.path: Path | None = None
+
+    def __enter__(self) -> SpillDirectory:
+        root = get_spill_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix=f"{self.prefix}-", dir=root))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def file(self, name: str) -> Path:
+        """Path of a spill file."""
+        return self.path / name
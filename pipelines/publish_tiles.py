@@ -0,0 +1,220 @@
+"""
+Publish tiles as generations behind a `current` pointer
+
+Rebuilding app/tiles/ in place while the tile server reads it would serve a
+mix of old and new files (a new layers.json pointing to chunks not written
+yet). This runner builds a new generation next to the served one and
+switches to it in one step:
+
+1. Clone the current generation into app/generations/<id>/ with hard links
+   (no copy; unchanged stages are still skipped by the build manifest)
+2. Run the tile pipelines with $PIPELINE_TILES_DIR set to the new generation
+3. Point app/tiles at it: a relative symlink, replaced atomically (a new
+   symlink renamed over the old one)
+4. Remove old generations, keeping the last KEEP_GENERATIONS (requests in
+   flight on the previous one still complete)
+
+Files in the clone are hard links to the served ones; writers never modify
+them in place (pipelines/atomic_files.py), so building the new generation
+leaves the served one untouched. A failed pipeline discards its generation
+and app/tiles keeps pointing to the previous one. Concurrent publishes are
+serialized by a lock file.
+
+On the first run, an app/tiles/ built in place is moved into a generation.
+
+Usage:
+    python pipelines/publish_tiles.py build_geojson generate_iris
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import fcntl
+import shutil
+import logging
+import itertools
+import argparse
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import APP_DIR, APP_CURRENT_TILES_DIR, APP_GENERATIONS_DIR, PIPELINES_DIR
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Tile pipelines, run in this order
+PIPELINES = ["build_geojson", "generate_iris", "build_tiles"]
+DEFAULT_PIPELINES = ["build_geojson", "generate_iris"]
+
+# Generations kept after a publish (the current one included)
+KEEP_GENERATIONS = 3
+
+LOCK_FILE = APP_DIR / ".publish.lock"
+
+# Sequence number of the generations created by this process
+_generation_sequence = itertools.count()
+
+
+# ----------------------------
+# Generations
+# ----------------------------
+
+def new_generation_id() -> str:
+    """
+    Generation directory name: build start time, sortable, plus the pid and a
+    per-process sequence number (the first run creates two generations, the
+    migrated one and the new one, within the same second).
+    """
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_generation_sequence):03d}"
+
+
+def current_generation() -> Path | None:
+    """Generation app/tiles points to (None when it is not a generation symlink)."""
+    if not APP_CURRENT_TILES_DIR.is_symlink():
+        return None
+    target = APP_CURRENT_TILES_DIR.resolve()
+    return target if target.is_dir() else None
+
+
+def switch_current(generation: Path) -> None:
+    """Atomically point app/tiles at a generation."""
+    tmp_link = APP_DIR / f".tiles.{os.getpid()}.tmp"
+    tmp_link.unlink(missing_ok=True)
+    tmp_link.symlink_to(generation.relative_to(APP_DIR), target_is_directory=True)
+    os.replace(tmp_link, APP_CURRENT_TILES_DIR)
+
+
+def migrate_in_place_tiles() -> None:
+    """Move an app/tiles/ directory built in place into the first generation."""
+    if APP_CURRENT_TILES_DIR.is_symlink() or not APP_CURRENT_TILES_DIR.is_dir():
+        return
+    generation = APP_GENERATIONS_DIR / new_generation_id()
+    logger.info(f"📦 Moving {APP_CURRENT_TILES_DIR} into generation {generation.name}")
+    APP_GENERATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    APP_CURRENT_TILES_DIR.rename(generation)
+    switch_current(generation)
+
+
+def clone_generation(source: Path | None, generation: Path) -> None:
+    """New generation directory, with hard links to the files of `source`."""
+    if source is None:
+        generation.mkdir(parents=True)
+    else:
+        shutil.copytree(source, generation, copy_function=os.link)
+
+
+def prune_generations(keep: int = KEEP_GENERATIONS) -> list[Path]:
+    """
+    Remove old generations, keeping the newest `keep` and the current one.
+
+    Returns:
+        Removed generation directories
+    """
+    if not APP_GENERATIONS_DIR.exists():
+        return []
+    current = current_generation()
+    generations = sorted(p for p in APP_GENERATIONS_DIR.iterdir() if p.is_dir())
+    removed = [p for p in generations[:-keep] if p != current] if keep > 0 else []
+    for generation in removed:
+        shutil.rmtree(generation)
+    return removed
+
+
+@contextmanager
+def publish_lock():
+    """Exclusive lock on the app directory, held while a generation is built."""
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with LOCK_FILE.open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(f"Another publish is running ({LOCK_FILE} is locked)")
+        yield
+
+
+# ----------------------------
+# Main pipeline
+# ----------------------------
+
+def run_pipeline(name: str, generation: Path) -> bool:
+    """Run a tile pipeline script with its output redirected to a generation."""
+    logger.info(f"\n▶️  {name} -> {generation.name}")
+    env = {**os.environ, "PIPELINE_TILES_DIR": str(generation)}
+    result = subprocess.run([sys.executable, str(PIPELINES_DIR / f"{name}.py")], env=env)
+    if result.returncode != 0:
+        logger.error(f"{name} failed (exit code {result.returncode})")
+        return False
+    return True
+
+
+def publish_tiles(pipelines: list[str] | None = None, keep: int = KEEP_GENERATIONS) -> Path | None:
+    """
+    Build a new tiles generation and make it the current one.
+
+    Args:
+        pipelines: Pipelines to run (default: DEFAULT_PIPELINES)
+        keep: Generations kept after the switch
+
+    Returns:
+        Path to the published generation, or None if a pipeline failed
+    """
+    pipelines = pipelines or DEFAULT_PIPELINES
+    unknown = [name for name in pipelines if name not in PIPELINES]
+    if unknown:
+        raise ValueError(f"Unknown pipelines: {unknown} (expected some of {PIPELINES})")
+
+    with publish_lock():
+        migrate_in_place_tiles()
+        previous = current_generation()
+        generation = APP_GENERATIONS_DIR / new_generation_id()
+        clone_generation(previous, generation)
+        logger.info(f"🧱 Building generation {generation.name}"
+                    + (f" (from {previous.name})" if previous else ""))
+
+        for name in sorted(pipelines, key=PIPELINES.index):
+            if not run_pipeline(name, generation):
+                shutil.rmtree(generation, ignore_errors=True)
+                logger.error(f"❌ Generation discarded; {APP_CURRENT_TILES_DIR} unchanged")
+                return None
+
+        switch_current(generation)
+        logger.info(f"✅ {APP_CURRENT_TILES_DIR} -> {generation.relative_to(APP_DIR)}")
+
+        for removed in prune_generations(keep):
+            logger.info(f"🗑️  Removed generation {removed.name}")
+
+    return generation
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build tiles into a new generation and publish it")
+    parser.add_argument("pipelines", nargs="*", metavar="PIPELINE",
+                        help=f"Pipelines to run, some of {PIPELINES} (default: {DEFAULT_PIPELINES})")
+    parser.add_argument("--keep", type=int, default=KEEP_GENERATIONS,
+                        help="Generations kept after the switch")
+    args = parser.parse_args()
+
+    try:
+        sys.exit(0 if publish_tiles(args.pipelines, keep=args.keep) else 1)
+    except (RuntimeError, ValueError) as e:
+        logger.error(str(e))
+        sys.exit(1)
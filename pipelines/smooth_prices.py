@@ -0,0 +1,314 @@
+"""
+Spatial smoothing pipeline for low-volume communes (optional stage)
+
+aggregate_price drops communes under MIN_SALES_BY_LEVEL, so rural communes
+have no price at all. This stage fills every commune with an empirical-Bayes
+estimate shrunk toward its neighbours:
+
+1. Commune adjacency graph from the ADMIN EXPRESS COMMUNE polygons
+   (STRtree intersects query), stored once as CSR arrays
+   (indptr / indices, data/intermediate/commune_adjacency.npz)
+2. Per property type, mean log(price_m2) and n_sales for every commune
+3. Shrinkage weight w_i = n_i / (n_i + k), with k = σ² / τ² estimated from
+   within-commune (σ²) and between-commune (τ²) variance
+4. Jacobi iterations s = w·ȳ + (1 - w)·(A s / degree) as sparse
+   matrix-vector products until convergence
+
+Output: data/mart/commune_smoothed.parquet, one row per commune × property
+type with `smoothed_price_m2` filled for every commune of the graph. It is
+exp(smoothed mean log price): a geometric mean of €/m², which sits below
+the arithmetic mean and close to the median for log-normal prices; the raw
+`median_price_m2` is kept next to it. Property types with no sales at all
+are skipped.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import (
+    get_dvf_clean_path,
+    get_admin_boundaries_path,
+    get_commune_adjacency_path,
+    get_smoothed_commune_mart_path,
+    ensure_data_directories,
+)
+from pipelines.aggregate import PROPERTY_TYPES, insee_code
+from pipelines.boundaries import get_boundary_edition
+from pipelines.instrumentation import instrumented
+from pipelines.atomic_files import atomic_output
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Jacobi iterations stop when no commune moves by more than this (log €/m²)
+SMOOTHING_TOLERANCE = 1e-5
+SMOOTHING_MAX_ITERATIONS = 500
+
+# Lower bound of the between-commune variance (avoids infinite shrinkage)
+MIN_BETWEEN_VARIANCE = 1e-4
+
+
+# ----------------------------
+# Adjacency graph
+# ----------------------------
+
+@instrumented()
+def build_commune_adjacency() -> dict[str, np.ndarray]:
+    """
+    Build the commune adjacency graph from the ADMIN EXPRESS polygons.
+
+    Returns:
+        CSR arrays: 'codes' (code_insee per row), 'indptr', 'indices'
+    """
+    import geopandas as gpd
+    import shapely
+
+    logger.info("Building commune adjacency graph")
+    communes = gpd.read_file(get_admin_boundaries_path(), layer="COMMUNE", columns=["code_insee"])
+    geometries = communes.geometry.values.to_numpy()
+    tree = shapely.STRtree(geometries)
+
+    # Communes sharing a border (or a point) intersect; drop self pairs
+    rows, cols = tree.query(geometries, predicate="intersects")
+    keep = rows != cols
+    rows, cols = rows[keep], cols[keep]
+
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    indptr = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(geometries)), out=indptr[1:])
+
+    return {
+        "codes": np.asarray(communes["code_insee"], dtype=str),
+        "indptr": indptr,
+        "indices": cols.astype(np.int32),
+    }
+
+
+def load_commune_adjacency(force: bool = False) -> dict[str, np.ndarray]:
+    """
+    Get the commune adjacency graph, rebuilding it when the ADMIN EXPRESS
+    edition changed.
+    """
+    path = get_commune_adjacency_path()
+    edition = get_boundary_edition("commune")
+
+    if path.exists() and not force:
+        with np.load(path, allow_pickle=False) as cached:
+            if str(cached["edition"]) == edition:
+                logger.info(f"✓ Loaded commune adjacency ({edition})")
+                return {name: cached[name] for name in ("codes", "indptr", "indices")}
+
+    start = time.perf_counter()
+    graph = build_commune_adjacency()
+    with atomic_output(path) as tmp_path:
+        np.savez(tmp_path, edition=np.array(edition), **graph)
+    logger.info(
+        f"✓ Adjacency: {len(graph['codes']):,} communes, {len(graph['indices']):,} edges "
+        f"({time.perf_counter() - start:.1f}s) → {path}"
+    )
+    return graph
+
+
+# ----------------------------
+# Smoothing
+# ----------------------------
+
+def commune_observations(df: pl.DataFrame, codes: np.ndarray, property_type: str) -> pl.DataFrame:
+    """
+    Per-commune statistics aligned with the graph rows.
+
+    Returns:
+        One row per graph commune: code_insee, n_sales, mean_log, ss_log
+        (sum of squared deviations), median_price_m2 (null without sales)
+    """
+    stats = (
+        df.filter(pl.col("Type local") == property_type)
+        .with_columns(pl.col("price_m2").log().alias("log_price_m2"))
+        .group_by("code_insee")
+        .agg(
+            n_sales=pl.len(),
+            mean_log=pl.col("log_price_m2").mean(),
+            ss_log=((pl.col("log_price_m2") - pl.col("log_price_m2").mean()) ** 2).sum(),
+            median_price_m2=pl.col("price_m2").median(),
+        )
+    )
+    return (
+        pl.DataFrame({"code_insee": codes})
+        .join(stats, on="code_insee", how="left")
+        .with_columns(
+            pl.col("n_sales").fill_null(0),
+            pl.col("mean_log").fill_null(0.0),
+            pl.col("ss_log").fill_null(0.0),
+        )
+    )
+
+
+@instrumented()
+def smooth_log_prices(
+    graph: dict[str, np.ndarray],
+    n: np.ndarray,
+    mean_log: np.ndarray,
+    ss_log: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Empirical-Bayes shrinkage of commune mean log prices toward neighbour means.
+
+    Args:
+        graph: CSR adjacency (see build_commune_adjacency)
+        n: Sales per commune
+        mean_log: Mean log(price_m2) per commune (ignored where n == 0)
+        ss_log: Within-commune sum of squared deviations
+
+    Returns:
+        (smoothed log prices, shrinkage weights, diagnostics)
+
+    Raises:
+        ValueError: if no commune has sales
+    """
+    indptr, indices = graph["indptr"], graph["indices"]
+    n_communes = len(indptr) - 1
+    degree = np.diff(indptr)
+    edge_rows = np.repeat(np.arange(n_communes), degree)
+
+    observed = n > 0
+    if not observed.any():
+        raise ValueError("No commune has sales: nothing to smooth toward")
+    global_mean = float(np.average(mean_log[observed], weights=n[observed]))
+
+    # σ²: pooled within-commune variance; τ²: between-commune variance
+    dof = n[observed].sum() - observed.sum()
+    sigma2 = float(ss_log.sum() / dof) if dof > 0 else 0.0
+    tau2 = max(
+        float(np.var(mean_log[observed]) - np.mean(sigma2 / n[observed])),
+        MIN_BETWEEN_VARIANCE,
+    )
+    k = sigma2 / tau2
+    # Only observed communes: with k = 0 (no within-commune variance) the
+    # others would evaluate 0 / 0
+    weight = np.zeros(n_communes)
+    weight[observed] = n[observed] / (n[observed] + k)
+
+    # Jacobi iterations: s = w·ȳ + (1 - w)·neighbour mean(s)
+    smoothed = np.where(observed, mean_log, global_mean)
+    has_neighbours = degree > 0
+    safe_degree = np.maximum(degree, 1)
+    for iteration in range(1, SMOOTHING_MAX_ITERATIONS + 1):
+        neighbour_sum = np.bincount(edge_rows, weights=smoothed[indices], minlength=n_communes)
+        prior = np.where(has_neighbours, neighbour_sum / safe_degree, global_mean)
+        updated = weight * mean_log + (1.0 - weight) * prior
+        delta = float(np.max(np.abs(updated - smoothed))) if n_communes else 0.0
+        smoothed = updated
+        if delta < SMOOTHING_TOLERANCE:
+            break
+
+    diagnostics = {"sigma2": sigma2, "tau2": tau2, "k": k, "iterations": iteration, "delta": delta}
+    return smoothed, weight, diagnostics
+
+
+@instrumented()
+def smooth_commune_prices(df: pl.DataFrame | None = None, force_graph: bool = False) -> pl.DataFrame:
+    """
+    Build the smoothed commune mart.
+
+    Args:
+        df: Clean DVF dataframe (default: loaded from config)
+        force_graph: Rebuild the adjacency graph even if cached
+
+    Returns:
+        One row per commune × property type with smoothed_price_m2
+        (geometric mean €/m²)
+    """
+    if df is None:
+        df = pl.read_parquet(
+            get_dvf_clean_path(),
+            columns=["Code departement", "Code commune", "Type local", "price_m2"],
+        )
+    df = df.filter(pl.col("price_m2") > 0).with_columns(
+        insee_code()
+    )
+
+    graph = load_commune_adjacency(force=force_graph)
+
+    unmatched = df.filter(~pl.col("code_insee").is_in(graph["codes"].tolist()))["code_insee"].n_unique()
+    if unmatched:
+        logger.warning(f"{unmatched:,} DVF communes are not in the adjacency graph (not smoothed)")
+
+    results = []
+    for property_type in PROPERTY_TYPES:
+        start = time.perf_counter()
+        obs = commune_observations(df, graph["codes"], property_type)
+        if obs["n_sales"].sum() == 0:
+            logger.warning(f"{property_type}: no sales in any commune, skipped")
+            continue
+        smoothed, weight, diag = smooth_log_prices(
+            graph,
+            obs["n_sales"].to_numpy(),
+            obs["mean_log"].to_numpy(),
+            obs["ss_log"].to_numpy(),
+        )
+        logger.info(
+            f"✓ {property_type}: k={diag['k']:.1f} pseudo-sales, {diag['iterations']} iterations "
+            f"({time.perf_counter() - start:.2f}s)"
+        )
+        results.append(
+            obs.select("code_insee", "n_sales", "median_price_m2").with_columns(
+                pl.lit(property_type).alias("Type local"),
+                pl.Series("smoothed_price_m2", np.exp(smoothed)).round(0),
+                pl.Series("shrinkage_weight", weight).cast(pl.Float32),
+            )
+        )
+
+    if not results:
+        raise ValueError("No sales to smooth for any property type")
+
+    return (
+        pl.concat(results)
+        .select("code_insee", "Type local", "n_sales", "median_price_m2", "smoothed_price_m2", "shrinkage_weight")
+        .sort("code_insee", "Type local")
+    )
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    try:
+        ensure_data_directories()
+
+        logger.info("=" * 70)
+        logger.info("SPATIAL PRICE SMOOTHING (COMMUNE)")
+        logger.info("=" * 70)
+
+        smoothed_df = smooth_commune_prices()
+        output_path = get_smoothed_commune_mart_path()
+        with atomic_output(output_path) as tmp_path:
+            smoothed_df.write_parquet(tmp_path)
+
+        n_filled = smoothed_df.filter(pl.col("median_price_m2").is_null()).height
+        logger.info(f"  Rows: {len(smoothed_df):,} ({n_filled:,} communes × types without sales, filled)")
+        logger.info(f"\n✅ Smoothed commune prices saved to {output_path}")
+
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}", exc_info=True)
+        sys.exit(1)
@@ -14,9 +14,28 @@ Two approaches:
 from __future__ import annotations
 
 import sys
+import logging
+from pathlib import Path
+
 import polars as pl
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
 # Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import (
+    get_dvf_clean_path,
+    get_dvf_with_geometries_path,
+    get_iris_boundaries_path,
+    ensure_data_directories,
+)
+from pipelines.atomic_files import atomic_output
 
 
 # ----------------------------
@@ -149,7 +168,8 @@ def enrich_with_geometries(
 
         # Save enriched data
         logger.info(f"Saving enriched data to {output_path}")
-        df.write_parquet(output_path)
+        with atomic_output(output_path) as tmp_path:
+            df.write_parquet(tmp_path)
         logger.info(f"✓ Saved {len(df):,} transactions")
 
         # Summary
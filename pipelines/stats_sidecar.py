@@ -0,0 +1,109 @@
+"""
+Statistics sidecar for the web map
+
+Per-period statistics are shipped separately from the (static) geometry:
+- One small Arrow IPC file per level, one row per area code ('code')
+- Floats stored as Float32, strings as plain Utf8 so Arrow JS can decode them
+- Pre-compressed .gz/.br siblings (Arrow JS does not read compressed IPC buffers)
+
+The frontend joins the sidecar to the geometry tiles through feature-state,
+so a price refresh only ships the sidecar.
+
+Usage:
+    sizes = write_stats_sidecar(df, APP_TILES_DIR / "stats" / "commune.arrow")
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import polars as pl
+
+from pipelines.atomic_files import atomic_output
+from pipelines.geojson_writer import write_compressed_siblings, get_size_report
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+SIDECAR_KEY_COLUMN = "code"
+
+# Statistics shipped to the frontend: matches both the total and the
+# per-property-type columns (e.g. n_sales, median_price_m2_maison)
+SIDECAR_STAT_PREFIXES = (
+    "n_sales",
+    "median_price_m2",
+    "p25_price_m2",
+    "p75_price_m2",
+    "last_tx_date",
+)
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def build_stats_sidecar(df: pl.DataFrame, key_col: str) -> pl.DataFrame:
+    """
+    Select and compact the statistics shipped to the frontend.
+
+    Args:
+        df: Aggregated dataframe, one row per area (see aggregate.pivot_property_types)
+        key_col: Area code column (e.g. 'code_insee', 'Code departement')
+
+    Returns:
+        Dataframe with a string 'code' column followed by the statistics columns
+    """
+    stat_cols = [c for c in df.columns if c != key_col and c.startswith(SIDECAR_STAT_PREFIXES)]
+
+    return (
+        df.filter(pl.col(key_col).is_not_null())
+        .select(
+            pl.col(key_col).cast(pl.Utf8).alias(SIDECAR_KEY_COLUMN),
+            *[pl.col(c) for c in stat_cols],
+        )
+        .with_columns(pl.col(pl.Float64).cast(pl.Float32))
+        .sort(SIDECAR_KEY_COLUMN)
+    )
+
+
+def write_stats_sidecar(df: pl.DataFrame, output_path: Path) -> dict[str, int]:
+    """
+    Write a statistics sidecar as an uncompressed Arrow IPC file plus .gz/.br siblings.
+
+    Args:
+        df: Sidecar dataframe (see build_stats_sidecar)
+        output_path: Destination .arrow path
+
+    Returns:
+        Size report of the written files
+    """
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Polars exports large/view strings; Arrow JS expects plain Utf8
+    table = df.to_arrow()
+    schema = pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_large_string(f.type) or pa.types.is_string_view(f.type) else f
+        for f in table.schema
+    ])
+    table = table.cast(schema)
+
+    with atomic_output(output_path) as tmp_path, ipc.new_file(str(tmp_path), schema) as writer:
+        writer.write_table(table)
+
+    write_compressed_siblings(output_path)
+
+    return get_size_report(output_path)
+
+
+def read_stats_sidecar(path: Path) -> pl.DataFrame:
+    """Read a statistics sidecar back into Polars (memory-mapped)."""
+    return pl.read_ipc(path, memory_map=True)
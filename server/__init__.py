@@ -0,0 +1,3 @@
+"""
+Serving package for mle_Challenge project (tiles, stats and the map app).
+"""
@@ -0,0 +1,166 @@
+"""
+Nearest-comparable-sales query module
+
+Answers "which K recent sales nearby are most similar to this property?"
+from the index written by pipelines/build_comparables_index.py:
+- points / split arrays are memory-mapped .npy files
+- the sales table is a memory-mapped Arrow IPC file
+- queries walk the implicit KD-tree (near child first, far child pruned by
+  its split-plane distance) and score leaves with NumPy
+
+Usage:
+    index = ComparablesIndex("Appartement")
+    index.query(lon=4.85, lat=45.75, surface=62, k=10)
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import logging
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_comparables_index_dir
+
+
+# ----------------------------
+# Index
+# ----------------------------
+
+class ComparablesIndex:
+    """Memory-mapped KD-tree of the sales of one property type."""
+
+    def __init__(self, property_type: str, path: Path | None = None):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        from pyproj import Transformer
+
+        self.path = Path(path) if path is not None else get_comparables_index_dir(property_type)
+        if not (self.path / "meta.json").exists():
+            raise FileNotFoundError(f"No comparables index at {self.path} (run pipelines/build_comparables_index.py)")
+
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.points = np.load(self.path / "points.npy", mmap_mode="r")
+        self.split_dim = np.load(self.path / "split_dim.npy", mmap_mode="r")
+        self.split_value = np.load(self.path / "split_value.npy", mmap_mode="r")
+        self.sales = pl.from_arrow(ipc.open_file(pa.memory_map(str(self.path / "sales.arrow"), "r")).read_all())
+
+        self.n_internal = len(self.split_dim)
+        self.date_origin = date.fromisoformat(self.meta["date_origin"])
+        self.last_sale_date = (
+            date.fromisoformat(self.meta["last_sale_date"]) if self.meta.get("last_sale_date") else date.today()
+        )
+        self.transformer = Transformer.from_crs("EPSG:4326", self.meta["crs"], always_xy=True)
+
+    def encode(self, lon: float, lat: float, surface: float, sale_date: date | None = None) -> np.ndarray:
+        """Query point in the index's scaled feature space."""
+        x, y = self.transformer.transform(lon, lat)
+        days = ((sale_date or self.last_sale_date) - self.date_origin).days
+        return np.array([
+            x / self.meta["distance_scale_m"],
+            y / self.meta["distance_scale_m"],
+            np.log(surface) / self.meta["surface_log_scale"],
+            days / self.meta["date_scale_days"],
+        ], dtype=np.float32)
+
+    def nearest(self, q: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        K nearest rows to an encoded query point.
+
+        Returns:
+            (squared distances, row indices), sorted by distance
+        """
+        best_d = np.full(k, np.inf, dtype=np.float64)
+        best_i = np.full(k, -1, dtype=np.int64)
+        worst = np.inf
+
+        # (node, first row, end row, lower bound of the squared distance)
+        stack = [(0, 0, len(self.points), 0.0)]
+        while stack:
+            node, start, stop, bound = stack.pop()
+            if bound >= worst or stop <= start:
+                continue
+
+            if node >= self.n_internal:
+                diff = self.points[start:stop] - q
+                d = np.einsum("ij,ij->i", diff, diff, dtype=np.float64)
+                cand_d = np.concatenate([best_d, d])
+                cand_i = np.concatenate([best_i, np.arange(start, stop)])
+                keep = np.argpartition(cand_d, k - 1)[:k] if len(cand_d) > k else np.arange(len(cand_d))
+                best_d, best_i = cand_d[keep], cand_i[keep]
+                worst = best_d.max()
+                continue
+
+            mid = (start + stop) // 2
+            delta = float(q[self.split_dim[node]] - self.split_value[node])
+            left = (2 * node + 1, start, mid)
+            right = (2 * node + 2, mid, stop)
+            near, far = (left, right) if delta < 0 else (right, left)
+            stack.append((*far, max(bound, delta * delta)))
+            stack.append((*near, bound))
+
+        order = np.argsort(best_d)
+        best_d, best_i = best_d[order], best_i[order]
+        found = best_i >= 0
+        return best_d[found], best_i[found]
+
+    def query(
+        self,
+        lon: float,
+        lat: float,
+        surface: float,
+        sale_date: date | None = None,
+        k: int = 10,
+    ) -> pl.DataFrame:
+        """
+        K most similar sales.
+
+        Args:
+            lon, lat: Property location (WGS84)
+            surface: Property surface (m²)
+            sale_date: Reference date (default: latest sale in the index)
+            k: Number of comparables
+
+        Returns:
+            Sales rows with 'similarity_distance' (scaled units, 1 ~ 1 km)
+            and 'distance_m' (straight-line distance to the property)
+        """
+        q = self.encode(lon, lat, surface, sale_date)
+        dist2, rows = self.nearest(q, k)
+        x = q[0] * self.meta["distance_scale_m"]
+        y = q[1] * self.meta["distance_scale_m"]
+        return (
+            self.sales[rows]
+            .with_columns(
+                similarity_distance=pl.Series(np.sqrt(dist2)),
+                distance_m=((pl.col("x") - x) ** 2 + (pl.col("y") - y) ** 2).sqrt(),
+            )
+            .drop(["x", "y"])
+        )
+
+
+class ComparablesLookup:
+    """Lazily opened ComparablesIndex per property type."""
+
+    def __init__(self):
+        self._indexes: dict[str, ComparablesIndex] = {}
+
+    def index(self, property_type: str) -> ComparablesIndex:
+        if property_type not in self._indexes:
+            comparables_index = ComparablesIndex(property_type)
+            logger.info(f"✓ Opened {property_type} comparables index ({comparables_index.meta['n_sales']:,} sales)")
+            self._indexes[property_type] = comparables_index
+        return self._indexes[property_type]
+
+    def query(self, property_type: str, lon: float, lat: float, surface: float,
+              sale_date: date | None = None, k: int = 10) -> pl.DataFrame:
+        """K most similar sales (see ComparablesIndex.query)."""
+        return self.index(property_type).query(lon, lat, surface, sale_date, k)
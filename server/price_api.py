@@ -0,0 +1,168 @@
+"""
+Price lookup HTTP endpoint
+
+Extends the tile server with a JSON API backed by the memory-mapped marts:
+
+    GET /api/price?level=postcode&code=69003&type=Appartement
+    GET /api/price?level=commune&code=69123,13055&type=Maison     (batch)
+    GET /api/price?level=department&code=69                      (all types)
+    GET /api/comparables?type=Appartement&lon=4.85&lat=45.75&surface=62&k=10
+
+Usage:
+    python3 server/price_api.py --port 8000
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import date
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from server.tile_server import TileServer, ByteRangeCache, DEFAULT_HOST, DEFAULT_PORT, CACHE_MAX_BYTES
+from server.price_lookup import PriceLookup
+from server.comparables import ComparablesLookup
+from pipelines.aggregate import LEVEL_KEY_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+API_PRICE_PATH = "/api/price"
+API_COMPARABLES_PATH = "/api/comparables"
+
+# Maximum number of codes in one batch request
+MAX_BATCH_CODES = 10_000
+
+# Maximum number of comparables in one request
+MAX_COMPARABLES = 100
+
+
+# ----------------------------
+# Server
+# ----------------------------
+
+class PriceApiServer(TileServer):
+    """Tile server + /api/price and /api/comparables lookups."""
+
+    def __init__(self, lookup: PriceLookup | None = None, comparables: ComparablesLookup | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.lookup = lookup or PriceLookup()
+        self.comparables = comparables or ComparablesLookup()
+
+    def query(self, params: dict[str, list[str]]) -> tuple[int, dict]:
+        """Run a lookup from query-string parameters; returns (status, JSON payload)."""
+        level = params.get("level", ["commune"])[0]
+        if level not in LEVEL_KEY_COLUMNS:
+            return 400, {"error": f"Unknown level: {level}"}
+        property_type = params.get("type", [None])[0]
+        codes = [c for value in params.get("code", [""]) for c in value.split(",")]
+
+        try:
+            mart_index = self.lookup.index(level)
+        except FileNotFoundError:
+            return 404, {"error": f"No mart for level: {level}"}
+
+        if len(codes) == 1:
+            return 200, {
+                "level": level,
+                "code": codes[0],
+                "type": property_type,
+                "result": mart_index.get(codes[0], property_type),
+            }
+
+        if property_type is None:
+            return 400, {"error": "Batch lookups require a 'type' parameter"}
+        if len(codes) > MAX_BATCH_CODES:
+            return 400, {"error": f"At most {MAX_BATCH_CODES} codes per request"}
+
+        columns = mart_index.get_many(codes, property_type)
+        found = columns.pop("found")
+        results = []
+        for i, code in enumerate(codes):
+            if not found[i]:
+                results.append(None)
+                continue
+            row = {"Type local": property_type}
+            for name, values in columns.items():
+                value = values[i]
+                row[name] = value.item() if isinstance(value, np.generic) else value
+            results.append(row)
+        return 200, {"level": level, "codes": codes, "type": property_type, "results": results}
+
+    def query_comparables(self, params: dict[str, list[str]]) -> tuple[int, dict]:
+        """K most similar sales from query-string parameters; returns (status, JSON payload)."""
+        property_type = params.get("type", ["Appartement"])[0]
+        try:
+            lon = float(params["lon"][0])
+            lat = float(params["lat"][0])
+            surface = float(params["surface"][0])
+            k = min(int(params.get("k", ["10"])[0]), MAX_COMPARABLES)
+            sale_date = date.fromisoformat(params["date"][0]) if "date" in params else None
+        except (KeyError, ValueError):
+            return 400, {"error": "Expected lon, lat, surface (and optional k, date=YYYY-MM-DD)"}
+        if surface <= 0 or k <= 0:
+            return 400, {"error": "surface and k must be positive"}
+
+        try:
+            results = self.comparables.query(property_type, lon, lat, surface, sale_date, k)
+        except FileNotFoundError:
+            return 404, {"error": f"No comparables index for type: {property_type}"}
+        return 200, {"type": property_type, "k": k, "results": results.to_dicts()}
+
+    async def handle_request(self, writer: asyncio.StreamWriter, method: str, target: str, headers: dict[str, str]) -> None:
+        url = urlsplit(target)
+        handlers = {API_PRICE_PATH: self.query, API_COMPARABLES_PATH: self.query_comparables}
+        if url.path not in handlers:
+            await super().handle_request(writer, method, target, headers)
+            return
+        if method not in ("GET", "HEAD"):
+            await self.send_error(writer, 405, extra={"Allow": "GET, HEAD"})
+            return
+
+        status, payload = handlers[url.path](parse_qs(url.query))
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        await self.send_head(writer, status, {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        })
+        if method == "GET":
+            writer.write(body)
+            await writer.drain()
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the map app, tiles and the price lookup APIs")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Size of the in-memory byte-range cache")
+    parser.add_argument("--preload", nargs="*", default=["department", "commune", "postcode"],
+                        help="Levels indexed at startup (others are indexed on first use)")
+    args = parser.parse_args()
+
+    api_server = PriceApiServer(
+        lookup=PriceLookup(args.preload),
+        cache=ByteRangeCache(max_bytes=args.cache_mb * 1024 * 1024),
+    )
+    try:
+        asyncio.run(api_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info(f"Stopped after {api_server.n_requests:,} requests")
@@ -0,0 +1,260 @@
+"""
+Price lookup query module
+
+Answers "what is the median €/m² for <type> in <area>?" without loading the
+marts into a dataframe:
+- Memory-maps the Arrow IPC copy of each mart (data/mart/<level>.arrow);
+  numeric columns are zero-copy NumPy views over the mapped buffers
+- Builds a hash index (area code, property type) -> row per level
+- Point lookups return one row as a dict; batch lookups gather whole
+  columns with NumPy take
+- Marts are rebuilt by replacing their file (pipelines/atomic_files.py): the
+  mapped file's inode and mtime are checked every RELOAD_CHECK_SECONDS and
+  the mart is remapped when they changed, without restarting the server;
+  a missing mart is looked for again on the same interval
+
+Usage:
+    lookup = PriceLookup()
+    lookup.get("postcode", "69003", "Appartement")
+    lookup.get_many("commune", ["69123", "13055"], "Maison")
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_mart_path, get_mart_ipc_path
+from pipelines.aggregate import LEVEL_KEY_COLUMNS
+from pipelines.atomic_files import atomic_output
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Statistics returned by lookups (when present in the mart)
+LOOKUP_STAT_COLUMNS = [
+    "n_sales",
+    "median_price_m2",
+    "p25_price_m2",
+    "p75_price_m2",
+    "last_tx_date",
+]
+
+# Seconds between checks that a mapped mart file was replaced
+RELOAD_CHECK_SECONDS = 1.0
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def _column_view(column):
+    """
+    Zero-copy NumPy view of a numeric Arrow column without nulls;
+    other columns are returned as Python lists.
+    """
+    import pyarrow as pa
+
+    array = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    if (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)) and array.null_count == 0:
+        return array.to_numpy(zero_copy_only=True)
+    return array.to_pylist()
+
+
+def ensure_mart_ipc(level: str) -> Path:
+    """
+    Get the Arrow IPC copy of a mart, converting it from Parquet when it is
+    missing or older than the Parquet file.
+    """
+    import polars as pl
+
+    ipc_path = get_mart_ipc_path(level)
+    parquet_path = get_mart_path(level)
+    if not ipc_path.exists() and not parquet_path.exists():
+        raise FileNotFoundError(f"No {level} mart ({parquet_path} not found)")
+    if not ipc_path.exists() or (
+        parquet_path.exists() and parquet_path.stat().st_mtime > ipc_path.stat().st_mtime
+    ):
+        logger.info(f"Converting {parquet_path.name} to Arrow IPC")
+        with atomic_output(ipc_path) as tmp_path:
+            pl.read_parquet(parquet_path).write_ipc(tmp_path, compression="uncompressed")
+    return ipc_path
+
+
+# ----------------------------
+# Indexes
+# ----------------------------
+
+class MartIndex:
+    """Memory-mapped mart of one level with a hash index on (code, property type)."""
+
+    def __init__(self, level: str, path: Path | None = None):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        if level not in LEVEL_KEY_COLUMNS:
+            raise ValueError(f"Unknown level: {level}. Must be one of {list(LEVEL_KEY_COLUMNS.keys())}")
+
+        self.level = level
+        self.path = Path(path) if path is not None else ensure_mart_ipc(level)
+
+        # Identity of the mapped file; taken before mapping, so a file replaced
+        # in between is only remapped once more
+        self.file_id = self._stat_id()
+
+        # Buffers stay backed by the mapped file (no copy)
+        self.table = ipc.open_file(pa.memory_map(str(self.path), "r")).read_all()
+        self.n_rows = self.table.num_rows
+
+        key_cols = LEVEL_KEY_COLUMNS[level]
+        codes = (
+            [str(c) if c is not None else None for c in self.table.column(key_cols[0]).to_pylist()]
+            if key_cols else [""] * self.n_rows
+        )
+        types = self.table.column("Type local").to_pylist()
+
+        self.index: dict[tuple[str, str], int] = {(c, t): i for i, (c, t) in enumerate(zip(codes, types))}
+        self.by_code: dict[str, list[int]] = {}
+        for i, c in enumerate(codes):
+            self.by_code.setdefault(c, []).append(i)
+
+        self.types = types
+        self.columns = {
+            name: _column_view(self.table.column(name))
+            for name in LOOKUP_STAT_COLUMNS if name in self.table.column_names
+        }
+
+    def _stat_id(self) -> tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_ino, stat.st_mtime_ns
+
+    def replaced(self) -> bool:
+        """Whether the mart file was replaced since it was mapped (new inode or mtime)."""
+        try:
+            return self._stat_id() != self.file_id
+        except FileNotFoundError:
+            return False
+
+    def row(self, i: int) -> dict:
+        """Materialize one row as a dict of Python scalars."""
+        out = {"Type local": self.types[i]}
+        for name, values in self.columns.items():
+            value = values[i]
+            out[name] = value.item() if isinstance(value, np.generic) else value
+        return out
+
+    def get(self, code: str, property_type: str | None = None) -> dict | list[dict] | None:
+        """
+        Point lookup.
+
+        Args:
+            code: Area code (ignored for the country level)
+            property_type: 'Maison' / 'Appartement', or None for all types
+
+        Returns:
+            One row (property_type given), a list of rows (property_type None),
+            or None when the area is unknown / under the min_sales threshold
+        """
+        code = "" if self.level == "country" else str(code)
+        if property_type is not None:
+            i = self.index.get((code, property_type))
+            return None if i is None else self.row(i)
+        rows = self.by_code.get(code)
+        return None if rows is None else [self.row(i) for i in rows]
+
+    def get_many(self, codes: list[str], property_type: str) -> dict[str, np.ndarray | list]:
+        """
+        Batch lookup for one property type.
+
+        Returns:
+            Column dict aligned with `codes`: a boolean 'found' mask plus one
+            array per statistic (NaN / 0 / None where not found)
+        """
+        index = self.index
+        if self.level == "country":
+            codes = [""] * len(codes)
+        positions = np.fromiter(
+            (index.get((str(c), property_type), -1) for c in codes),
+            dtype=np.int64,
+            count=len(codes),
+        )
+        found = positions >= 0
+        safe = np.where(found, positions, 0)
+
+        out: dict[str, np.ndarray | list] = {"found": found}
+        for name, values in self.columns.items():
+            if isinstance(values, np.ndarray):
+                taken = values.take(safe)
+                if np.issubdtype(taken.dtype, np.floating):
+                    taken[~found] = np.nan
+                else:
+                    taken[~found] = 0
+                out[name] = taken
+            else:
+                out[name] = [values[p] if ok else None for p, ok in zip(safe.tolist(), found.tolist())]
+        return out
+
+
+class PriceLookup:
+    """Lazily opened MartIndex per level, remapped when its file is replaced."""
+
+    def __init__(self, levels: list[str] | None = None, reload_check_seconds: float = RELOAD_CHECK_SECONDS):
+        self.reload_check_seconds = reload_check_seconds
+        self._indexes: dict[str, MartIndex] = {}
+        self._checked: dict[str, float] = {}
+        self._missing: dict[str, float] = {}
+        for level in levels or []:
+            self.index(level)
+
+    def index(self, level: str) -> MartIndex:
+        current = self._indexes.get(level)
+        now = time.monotonic()
+        if current is not None:
+            if now - self._checked[level] < self.reload_check_seconds:
+                return current
+            self._checked[level] = now
+            if not current.replaced():
+                return current
+            logger.info(f"🔄 {current.path.name} was replaced, remapping the {level} mart")
+
+        missing_since = self._missing.get(level)
+        if missing_since is not None and now - missing_since < self.reload_check_seconds:
+            raise FileNotFoundError(f"No {level} mart")
+
+        try:
+            mart_index = MartIndex(level)
+        except FileNotFoundError:
+            if current is None:
+                self._missing[level] = now
+                raise
+            logger.warning(f"The {level} mart file is gone, keeping the previous mapping")
+            return current
+        except (OSError, ValueError) as e:
+            if current is None:
+                raise
+            # Keep serving the previous mapping until the new file can be read
+            logger.warning(f"Could not remap the {level} mart, keeping the previous one: {e}")
+            return current
+        logger.info(f"✓ Indexed {level} mart ({mart_index.n_rows:,} rows)")
+        self._indexes[level] = mart_index
+        self._checked[level] = now
+        self._missing.pop(level, None)
+        return mart_index
+
+    def get(self, level: str, code: str, property_type: str | None = None):
+        """Point lookup (see MartIndex.get)."""
+        return self.index(level).get(code, property_type)
+
+    def get_many(self, level: str, codes: list[str], property_type: str):
+        """Batch lookup (see MartIndex.get_many)."""
+        return self.index(level).get_many(codes, property_type)
@@ -0,0 +1,220 @@
+"""
+Reverse-geocoding price lookup: coordinates -> IRIS / commune / department stats
+
+Loads the IRIS and commune polygons once (Lambert-93, as shipped) into
+STRtrees and resolves batches of WGS84 points fully vectorized:
+1. Project lon/lat arrays to Lambert-93 (pyproj, arrays in / arrays out)
+2. STRtree bounding-box query -> (point, polygon) candidate pairs
+3. Exact point-in-polygon on prepared polygons (shapely.contains_xy)
+4. Points outside every IRIS are resolved against the commune polygons
+5. Stats are taken from the IRIS mart, falling back to the commune mart and
+   then the department mart when an area is missing (under MIN_SALES_BY_LEVEL)
+
+Usage:
+    geocoder = ReverseGeocoder()
+    df = geocoder.lookup(lon_array, lat_array, "Appartement")
+"""
+
+from __future__ import annotations
+
+import sys
+import logging
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import get_admin_boundaries_path, get_iris_boundaries_path, get_commune_codes_path
+from server.price_lookup import PriceLookup, LOOKUP_STAT_COLUMNS
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# CRS of the boundary files (Lambert-93) and of the input points (WGS84)
+BOUNDARIES_CRS = "EPSG:2154"
+POINTS_CRS = "EPSG:4326"
+
+# Fallback order when an area has no (reliable) stats
+FALLBACK_LEVELS = ["iris", "commune", "department"]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+class PolygonIndex:
+    """Prepared polygons + STRtree for vectorized point-in-polygon."""
+
+    def __init__(self, geometries: np.ndarray, codes: np.ndarray):
+        import shapely
+
+        self.geometries = geometries
+        self.codes = codes
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def locate(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Index of the polygon containing each point (-1 when none).
+
+        Args:
+            x, y: Point coordinates in the polygons' CRS
+
+        Returns:
+            int64 array aligned with x / y
+        """
+        import shapely
+
+        result = np.full(len(x), -1, dtype=np.int64)
+        if len(x) == 0:
+            return result
+
+        # Candidates from bounding boxes, then exact test on prepared polygons
+        pt_idx, poly_idx = self.tree.query(shapely.points(x, y))
+        inside = shapely.contains_xy(self.geometries[poly_idx], x[pt_idx], y[pt_idx])
+        pt_idx, poly_idx = pt_idx[inside], poly_idx[inside]
+
+        # A point on a shared boundary may match twice: keep the first match
+        first_pt, first = np.unique(pt_idx, return_index=True)
+        result[first_pt] = poly_idx[first]
+        return result
+
+
+def load_commune_departments() -> dict[str, str]:
+    """
+    DVF department code of each INSEE commune code, from the commune code
+    lookup written by aggregate.py (empty when it has not been built).
+    """
+    path = get_commune_codes_path()
+    if not path.exists():
+        return {}
+    codes = pl.read_parquet(path, columns=["code_insee", "Code departement"])
+    return dict(zip(codes["code_insee"].to_list(), codes["Code departement"].to_list()))
+
+
+def department_code(code_insee: str, departments: dict[str, str]) -> str:
+    """Department code of an INSEE commune code (lookup, else its prefix)."""
+    if code_insee in departments:
+        return departments[code_insee]
+    return code_insee[:3] if code_insee.startswith("97") else code_insee[:2]
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+class ReverseGeocoder:
+    """Batch coordinates -> area codes -> mart statistics with level fallback."""
+
+    def __init__(self, prices: PriceLookup | None = None):
+        import geopandas as gpd
+        from pyproj import Transformer
+
+        self.prices = prices or PriceLookup()
+        # Levels whose missing mart was already reported
+        self._missing_levels: set[str] = set()
+        self.transformer = Transformer.from_crs(POINTS_CRS, BOUNDARIES_CRS, always_xy=True)
+
+        logger.info("Loading IRIS polygons")
+        iris = gpd.read_file(get_iris_boundaries_path(), columns=["code_iris", "code_insee"])
+        if iris.crs is not None and iris.crs != BOUNDARIES_CRS:
+            iris = iris.to_crs(BOUNDARIES_CRS)
+        self.iris = PolygonIndex(iris.geometry.values.to_numpy(), iris["code_iris"].to_numpy())
+        self.iris_commune = iris["code_insee"].to_numpy()
+
+        logger.info("Loading commune polygons")
+        communes = gpd.read_file(get_admin_boundaries_path(), layer="COMMUNE", columns=["code_insee"])
+        if communes.crs is not None and communes.crs != BOUNDARIES_CRS:
+            communes = communes.to_crs(BOUNDARIES_CRS)
+        self.communes = PolygonIndex(communes.geometry.values.to_numpy(), communes["code_insee"].to_numpy())
+        self.departments = load_commune_departments()
+
+        logger.info(f"✓ Indexed {len(self.iris.codes):,} IRIS and {len(self.communes.codes):,} communes")
+
+    def locate(self, lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Resolve WGS84 points to IRIS and commune codes.
+
+        Returns:
+            (code_iris, code_insee) object arrays, None where not found
+        """
+        x, y = self.transformer.transform(np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64"))
+
+        iris_idx = self.iris.locate(x, y)
+        in_iris = iris_idx >= 0
+        code_iris = np.full(len(x), None, dtype=object)
+        code_insee = np.full(len(x), None, dtype=object)
+        code_iris[in_iris] = self.iris.codes[iris_idx[in_iris]]
+        code_insee[in_iris] = self.iris_commune[iris_idx[in_iris]]
+
+        # Points outside every IRIS: commune polygons
+        rest = np.flatnonzero(~in_iris)
+        if len(rest):
+            commune_idx = self.communes.locate(x[rest], y[rest])
+            hit = commune_idx >= 0
+            code_insee[rest[hit]] = self.communes.codes[commune_idx[hit]]
+
+        return code_iris, code_insee
+
+    def lookup(self, lon: np.ndarray, lat: np.ndarray, property_type: str) -> pl.DataFrame:
+        """
+        Price statistics at each point, with IRIS -> commune -> department fallback.
+
+        Args:
+            lon, lat: WGS84 coordinate arrays
+            property_type: 'Maison' or 'Appartement'
+
+        Returns:
+            One row per point: code_iris, code_insee, stats_level (None when
+            no level has stats) and the LOOKUP_STAT_COLUMNS
+        """
+        code_iris, code_insee = self.locate(lon, lat)
+        n = len(code_iris)
+
+        level_codes = {
+            "iris": [c or "" for c in code_iris],
+            "commune": [c or "" for c in code_insee],
+            "department": [department_code(c, self.departments) if c else "" for c in code_insee],
+        }
+
+        stats_level = np.full(n, None, dtype=object)
+        resolved = np.zeros(n, dtype=bool)
+        columns: dict[str, np.ndarray] = {}
+
+        for level in FALLBACK_LEVELS:
+            try:
+                batch = self.prices.get_many(level, level_codes[level], property_type)
+            except FileNotFoundError:
+                if level not in self._missing_levels:
+                    logger.warning(f"No {level} mart, skipping this fallback level")
+                    self._missing_levels.add(level)
+                continue
+            self._missing_levels.discard(level)
+            take = batch["found"] & ~resolved
+            stats_level[take] = level
+            for name in LOOKUP_STAT_COLUMNS:
+                if name not in batch:
+                    continue
+                values = np.asarray(batch[name], dtype=object if isinstance(batch[name], list) else None)
+                if name not in columns:
+                    if values.dtype == object:
+                        columns[name] = np.full(n, None, dtype=object)
+                    elif np.issubdtype(values.dtype, np.integer):
+                        columns[name] = np.zeros(n, dtype=values.dtype)
+                    else:
+                        columns[name] = np.full(n, np.nan)
+                columns[name][take] = values[take]
+            resolved |= take
+
+        return pl.DataFrame({
+            "code_iris": code_iris,
+            "code_insee": code_insee,
+            "stats_level": stats_level,
+            **{name: values for name, values in columns.items()},
+        }, strict=False)
@@ -0,0 +1,514 @@
+"""
+Local tile/stat server
+
+Serves the map app (docs/) and the generated tiles (app/tiles/ under /tiles/)
+with a single-process asyncio server:
+- HTTP/1.1 keep-alive, GET and HEAD
+- Byte-range responses (206 / 416), required by PMTiles clients
+- Strong ETags from the build manifest (content hashes), with a
+  hash-on-first-use fallback; If-None-Match -> 304
+- Content-addressed files (commune.<hash>.arrow, see
+  pipelines/build_manifest.py) are served as immutable
+- Pre-compressed .br / .gz sibling negotiation through Accept-Encoding
+- Tiles published as generations (pipelines/publish_tiles.py): the app/tiles
+  symlink is resolved per request, so a switch is picked up without a
+  restart and a request is served from a single generation
+- Bounded in-memory LRU of hot byte ranges; large bodies go through sendfile
+
+Usage:
+    python3 server/tile_server.py --port 8000
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import asyncio
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Add project root to path to import config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config.paths import APP_CURRENT_TILES_DIR, DOCS_DIR
+from pipelines.build_manifest import CONTENT_HASH_LENGTH
+
+
+# ----------------------------
+# Config
+# ----------------------------
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# URL prefix mapped to APP_CURRENT_TILES_DIR; everything else is served from DOCS_DIR
+TILES_URL_PREFIX = "/tiles/"
+
+# Build manifest listing content hashes of the generated files
+MANIFEST_FILE = APP_CURRENT_TILES_DIR / "manifest.json"
+
+# In-memory cache of hot byte ranges
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+# Connection handling
+LISTEN_BACKLOG = 4096
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT_S = 15
+
+# Request bodies are never used: small ones are read and discarded to keep
+# the connection, larger or chunked ones close it after the response
+MAX_DISCARDED_BODY_BYTES = 64 * 1024
+
+# Single byte range spec: "start-end", "start-" or "-suffix"
+BYTE_RANGE = re.compile(r"([0-9]*)-([0-9]*)")
+
+CACHE_CONTROL = "public, no-cache"
+
+# Content-addressed names never change content: cached without revalidation
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CONTENT_ADDRESSED_NAME = re.compile(rf"[^/]+\.[0-9a-f]{{{CONTENT_HASH_LENGTH}}}\.[a-z0-9]+")
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".geojson": "application/geo+json",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".pmtiles": "application/vnd.pmtiles",
+    ".fgb": "application/octet-stream",
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+}
+
+# Accept-Encoding token -> pre-compressed sibling suffix, in order of preference
+PRECOMPRESSED_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+STATUS_TEXT = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+class ByteRangeCache:
+    """
+    Bounded LRU of file byte ranges.
+
+    Keys include the ETag, so a rebuilt file never serves stale bytes.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def get(self, key: tuple) -> bytes | None:
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_entry_bytes or key in self._entries:
+            return
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """Stat + validator of a servable file."""
+    path: Path
+    size: int
+    mtime_ns: int
+    etag: str
+
+
+class ETagResolver:
+    """
+    Strong ETags for served files.
+
+    Uses the sha256 recorded in the build manifest when its size and mtime
+    match the file on disk; otherwise hashes the file once per (size, mtime).
+    Hashing reads the whole file: the server runs it in the executor
+    (lookup() first, then hash_file() on a miss).
+    """
+
+    def __init__(self, manifest_path: Path = MANIFEST_FILE):
+        self.manifest_path = manifest_path
+        self._manifest_version = None
+        self._manifest: dict[str, dict] = {}
+        self._hashed: dict[Path, tuple[int, int, str]] = {}
+
+    def _manifest_entries(self) -> dict[str, dict]:
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return {}
+        # Another generation has another manifest file (inode), maybe with the same mtime
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version != self._manifest_version:
+            try:
+                manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+                self._manifest = manifest.get("outputs", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read build manifest: {e}")
+                self._manifest = {}
+            self._manifest_version = version
+        return self._manifest
+
+    def lookup(self, path: Path, size: int, mtime_ns: int) -> str | None:
+        """Quoted strong ETag of a file from the manifest or earlier hashes, None if unknown."""
+        try:
+            rel = path.relative_to(self.manifest_path.parent.resolve()).as_posix()
+        except ValueError:
+            rel = None
+        entry = self._manifest_entries().get(rel) if rel else None
+        if entry and entry.get("size") == size and entry.get("mtime_ns") == mtime_ns and entry.get("sha256"):
+            return f'"{entry["sha256"][:32]}"'
+
+        cached = self._hashed.get(path)
+        if cached and cached[:2] == (size, mtime_ns):
+            return cached[2]
+        return None
+
+    def resolve(self, path: Path, size: int, mtime_ns: int) -> str:
+        """Return the quoted strong ETag of a file (hashing it if unknown)."""
+        return self.lookup(path, size, mtime_ns) or self.hash_file(path, size, mtime_ns)
+
+    def hash_file(self, path: Path, size: int, mtime_ns: int) -> str:
+        """Hash a file and remember its ETag for this (size, mtime)."""
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        self._hashed[path] = (size, mtime_ns, etag)
+        return etag
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single 'bytes=' range into an inclusive (start, end).
+
+    Returns:
+        (start, end), or None if the header is not a single, well-formed byte
+        range (ignored as RFC 9110 requires: the full body is served)
+
+    Raises:
+        ValueError: if the range cannot be satisfied for this size
+    """
+    unit, _, spec = header.partition("=")
+    match = BYTE_RANGE.fullmatch(spec.strip())
+    if unit.strip().lower() != "bytes" or match is None or match.group(0) == "-":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(f"empty suffix range: {header}")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"unsatisfiable range: {header}")
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match: '*' or a comma-separated list of entity tags, compared weakly."""
+    if header.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in {opaque(tag) for tag in header.split(",")}
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings accepted by the client (codings with q=0 are excluded)."""
+    accepted = set()
+    for token in header.split(","):
+        name, *params = [part.strip() for part in token.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+# ----------------------------
+# Server
+# ----------------------------
+
+class TileServer:
+    """Asyncio HTTP server for the map app and its tiles."""
+
+    def __init__(
+        self,
+        docs_dir: Path = DOCS_DIR,
+        tiles_dir: Path = APP_CURRENT_TILES_DIR,
+        cache: ByteRangeCache | None = None,
+        etags: ETagResolver | None = None,
+    ):
+        self.docs_dir = Path(docs_dir).resolve()
+        # Not resolved here: a symlink to the current generation may be switched
+        self.tiles_dir = Path(tiles_dir).absolute()
+        self.cache = cache or ByteRangeCache()
+        self.etags = etags or ETagResolver()
+        self.n_requests = 0
+
+    # --- Routing ---
+
+    def resolve_path(self, url_path: str) -> Path | None:
+        """Map a URL path to a file, refusing anything outside the served roots."""
+        url_path = unquote(url_path)
+        if url_path.startswith(TILES_URL_PREFIX):
+            root, rel = self.tiles_dir.resolve(), url_path[len(TILES_URL_PREFIX):]
+        else:
+            root, rel = self.docs_dir, url_path.lstrip("/")
+        candidate = (root / rel).resolve()
+        if candidate.is_dir():
+            candidate = candidate / "index.html"
+        try:
+            candidate.relative_to(root)
+        except ValueError:
+            return None
+        return candidate if candidate.is_file() else None
+
+    async def file_info(self, path: Path) -> FileInfo:
+        stat = path.stat()
+        etag = self.etags.lookup(path, stat.st_size, stat.st_mtime_ns)
+        if etag is None:
+            # Unknown file: hash it off the event loop
+            loop = asyncio.get_running_loop()
+            etag = await loop.run_in_executor(None, self.etags.hash_file, path, stat.st_size, stat.st_mtime_ns)
+        return FileInfo(path, stat.st_size, stat.st_mtime_ns, etag)
+
+    # --- Body ---
+
+    async def read_range(self, info: FileInfo, start: int, end: int) -> bytes:
+        """Read an inclusive byte range, through the LRU cache."""
+        key = (info.path, info.etag, start, end)
+        data = self.cache.get(key)
+        if data is None:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, _read_file_range, info.path, start, end - start + 1)
+            self.cache.put(key, data)
+        return data
+
+    async def send_body(self, writer: asyncio.StreamWriter, info: FileInfo, start: int, end: int) -> None:
+        length = end - start + 1
+        if length <= self.cache.max_entry_bytes:
+            writer.write(await self.read_range(info, start, end))
+            await writer.drain()
+            return
+        # Large body: zero-copy sendfile (falls back to read/write when unsupported)
+        await writer.drain()
+        loop = asyncio.get_running_loop()
+        with info.path.open("rb") as f:
+            await loop.sendfile(writer.transport, f, offset=start, count=length)
+
+    # --- Request handling ---
+
+    async def handle_request(self, writer: asyncio.StreamWriter, method: str, target: str, headers: dict[str, str]) -> None:
+        if method not in ("GET", "HEAD"):
+            await self.send_error(writer, 405, extra={"Allow": "GET, HEAD"})
+            return
+
+        path = self.resolve_path(urlsplit(target).path)
+        if path is None:
+            await self.send_error(writer, 404)
+            return
+
+        range_header = headers.get("range")
+        response_headers = {
+            "Content-Type": CONTENT_TYPES.get(path.suffix.lower(), "application/octet-stream"),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if CONTENT_ADDRESSED_NAME.fullmatch(path.name) else CACHE_CONTROL,
+            "Access-Control-Allow-Origin": "*",
+            "Vary": "Accept-Encoding",
+        }
+
+        # Pre-compressed sibling (never for range requests: ranges apply to the identity body)
+        served = path
+        if range_header is None:
+            accepted = accepted_encodings(headers.get("accept-encoding", ""))
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                sibling = path.with_name(path.name + suffix)
+                if encoding in accepted and sibling.is_file():
+                    served = sibling
+                    response_headers["Content-Encoding"] = encoding
+                    break
+
+        info = await self.file_info(served)
+        response_headers["ETag"] = info.etag
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, info.etag):
+            await self.send_head(writer, 304, response_headers)
+            return
+
+        status, start, end = 200, 0, info.size - 1
+        if range_header is not None and headers.get("if-range", info.etag) == info.etag:
+            try:
+                byte_range = parse_range(range_header, info.size)
+            except ValueError:
+                await self.send_error(writer, 416, extra={"Content-Range": f"bytes */{info.size}"})
+                return
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+                response_headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+
+        response_headers["Content-Length"] = str(max(end - start + 1, 0))
+        await self.send_head(writer, status, response_headers)
+        if method == "GET" and info.size > 0:
+            await self.send_body(writer, info, start, end)
+
+    async def send_head(self, writer: asyncio.StreamWriter, status: int, headers: dict[str, str]) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def send_error(self, writer: asyncio.StreamWriter, status: int, extra: dict[str, str] | None = None) -> None:
+        body = f"{status} {STATUS_TEXT[status]}\n".encode()
+        headers = {"Content-Type": "text/plain; charset=utf-8", "Content-Length": str(len(body))}
+        headers.update(extra or {})
+        await self.send_head(writer, status, headers)
+        writer.write(body)
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one keep-alive connection."""
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                request_line, *header_lines = raw.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    await self.send_error(writer, 400)
+                    break
+
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+
+                # Discard the request body so it is not parsed as the next request
+                # (a chunked or large body closes the connection instead)
+                keep_alive = True
+                if "transfer-encoding" in headers:
+                    keep_alive = False
+                elif "content-length" in headers:
+                    try:
+                        body_length = int(headers["content-length"])
+                    except ValueError:
+                        body_length = -1
+                    if body_length < 0:
+                        await self.send_error(writer, 400)
+                        break
+                    if body_length <= MAX_DISCARDED_BODY_BYTES:
+                        await asyncio.wait_for(reader.readexactly(body_length), KEEPALIVE_TIMEOUT_S)
+                    else:
+                        keep_alive = False
+
+                self.n_requests += 1
+                await self.handle_request(writer, method.upper(), target, headers)
+                logger.debug(f"{method} {target}")
+
+                connection = headers.get("connection", "").lower()
+                if not keep_alive or connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+                    break
+        except (ConnectionError, BrokenPipeError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            logger.error(f"Error handling request: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        server = await asyncio.start_server(
+            self.handle_connection,
+            host,
+            port,
+            backlog=LISTEN_BACKLOG,
+            limit=MAX_HEADER_BYTES,
+        )
+        logger.info(f"🚀 Serving {self.docs_dir} and {TILES_URL_PREFIX} -> {self.tiles_dir}")
+        logger.info(f"   http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+
+def _read_file_range(path: Path, offset: int, length: int) -> bytes:
+    with path.open("rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the map app and tiles")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Size of the in-memory byte-range cache")
+    args = parser.parse_args()
+
+    tile_server = TileServer(cache=ByteRangeCache(max_bytes=args.cache_mb * 1024 * 1024))
+    try:
+        asyncio.run(tile_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info(f"Stopped after {tile_server.n_requests:,} requests "
+                    f"(cache hits: {tile_server.cache.hits:,}, misses: {tile_server.cache.misses:,})")